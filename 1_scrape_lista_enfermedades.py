@@ -1,22 +1,30 @@
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
+from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from urllib.parse import urljoin
+import argparse
 import json
 import string
+import threading
 from datetime import datetime
 import hashlib
+import cliente_http
+import perfilador
+import planificador
 
 """
 Script para extraer la lista de enfermedades del sitio web de Mayo Clinic en español.
-Utiliza Selenium para manejar contenido dinámico y genera un ID único para cada enfermedad.
+Descarga las 26 páginas del índice A-Z en paralelo (por HTTP o con Selenium) y toma los enlaces
+directamente del HTML. Genera un ID único para cada enfermedad y descarta los duplicados sobre la marcha.
 Guarda los datos en un archivo JSON y verifica la integridad de los IDs generados.
 """
 
 BASE_URL = "https://www.mayoclinic.org"
-DISEASES_URL = f"{BASE_URL}/es/diseases-conditions"
+RUTA_ENFERMEDADES = "/es/diseases-conditions"
 
 """
 La estructura del JSON resultante será:
@@ -37,6 +45,10 @@ La estructura del JSON resultante será:
 """
 
 ARCHIVO_SALIDA = '1_lista_enfermedades.json'
+SELECTOR_ENLACES = "a.cmp-result-name__link[href]"
+WORKERS_POR_DEFECTO = 8
+MODOS_DESCARGA = ["http", "selenium"]
+MODO_POR_DEFECTO = "http"
 
 def crear_hash_id(texto):
     """
@@ -45,58 +57,135 @@ def crear_hash_id(texto):
     h = hashlib.sha1(texto.encode('utf-8'))
     return h.hexdigest()[:10]
 
-def scrape_disease_list():
-    """
-    Configuración de Selenium para extraer el id, nombre y URL de todas las enfermedades.
-    """
+def crear_driver():
+    """Crea una instancia de Chrome headless para las páginas del índice."""
     service = Service()
     options = webdriver.ChromeOptions()
     options.add_experimental_option('excludeSwitches', ['enable-logging'])
-    driver = webdriver.Chrome(service=service, options=options)
-    wait = WebDriverWait(driver, 10)
-    print("Navegador Chrome iniciado por Selenium.")
-    
+    options.add_argument('--headless=new')
+    return webdriver.Chrome(service=service, options=options)
+
+def extraer_enlaces_html(html, url_pagina):
+    """
+    Extrae (nombre, url) de todos los enlaces de resultados de una página del índice,
+    parseando el HTML una sola vez en lugar de consultar cada elemento al navegador.
+    """
+    with perfilador.etapa("indice.parseo") as medicion:
+        soup = BeautifulSoup(html, 'lxml')
+        enlaces = []
+        for enlace in soup.select(SELECTOR_ENLACES):
+            nombre = enlace.get_text(strip=True)
+            if nombre:
+                enlaces.append((nombre, urljoin(url_pagina, enlace['href'])))
+        medicion["elementos"] = len(enlaces)
+    return enlaces
+
+class DescargadorIndice:
+    """
+    Descarga páginas del índice desde varios hilos. Cada hilo tiene su propia
+    sesión HTTP o su propio navegador, que se crean la primera vez que se usan.
+    """
+    def __init__(self, modo=MODO_POR_DEFECTO, planificador_peticiones=None):
+        self.modo = modo
+        self.planificador = planificador_peticiones
+        self.local = threading.local()
+        self.recursos = []
+        self.lock = threading.Lock()
+
+    def recurso_del_hilo(self):
+        if not hasattr(self.local, "recurso"):
+            if self.modo == "http":
+                self.local.recurso = cliente_http.crear_sesion(planificador=self.planificador)
+            else:
+                self.local.recurso = crear_driver()
+            with self.lock:
+                self.recursos.append(self.local.recurso)
+        return self.local.recurso
+
+    def descargar(self, url):
+        """Devuelve el HTML de la página, o None si no se pudo cargar."""
+        recurso = self.recurso_del_hilo()
+        if self.modo == "http":
+            with perfilador.etapa("indice.descarga_http", elementos=1):
+                return cliente_http.descargar_html(recurso, url)
+        try:
+            turno = self.planificador.turno(url, saturacion=(TimeoutException,)) if self.planificador else nullcontext()
+            with turno, perfilador.etapa("indice.descarga_selenium", elementos=1):
+                recurso.get(url)
+                # Se espera a que el documento termine de cargar, no a que aparezca un resultado:
+                # así las letras sin enfermedades no consumen el timeout completo.
+                WebDriverWait(recurso, 10).until(
+                    lambda d: d.execute_script("return document.readyState") == "complete"
+                )
+                return recurso.page_source
+        except TimeoutException:
+            print(f"La página {url} no cargó a tiempo.")
+            return None
+
+    def cerrar(self):
+        for recurso in self.recursos:
+            if self.modo == "http":
+                recurso.close()
+            else:
+                recurso.quit()
+
+def scrape_disease_list(modo=MODO_POR_DEFECTO, num_workers=WORKERS_POR_DEFECTO, url_base=BASE_URL, planificador_peticiones=None):
+    """
+    Extrae el id, nombre y URL de todas las enfermedades descargando las páginas
+    de cada letra en paralelo. Las URLs repetidas se fusionan durante el recorrido.
+    El ritmo de las peticiones lo marca el planificador compartido.
+    """
+    url_indice = f"{url_base}{RUTA_ENFERMEDADES}/index"
+    planificador_peticiones = planificador_peticiones or planificador.PlanificadorPeticiones(max_concurrentes=num_workers)
+    descargador = DescargadorIndice(modo, planificador_peticiones)
+    print(f"Descargando el índice A-Z con {num_workers} workers (modo '{modo}').")
+
+    def procesar_letra(letra):
+        url_letra = f"{url_indice}?letter={letra}"
+        html = descargador.descargar(url_letra)
+        return extraer_enlaces_html(html, url_letra) if html else None
+
     lista_unica_enfermedades = []
+    ids_vistos = set()
+    fusionados = 0
 
     try:
         letras = string.ascii_uppercase
-        for letra in letras:
-            print(f"\n--- Procesando letra: {letra} ---")
-            
-            url_letra = f"{DISEASES_URL}/index?letter={letra}"
-            driver.get(url_letra)
-            
-            try:
-                wait.until(EC.presence_of_element_located((By.CLASS_NAME, "cmp-result-name__link")))
-                enlaces_elementos = driver.find_elements(By.CLASS_NAME, "cmp-result-name__link")
-                
-                if not enlaces_elementos:
+        with perfilador.etapa("scrape_disease_list") as medicion, ThreadPoolExecutor(max_workers=num_workers) as executor:
+            # executor.map entrega los resultados en el orden de las letras a medida que terminan
+            for letra, enlaces in zip(letras, executor.map(procesar_letra, letras)):
+                print(f"\n--- Procesando letra: {letra} ---")
+                if enlaces is None:
+                    print(f"No se pudo cargar la página de la letra '{letra}'.")
+                    continue
+                if not enlaces:
                     print(f"No se encontraron enfermedades para la letra '{letra}'.")
                     continue
 
-                print(f"Se encontraron {len(enlaces_elementos)} enfermedades para la letra '{letra}'.")
-
-                for enlace in enlaces_elementos:
-                    nombre = enlace.text
-                    url = enlace.get_attribute('href')
-                    
-                    if nombre and url:
-                        id_enfermedad = crear_hash_id(url)
-                        lista_unica_enfermedades.append({
-                            "id": id_enfermedad,
-                            "nombre": nombre,
-                            "url": url
-                        })
-            
-            except TimeoutException:
-                print(f"No se encontraron resultados para la letra '{letra}' o la página no cargó a tiempo.")
+                print(f"Se encontraron {len(enlaces)} enfermedades para la letra '{letra}'.")
+
+                for nombre, url in enlaces:
+                    id_enfermedad = crear_hash_id(url)
+                    if id_enfermedad in ids_vistos:
+                        fusionados += 1
+                        continue
+                    ids_vistos.add(id_enfermedad)
+                    lista_unica_enfermedades.append({
+                        "id": id_enfermedad,
+                        "nombre": nombre,
+                        "url": url
+                    })
+            medicion["elementos"] = len(lista_unica_enfermedades)
 
     except Exception as e:
         print(f"\nOcurrió un error general en el proceso: {e}")
     finally:
-        print("\nScraping finalizado. Cerrando el navegador.")
-        driver.quit()
-        
+        print("\nScraping finalizado. Cerrando las conexiones.")
+        descargador.cerrar()
+        print(planificador_peticiones.resumen())
+
+    if fusionados:
+        print(f"Se fusionaron {fusionados} enlaces repetidos (misma URL en varias letras).")
     return lista_unica_enfermedades
 
 def verificar_duplicados(lista_enfermedades):
@@ -122,8 +211,32 @@ def verificar_duplicados(lista_enfermedades):
             print(f"  - ID: {id_duplicado}")
     print("="*60)
 
+def parsear_argumentos():
+    parser = argparse.ArgumentParser(description="Extrae la lista de enfermedades del índice A-Z de Mayo Clinic.")
+    parser.add_argument("--workers", type=int, default=WORKERS_POR_DEFECTO,
+                        help="Número de páginas del índice que se descargan en paralelo.")
+    parser.add_argument("--modo", choices=MODOS_DESCARGA, default=MODO_POR_DEFECTO,
+                        help="'http' descarga el HTML directamente; 'selenium' lo renderiza con Chrome headless.")
+    parser.add_argument("--tasa-inicial", type=float, default=planificador.TASA_INICIAL,
+                        help="Peticiones por segundo al empezar; el planificador la ajusta según las respuestas.")
+    parser.add_argument("--tasa-maxima", type=float, default=planificador.TASA_MAXIMA,
+                        help="Límite superior de peticiones por segundo.")
+    parser.add_argument("--url-base", default=BASE_URL,
+                        help="Sitio del que se descarga el índice (p. ej. el servidor de fixtures).")
+    parser.add_argument("--salida", default=ARCHIVO_SALIDA,
+                        help="Archivo JSON donde se guarda la lista.")
+    perfilador.agregar_argumentos(parser, "1_scrape_lista_enfermedades")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    enfermedades_extraidas = scrape_disease_list()
+    args = parsear_argumentos()
+    perfilador.iniciar("1_scrape_lista_enfermedades", cprofile=args.perfilar)
+    planificador_peticiones = planificador.PlanificadorPeticiones(
+        tasa_inicial=args.tasa_inicial,
+        tasa_maxima=args.tasa_maxima,
+        max_concurrentes=args.workers
+    )
+    enfermedades_extraidas = scrape_disease_list(args.modo, args.workers, args.url_base, planificador_peticiones)
     
     if enfermedades_extraidas:
         # Primero, verifica si hay duplicados en los datos extraídos
@@ -131,19 +244,22 @@ if __name__ == "__main__":
 
         datos_finales = {
             "metadata": {
-                "fuente": DISEASES_URL,
+                "fuente": f"{args.url_base}{RUTA_ENFERMEDADES}",
                 "total_registros": len(enfermedades_extraidas)
             },
             "enfermedades": enfermedades_extraidas
         }
 
         try:
-            with open(ARCHIVO_SALIDA, 'w', encoding='utf-8') as f:
+            with open(args.salida, 'w', encoding='utf-8') as f:
                 json.dump(datos_finales, f, ensure_ascii=False, indent=4)
             print("¡Proceso completado con éxito!")
-            print(f"Los datos se han guardado en '{ARCHIVO_SALIDA}'")
+            print(f"Los datos se han guardado en '{args.salida}'")
             print("="*60)
         except IOError as e:
             print(f"Error al guardar el archivo JSON: {e}")
     else:
-        print("\nNo se pudo extraer ninguna información. El proceso falló.")
\ No newline at end of file
+        print("\nNo se pudo extraer ninguna información. El proceso falló.")
+
+    perfilador.anotar("peticiones", planificador_peticiones.estadisticas())
+    perfilador.escribir_reporte(args.reporte)
\ No newline at end of file
@@ -5,22 +5,30 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from functools import lru_cache
+import argparse
 import json
-import time
+import re
+import cliente_http
+import cache_paginas
+import perfilador
+import planificador
+from checkpoint_jsonl import CheckpointJSONL
 
 """
 Script para extraer detalles completos de cada enfermedad del sitio web de Mayo Clinic en español.
-Utiliza Selenium para manejar contenido dinámico y BeautifulSoup para parsear el HTML.
+Descarga las páginas por HTTP y las parsea con BeautifulSoup (lxml); Selenium solo se
+usa como respaldo cuando la página no trae las secciones esperadas sin JavaScript.
 Navega por las pestañas de cada página de enfermedad para obtener información estructurada.
 Guarda los datos en un archivo JSON.
 """
 
 
 # --- CONFIGURACIÓN ---
+# Detalles de las secciones a extraer de la pestaña principal (Síntomas y causas).
 SECCIONES_SINTOMAS_CAUSAS = [
-    """
-    Detalles de las secciones a extraer de la pestaña principal (Síntomas y causas).
-    """
     "descripción general",
     "síntomas", 
     "causas",
@@ -29,10 +37,8 @@ SECCIONES_SINTOMAS_CAUSAS = [
     "prevención"
 ]
 
+# Detalles de las secciones a extraer de la pestaña (Diagnóstico y tratamiento).
 SECCIONES_DIAGNOSTICO_TRATAMIENTO = [
-    """
-    Detalles de las secciones a extraer de la pestaña (Diagnóstico y tratamiento
-    """
     "diagnóstico",
     "tratamiento"
 ]
@@ -43,8 +49,47 @@ Nombres de los archivos de entrada y salida.
 
 ARCHIVO_ENTRADA = '1_lista_enfermedades.json'
 ARCHIVO_SALIDA = '2_enfermedades_detallado_crudo.json'
+ARCHIVO_CHECKPOINT = '2_enfermedades_detallado_crudo.jsonl'
+
+"""
+Configuración del modo paralelo: cada worker tiene su propia sesión HTTP (y navegador
+headless si hace falta) y procesa una porción de la lista. El ritmo de las peticiones
+lo marca el planificador compartido, que también limita cuántas páginas se cargan a la vez.
+"""
+WORKERS_POR_DEFECTO = 1
+RONDAS_REINTENTO = 1
+
+"""
+Modos de descarga: 'http' descarga las pestañas directamente y recurre a Selenium
+solo si faltan las secciones h2; 'selenium' renderiza siempre con el navegador.
+"""
+MODOS_DESCARGA = ["http", "selenium"]
+MODO_POR_DEFECTO = "http"
 
-def hacer_clic_pestana(driver, nombre_pestana):
+"""
+Caché de páginas para re-crawls incrementales. VERSION_EXTRACCION debe incrementarse
+cuando cambie la lógica de extracción, para volver a parsear el HTML guardado.
+"""
+VERSION_EXTRACCION = 2
+ARCHIVO_MANIFIESTO = '2_ids_modificados.json'
+
+def crear_driver(headless=False):
+    """Crea una instancia de Chrome con la configuración común del scraper."""
+    service = Service()
+    options = webdriver.ChromeOptions()
+    options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    if headless:
+        options.add_argument('--headless=new')
+        options.add_argument('--disable-gpu')
+    return webdriver.Chrome(service=service, options=options)
+
+def turno_navegador(planificador_peticiones, url):
+    """Turno del planificador para una navegación de Selenium; un timeout cuenta como saturación."""
+    if planificador_peticiones is None:
+        return nullcontext()
+    return planificador_peticiones.turno(url, saturacion=(TimeoutException,))
+
+def hacer_clic_pestana(driver, nombre_pestana, planificador_peticiones=None):
     """Hace clic en una pestaña específica del menú de navegación."""
     try:
         # Buscar el elemento del menú por el texto
@@ -60,16 +105,31 @@ def hacer_clic_pestana(driver, nombre_pestana):
             EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
         )
         
-        # Hacer clic en el elemento
-        driver.execute_script("arguments[0].click();", elemento_menu)
+        url_anterior = driver.current_url
+        pagina_anterior = driver.find_element(By.TAG_NAME, "html")
         
-        # Esperar a que la página cargue
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "h2"))
-        )
+        with turno_navegador(planificador_peticiones, url_anterior):
+            # Hacer clic en el elemento
+            driver.execute_script("arguments[0].click();", elemento_menu)
+            
+            # Esperar a que se abandone la página anterior (en lugar de una pausa fija);
+            # si la pestaña se muestra sin cambiar de página, se sigue con la espera del h2.
+            try:
+                WebDriverWait(driver, 5).until(
+                    lambda d: d.current_url != url_anterior or EC.staleness_of(pagina_anterior)(d)
+                )
+            except TimeoutException:
+                pass
+            
+            # Esperar a que la página cargue
+            WebDriverWait(driver, 10).until(
+                lambda d: d.execute_script("return document.readyState") == "complete"
+            )
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "h2"))
+            )
         
         print(f"      -> Clic en '{nombre_pestana}' exitoso")
-        time.sleep(2)  # Espera adicional para asegurar la carga
         return True
         
     except TimeoutException:
@@ -79,32 +139,53 @@ def hacer_clic_pestana(driver, nombre_pestana):
         print(f"      -> ERROR al hacer clic en '{nombre_pestana}': {e}")
         return False
 
+"""
+Filtros precompilados para el parseo. Se aplican sobre el texto en minúsculas o sobre
+las clases CSS del elemento, con la misma lógica de "contiene la palabra" de siempre.
+"""
+FILTRO_PARRAFOS = re.compile(r"mayo clinic|advertisement|anuncio")
+FILTRO_PARRAFOS_CONTENEDOR = re.compile(r"mayo clinic|advertisement")
+FILTRO_CLASES_ANUNCIO = re.compile(r"mayoad|ad-container|contentbox")
+PALABRAS_DEPARTAMENTO = re.compile(r"servicio|departamento|clínica|especialidad|centro|hospital")
+PALABRAS_DEPARTAMENTO_LISTA = re.compile(r"servicio|departamento|clínica")
+EXCLUIR_DEPARTAMENTO = re.compile(r"facebook|twitter|youtube|linkedin|instagram|mayo clinic")
+
+@lru_cache(maxsize=None)
+def compilar_titulos(secciones_a_buscar):
+    """Compila los títulos buscados en una sola expresión para reconocerlos de una pasada."""
+    return re.compile("|".join(re.escape(titulo) for titulo in secciones_a_buscar))
+
+def extraer_items_lista(ul):
+    """Devuelve el texto de los <li> directos de una lista, sin los vacíos."""
+    items_lista = []
+    for li in ul.find_all('li', recursive=False):
+        texto_li = li.get_text(strip=True)
+        if texto_li:
+            items_lista.append(texto_li)
+    return items_lista
+
 def extraer_contenido_seccion(h2_titulo):
     """Extrae contenido estructurado de una sección a partir de su título h2."""
     contenido_seccion = []
     
-    # Buscar todos los elementos hermanos hasta el siguiente h2
+    # Recorrer los elementos hermanos hasta el siguiente h2
     for elemento in h2_titulo.find_next_siblings():
-        if elemento.name == 'h2':
+        nombre = elemento.name
+        if nombre == 'h2':
             break
         
         # Manejar párrafos
-        if elemento.name == 'p':
+        if nombre == 'p':
             texto = elemento.get_text(strip=True)
-            if texto and not any(x in texto.lower() for x in ['mayo clinic', 'advertisement', 'anuncio']):
+            if texto and not FILTRO_PARRAFOS.search(texto.lower()):
                 contenido_seccion.append({
                     "tipo": "parrafo",
                     "contenido": texto
                 })
         
         # Manejar listas
-        elif elemento.name == 'ul':
-            items_lista = []
-            for li in elemento.find_all('li', recursive=False):
-                texto_li = li.get_text(strip=True)
-                if texto_li:
-                    items_lista.append(texto_li)
-            
+        elif nombre == 'ul':
+            items_lista = extraer_items_lista(elemento)
             if items_lista:
                 contenido_seccion.append({
                     "tipo": "lista",
@@ -112,7 +193,7 @@ def extraer_contenido_seccion(h2_titulo):
                 })
         
         # Manejar subtítulos h3
-        elif elemento.name == 'h3':
+        elif nombre == 'h3':
             texto_titulo = elemento.get_text(strip=True)
             if texto_titulo:
                 contenido_seccion.append({
@@ -121,54 +202,68 @@ def extraer_contenido_seccion(h2_titulo):
                 })
         
         # Manejar elementos contenedores
-        elif elemento.name in ['div', 'section']:
+        elif nombre in ('div', 'section'):
             # Excluir contenedores de anuncios
-            if elemento.get('class') and any(cls in str(elemento.get('class')) 
-                                           for cls in ['mayoad', 'ad-container', 'contentbox']):
+            clases = elemento.get('class')
+            if clases and FILTRO_CLASES_ANUNCIO.search(" ".join(clases)):
                 continue
-                
-            # Extraer párrafos dentro del contenedor
-            for p in elemento.find_all('p', recursive=False):
-                texto = p.get_text(strip=True)
-                if texto and not any(x in texto.lower() for x in ['mayo clinic', 'advertisement']):
-                    contenido_seccion.append({
-                        "tipo": "parrafo", 
-                        "contenido": texto
-                    })
             
-            # Extraer listas dentro del contenedor
-            for ul in elemento.find_all('ul', recursive=False):
-                items_lista = []
-                for li in ul.find_all('li', recursive=False):
-                    texto_li = li.get_text(strip=True)
-                    if texto_li:
-                        items_lista.append(texto_li)
-                
-                if items_lista:
-                    contenido_seccion.append({
-                        "tipo": "lista",
-                        "items": items_lista
-                    })
+            # Extraer párrafos y listas directos del contenedor (primero párrafos, luego listas)
+            parrafos = []
+            listas = []
+            for hijo in elemento.find_all(['p', 'ul'], recursive=False):
+                if hijo.name == 'p':
+                    texto = hijo.get_text(strip=True)
+                    if texto and not FILTRO_PARRAFOS_CONTENEDOR.search(texto.lower()):
+                        parrafos.append({
+                            "tipo": "parrafo", 
+                            "contenido": texto
+                        })
+                else:
+                    items_lista = extraer_items_lista(hijo)
+                    if items_lista:
+                        listas.append({
+                            "tipo": "lista",
+                            "items": items_lista
+                        })
+            contenido_seccion.extend(parrafos)
+            contenido_seccion.extend(listas)
     
     return contenido_seccion
 
 def extraer_secciones_pagina(soup, secciones_a_buscar):
-    """Extrae las secciones específicas de una página."""
-    secciones_extraidas = []
+    """
+    Extrae las secciones específicas de una página.
+    Recorre los h2 del documento una sola vez y asigna a cada título buscado el primer
+    h2 que lo contiene; el resultado sigue el orden de 'secciones_a_buscar'.
+    """
+    patron_titulos = compilar_titulos(tuple(secciones_a_buscar))
+    h2_por_titulo = {}
+    
+    for h2 in soup.find_all('h2'):
+        texto = h2.string
+        if not texto:
+            continue
+        texto_minusculas = texto.lower()
+        if not patron_titulos.search(texto_minusculas):
+            continue
+        for titulo_seccion in secciones_a_buscar:
+            if titulo_seccion in texto_minusculas:
+                h2_por_titulo.setdefault(titulo_seccion, h2)
+        if len(h2_por_titulo) == len(secciones_a_buscar):
+            break
     
+    secciones_extraidas = []
     for titulo_seccion in secciones_a_buscar:
-        # Buscar h2 que contenga el texto de la sección
-        h2_titulo = soup.find('h2', string=lambda text: text and titulo_seccion in text.lower())
+        h2_titulo = h2_por_titulo.get(titulo_seccion)
         
         if h2_titulo:
             titulo_real = h2_titulo.get_text(strip=True)
             print(f"        -> Encontrada sección: '{titulo_real}'")
             
-            contenido_seccion = extraer_contenido_seccion(h2_titulo)
-            
             secciones_extraidas.append({
                 "titulo": titulo_real,
-                "contenido": contenido_seccion
+                "contenido": extraer_contenido_seccion(h2_titulo)
             })
         else:
             print(f"        -> Sección '{titulo_seccion}' no encontrada")
@@ -176,71 +271,183 @@ def extraer_secciones_pagina(soup, secciones_a_buscar):
     return secciones_extraidas
 
 def extraer_departamentos(soup):
-    """Extrae los nombres de los departamentos y especialidades."""
-    departamentos = []
+    """
+    Extrae los nombres de los departamentos y especialidades.
+    Recorre los enlaces y los elementos de lista en una sola pasada; primero van los
+    enlaces que parecen departamentos y después los encontrados dentro de listas.
+    """
+    departamentos_enlaces = {}
+    departamentos_listas = {}
     
     try:
-        # Buscar enlaces que probablemente sean departamentos
-        enlaces = soup.find_all('a', href=True)
-        
-        for enlace in enlaces:
-            texto = enlace.get_text(strip=True)
-            # Filtrar enlaces que parecen ser departamentos o servicios
-            if (len(texto) > 10 and 
-                any(palabra in texto.lower() for palabra in ['servicio', 'departamento', 'clínica', 'especialidad', 'centro', 'hospital']) and
-                not any(excluir in texto.lower() for excluir in ['facebook', 'twitter', 'youtube', 'linkedin', 'instagram', 'mayo clinic'])):
-                
-                if texto not in departamentos:
-                    departamentos.append(texto)
-                    print(f"        -> Encontrado departamento: '{texto}'")
-        
-        # Buscar en listas específicas
-        listas = soup.find_all('ul')
-        for lista in listas:
-            for li in lista.find_all('li'):
-                texto_li = li.get_text(strip=True)
-                if texto_li and len(texto_li) > 10:
-                    # Buscar texto de enlaces dentro del li
-                    enlace_li = li.find('a')
-                    if enlace_li:
-                        texto_dep = enlace_li.get_text(strip=True)
-                        if (texto_dep and texto_dep not in departamentos and
-                            any(palabra in texto_dep.lower() for palabra in ['servicio', 'departamento', 'clínica'])):
-                            departamentos.append(texto_dep)
-                            print(f"        -> Encontrado departamento: '{texto_dep}'")
+        for elemento in soup.find_all(['a', 'li']):
+            if elemento.name == 'a':
+                # Enlaces que probablemente sean departamentos o servicios
+                if not elemento.has_attr('href'):
+                    continue
+                texto = elemento.get_text(strip=True)
+                if len(texto) > 10:
+                    texto_minusculas = texto.lower()
+                    if (PALABRAS_DEPARTAMENTO.search(texto_minusculas) and
+                            not EXCLUIR_DEPARTAMENTO.search(texto_minusculas)):
+                        departamentos_enlaces.setdefault(texto, None)
+            
+            # Texto del primer enlace de cada elemento de una lista <ul>
+            elif elemento.find_parent('ul') is not None:
+                enlace_li = elemento.find('a')
+                if enlace_li is None:
+                    continue
+                texto_dep = enlace_li.get_text(strip=True)
+                if (texto_dep and PALABRAS_DEPARTAMENTO_LISTA.search(texto_dep.lower()) and
+                        len(elemento.get_text(strip=True)) > 10):
+                    departamentos_listas.setdefault(texto_dep, None)
     
     except Exception as e:
         print(f"        -> ERROR al extraer departamentos: {e}")
     
+    # Los diccionarios conservan el orden de inserción y deduplican en O(1)
+    departamentos = list(departamentos_enlaces)
+    departamentos.extend(texto for texto in departamentos_listas if texto not in departamentos_enlaces)
+    for texto in departamentos:
+        print(f"        -> Encontrado departamento: '{texto}'")
     return departamentos
 
-def extraer_detalles_completos(driver, url_enfermedad):
-    """Extrae detalles completos de la enfermedad navegando por todas las pestañas."""
-    resultados = {
+def detalles_vacios():
+    """Estructura vacía de detalles de una enfermedad."""
+    return {
         "sintomas_causas": [],
         "diagnostico_tratamiento": [],
         "departamentos": []
     }
+
+def obtener_pestana(sesion, url, procesar, cache=None, entrada=None, pestana=None):
+    """
+    Descarga una pestaña y devuelve (resultado, modificada), donde 'resultado' es lo que
+    devuelve 'procesar(soup)'. Con caché se hace una petición condicional: si la página
+    no cambió, se reutiliza el resultado guardado sin descargarla ni parsearla.
+    Devuelve None si la descarga falla.
+    """
+    previa = cache.pagina_previa(entrada, pestana, url) if cache else None
+    with perfilador.etapa("detalles.descarga_http", elementos=1):
+        descarga = cliente_http.descargar_condicional(
+            sesion, url,
+            etag=previa.get("etag") if previa else None,
+            last_modified=previa.get("last_modified") if previa else None
+        )
+    if descarga is None:
+        return None
+
+    if descarga["no_modificada"]:
+        html, hash_html = None, previa["hash"]
+    else:
+        html = descarga["html"]
+        hash_html = cache_paginas.hash_contenido(html)
+    modificada = previa is None or previa["hash"] != hash_html
+
+    if previa and not modificada and previa.get("version_extraccion") == cache.version_extraccion:
+        print(f"        -> '{pestana}' sin cambios, se reutiliza lo extraído")
+        resultado = previa["resultado"]
+    else:
+        if html is None:
+            # Sin cambios en el servidor, pero hay que volver a extraer: se usa el HTML en caché
+            html = cache.leer_html(hash_html)
+        if html is None:
+            descarga = cliente_http.descargar_condicional(sesion, url)
+            if descarga is None:
+                return None
+            html = descarga["html"]
+            hash_html = cache_paginas.hash_contenido(html)
+        with perfilador.etapa("detalles.parseo", elementos=1):
+            resultado = procesar(BeautifulSoup(html, 'lxml'))
+
+    if cache:
+        cache.guardar_pagina(entrada, pestana, url, descarga, hash_html, resultado)
+    return resultado, modificada
+
+def extraer_detalles_http(sesion, url_enfermedad, cache=None, id_enfermedad=None):
+    """
+    Extrae los detalles descargando las pestañas por HTTP, sin abrir un navegador.
+    Las URLs de las pestañas se toman del 'href' de sus enlaces.
+    Devuelve None si faltan las secciones h2 esperadas, para recurrir a Selenium.
+    """
+    entrada = cache.cargar_entrada(id_enfermedad) if cache else None
+    resultados = detalles_vacios()
+
+    def procesar_principal(soup):
+        return {
+            "secciones": extraer_secciones_pagina(soup, SECCIONES_SINTOMAS_CAUSAS),
+            "enlaces": {
+                "diagnostico_tratamiento": cliente_http.buscar_url_pestana(soup, url_enfermedad, "diagnosis-treatment"),
+                "departamentos": cliente_http.buscar_url_pestana(soup, url_enfermedad, "doctors-departments")
+            }
+        }
+
+    # 1. Página principal (Síntomas y causas)
+    pestana = obtener_pestana(sesion, url_enfermedad, procesar_principal, cache, entrada, "sintomas_causas")
+    if pestana is None:
+        return None
+    principal, modificada = pestana
+    resultados["sintomas_causas"] = principal["secciones"]
+    if not resultados["sintomas_causas"]:
+        return None
+    enlaces = principal["enlaces"]
+
+    # 2. Diagnóstico y tratamiento
+    if enlaces["diagnostico_tratamiento"]:
+        pestana = obtener_pestana(
+            sesion, enlaces["diagnostico_tratamiento"],
+            lambda soup: extraer_secciones_pagina(soup, SECCIONES_DIAGNOSTICO_TRATAMIENTO),
+            cache, entrada, "diagnostico_tratamiento"
+        )
+        if pestana is None:
+            return None
+        resultados["diagnostico_tratamiento"], cambio = pestana
+        modificada = modificada or cambio
+        if not resultados["diagnostico_tratamiento"]:
+            return None
+
+    # 3. Médicos y departamentos
+    if enlaces["departamentos"]:
+        pestana = obtener_pestana(sesion, enlaces["departamentos"], extraer_departamentos, cache, entrada, "departamentos")
+        if pestana is not None:
+            resultados["departamentos"], cambio = pestana
+            modificada = modificada or cambio
+
+    if cache:
+        cache.marcar_revisada(entrada, modificada)
+    return resultados
+
+def extraer_detalles_completos(driver, url_enfermedad, planificador_peticiones=None):
+    """Extrae detalles completos de la enfermedad navegando por todas las pestañas."""
+    resultados = detalles_vacios()
     
     try:
         # 1. Página principal (Síntomas y causas)
-        driver.get(url_enfermedad)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "body"))
-        )
+        with turno_navegador(planificador_peticiones, url_enfermedad), perfilador.etapa("detalles.selenium_carga", elementos=1):
+            driver.get(url_enfermedad)
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "body"))
+            )
         
-        soup_principal = BeautifulSoup(driver.page_source, 'html.parser')
-        resultados["sintomas_causas"] = extraer_secciones_pagina(soup_principal, SECCIONES_SINTOMAS_CAUSAS)
+        with perfilador.etapa("detalles.parseo", elementos=1):
+            soup_principal = BeautifulSoup(driver.page_source, 'html.parser')
+            resultados["sintomas_causas"] = extraer_secciones_pagina(soup_principal, SECCIONES_SINTOMAS_CAUSAS)
         
         # 2. Diagnóstico y tratamiento
-        if hacer_clic_pestana(driver, "Diagnóstico y tratamiento"):
-            soup_diagnostico = BeautifulSoup(driver.page_source, 'html.parser')
-            resultados["diagnostico_tratamiento"] = extraer_secciones_pagina(soup_diagnostico, SECCIONES_DIAGNOSTICO_TRATAMIENTO)
+        with perfilador.etapa("detalles.selenium_pestana", elementos=1):
+            abierta = hacer_clic_pestana(driver, "Diagnóstico y tratamiento", planificador_peticiones)
+        if abierta:
+            with perfilador.etapa("detalles.parseo", elementos=1):
+                soup_diagnostico = BeautifulSoup(driver.page_source, 'html.parser')
+                resultados["diagnostico_tratamiento"] = extraer_secciones_pagina(soup_diagnostico, SECCIONES_DIAGNOSTICO_TRATAMIENTO)
         
         # 3. Médicos y departamentos
-        if hacer_clic_pestana(driver, "Médicos y departamentos"):
-            soup_departamentos = BeautifulSoup(driver.page_source, 'html.parser')
-            departamentos = extraer_departamentos(soup_departamentos)
+        with perfilador.etapa("detalles.selenium_pestana", elementos=1):
+            abierta = hacer_clic_pestana(driver, "Médicos y departamentos", planificador_peticiones)
+        if abierta:
+            with perfilador.etapa("detalles.parseo", elementos=1):
+                soup_departamentos = BeautifulSoup(driver.page_source, 'html.parser')
+                departamentos = extraer_departamentos(soup_departamentos)
             resultados["departamentos"] = departamentos
         
     except TimeoutException:
@@ -250,73 +457,213 @@ def extraer_detalles_completos(driver, url_enfermedad):
     
     return resultados
 
+def procesar_porcion(id_worker, porcion, total, al_completar, planificador_peticiones=None, headless=True, modo=MODO_POR_DEFECTO, cache=None):
+    """
+    Procesa una porción de la lista de enfermedades con una sesión HTTP y un navegador propios.
+    El navegador solo se inicia la primera vez que hace falta recurrir a Selenium.
+    'porcion' es una lista de tuplas (posición original, enfermedad); cada enfermedad con
+    detalles se entrega a 'al_completar' en cuanto termina, sin acumularla en memoria.
+    """
+    sesion = cliente_http.crear_sesion(planificador=planificador_peticiones) if modo == "http" else None
+    driver = None
+    try:
+        for posicion, enfermedad in porcion:
+            print(f"\n[Worker {id_worker}] ({posicion+1}/{total}) Procesando: {enfermedad.get('nombre', 'Nombre Desconocido')}")
+            print(f"   URL: {enfermedad.get('url')}")
+
+            detalles = None
+            if sesion is not None:
+                with perfilador.etapa("detalles.http", elementos=1):
+                    detalles = extraer_detalles_http(sesion, enfermedad.get('url'), cache, enfermedad.get('id'))
+                if detalles is None:
+                    print("      -> Secciones no disponibles por HTTP, usando Selenium")
+            if detalles is None:
+                try:
+                    if driver is None:
+                        with perfilador.etapa("detalles.selenium_inicio"):
+                            driver = crear_driver(headless=headless)
+                    with perfilador.etapa("extraer_detalles_completos", elementos=1):
+                        detalles = extraer_detalles_completos(driver, enfermedad.get('url'), planificador_peticiones)
+                except Exception as e:
+                    print(f"      -> ERROR: No se pudo iniciar el navegador de respaldo: {e}")
+                    detalles = detalles_vacios()
+                if cache:
+                    # Sin validadores HTTP no se puede saber si cambió: se marca como modificada
+                    cache.marcar_revisada(cache.cargar_entrada(enfermedad.get('id')), True)
+
+            # Combinar todos los detalles sin modificar el diccionario original
+            enfermedad_detallada = dict(enfermedad)
+            enfermedad_detallada.update(detalles)
+            al_completar(enfermedad_detallada)
+    finally:
+        if driver is not None:
+            driver.quit()
+        if sesion is not None:
+            sesion.close()
+
+def extraer_detalles_en_paralelo(lista_enfermedades, num_workers, al_completar, planificador_peticiones=None, modo=MODO_POR_DEFECTO, cache=None):
+    """
+    Reparte la lista entre 'num_workers' workers; cada enfermedad con detalles se entrega
+    a 'al_completar' (que debe ser seguro entre hilos) en cuanto se termina de extraer.
+    Con un solo worker el navegador de respaldo es visible, como en el modo secuencial original.
+    """
+    total = len(lista_enfermedades)
+    if total == 0:
+        return
+    num_workers = max(1, min(num_workers, total))
+
+    # Porciones intercaladas para que cada worker reciba una mezcla similar de letras
+    enumeradas = list(enumerate(lista_enfermedades))
+    porciones = [enumeradas[i::num_workers] for i in range(num_workers)]
+
+    if num_workers == 1:
+        procesar_porcion(1, porciones[0], total, al_completar, planificador_peticiones, headless=False, modo=modo, cache=cache)
+        return
+
+    print(f"Modo paralelo: {num_workers} workers.")
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        futuros = {
+            executor.submit(procesar_porcion, i + 1, porcion, total, al_completar, planificador_peticiones, True, modo, cache): i + 1
+            for i, porcion in enumerate(porciones)
+        }
+        for futuro in as_completed(futuros):
+            try:
+                futuro.result()
+            except Exception as e:
+                print(f"      -> ERROR: El worker {futuros[futuro]} terminó con un error: {e}")
+
+def tiene_detalles(enfermedad):
+    """Indica si se extrajo al menos una sección o departamento de la enfermedad."""
+    return any(enfermedad.get(campo) for campo in detalles_vacios())
+
+def parsear_argumentos():
+    parser = argparse.ArgumentParser(description="Extrae los detalles de cada enfermedad de Mayo Clinic.")
+    parser.add_argument("--workers", type=int, default=WORKERS_POR_DEFECTO,
+                        help="Número de workers en paralelo, cada uno con su navegador headless (1 = modo secuencial).")
+    parser.add_argument("--max-concurrentes", type=int, default=None,
+                        help="Límite global de páginas cargándose a la vez (por defecto, igual a --workers).")
+    parser.add_argument("--tasa-inicial", type=float, default=planificador.TASA_INICIAL,
+                        help="Peticiones por segundo al empezar; el planificador la ajusta según las respuestas.")
+    parser.add_argument("--tasa-maxima", type=float, default=planificador.TASA_MAXIMA,
+                        help="Límite superior de peticiones por segundo.")
+    parser.add_argument("--rondas-reintento", type=int, default=RONDAS_REINTENTO,
+                        help="Veces que se reintentan, al final, las enfermedades que quedaron sin detalles.")
+    parser.add_argument("--modo", choices=MODOS_DESCARGA, default=MODO_POR_DEFECTO,
+                        help="'http' descarga directamente y usa Selenium solo como respaldo; 'selenium' usa siempre el navegador.")
+    parser.add_argument("--entrada", default=ARCHIVO_ENTRADA,
+                        help="Archivo JSON con la lista de enfermedades.")
+    parser.add_argument("--salida", default=ARCHIVO_SALIDA,
+                        help="Archivo JSON donde se guardan los detalles.")
+    parser.add_argument("--checkpoint", default=ARCHIVO_CHECKPOINT,
+                        help="Archivo JSONL donde se guarda cada enfermedad en cuanto se extrae.")
+    parser.add_argument("--reiniciar", action="store_true",
+                        help="Descarta el checkpoint existente y empieza desde cero.")
+    parser.add_argument("--cache", default=cache_paginas.DIRECTORIO_CACHE,
+                        help="Carpeta de la caché de páginas para peticiones condicionales.")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="Descarga y parsea todas las páginas aunque no hayan cambiado.")
+    parser.add_argument("--manifiesto", default=ARCHIVO_MANIFIESTO,
+                        help="Archivo JSON con los ids de las enfermedades que cambiaron.")
+    perfilador.agregar_argumentos(parser, "2_scrape_detalles_enfermedades")
+    return parser.parse_args()
+
 if __name__ == "__main__":
     """
     Proceso principal para extraer detalles de enfermedades desde un archivo JSON de entrada.
     1. Cargar la lista de enfermedades desde un archivo JSON.
-    2. Iniciar el navegador Selenium.
-    3. Procesar cada enfermedad para extraer detalles.
-    4. Cerrar el navegador.
-    5. Guardar el resultado final en un archivo JSON.
+    2. Iniciar los workers (sesión HTTP y, si hace falta, navegador Selenium).
+    3. Procesar cada enfermedad pendiente y guardarla en el checkpoint.
+    4. Cerrar las sesiones y los navegadores.
+    5. Compactar el checkpoint JSONL en el archivo JSON final.
     """
+    args = parsear_argumentos()
+    perfilador.iniciar("2_scrape_detalles_enfermedades", cprofile=args.perfilar)
+
     try:
-        with open(ARCHIVO_ENTRADA, 'r', encoding='utf-8') as f:
+        with open(args.entrada, 'r', encoding='utf-8') as f:
             datos = json.load(f)
         lista_enfermedades = datos.get("enfermedades", [])
-        print(f"Se cargaron {len(lista_enfermedades)} enfermedades del archivo '{ARCHIVO_ENTRADA}'.")
+        print(f"Se cargaron {len(lista_enfermedades)} enfermedades del archivo '{args.entrada}'.")
     except FileNotFoundError:
-        print(f"Error: No se encontró el archivo de entrada '{ARCHIVO_ENTRADA}'.")
+        print(f"Error: No se encontró el archivo de entrada '{args.entrada}'.")
         exit()
     except json.JSONDecodeError:
-        print(f"Error: El archivo '{ARCHIVO_ENTRADA}' no es un JSON válido.")
+        print(f"Error: El archivo '{args.entrada}' no es un JSON válido.")
         exit()
 
-    # --- 2. Iniciar el navegador ---
-    service = Service()
-    options = webdriver.ChromeOptions()
-    options.add_experimental_option('excludeSwitches', ['enable-logging'])
-    driver = webdriver.Chrome(service=service, options=options)
-    
-    print("\nNavegador Chrome iniciado. Comenzando extracción de detalles...")
+    # Reanudar desde el checkpoint: se saltan los ids que ya se extrajeron
+    checkpoint = CheckpointJSONL(args.checkpoint)
+    if args.reiniciar:
+        checkpoint.eliminar()
+    ids_completados = checkpoint.ids_completados()
+    pendientes = [enf for enf in lista_enfermedades if enf.get("id") not in ids_completados]
+    if ids_completados:
+        print(f"Checkpoint '{args.checkpoint}': {len(lista_enfermedades) - len(pendientes)} enfermedades ya extraídas, quedan {len(pendientes)}.")
+
+    cola_reintentos = []
+
+    def guardar_en_checkpoint(enfermedad_detallada):
+        # Las enfermedades sin ningún detalle no se marcan como completadas: van a la cola de reintentos.
+        if tiene_detalles(enfermedad_detallada):
+            checkpoint.agregar(enfermedad_detallada)
+        else:
+            cola_reintentos.append(enfermedad_detallada)
+
+    print("\nComenzando extracción de detalles...")
     print(f"Secciones a extraer:")
     print(f"  - Síntomas y causas: {', '.join(SECCIONES_SINTOMAS_CAUSAS)}")
     print(f"  - Diagnóstico y tratamiento: {', '.join(SECCIONES_DIAGNOSTICO_TRATAMIENTO)}")
     print(f"  - Médicos y departamentos: Nombres de departamentos y especialidades")
 
-    enfermedades_con_detalles = []
-    total = len(lista_enfermedades)
+    # --- 2, 3 y 4. Procesar cada enfermedad (cada worker cierra su navegador al terminar) ---
+    cache = None
+    if args.modo == "http" and not args.sin_cache:
+        cache = cache_paginas.CachePaginas(args.cache, VERSION_EXTRACCION)
+    planificador_peticiones = planificador.PlanificadorPeticiones(
+        tasa_inicial=args.tasa_inicial,
+        tasa_maxima=args.tasa_maxima,
+        max_concurrentes=args.max_concurrentes or args.workers
+    )
+    planificador_peticiones.iniciar_reporte()
+    with perfilador.etapa("extraer_detalles", elementos=len(pendientes)):
+        extraer_detalles_en_paralelo(
+            pendientes, args.workers, guardar_en_checkpoint, planificador_peticiones, args.modo, cache
+        )
+    for ronda in range(args.rondas_reintento):
+        if not cola_reintentos:
+            break
+        pendientes, cola_reintentos[:] = list(cola_reintentos), []
+        print(f"\n--- Ronda de reintento {ronda + 1}: {len(pendientes)} enfermedades sin detalles ---")
+        with perfilador.etapa("reintentos", elementos=len(pendientes)):
+            extraer_detalles_en_paralelo(
+                pendientes, args.workers, guardar_en_checkpoint, planificador_peticiones, args.modo, cache
+            )
+    planificador_peticiones.detener()
+    print("\nExtracción de detalles finalizada. Navegadores cerrados.")
+    print(planificador_peticiones.resumen())
 
-    # --- 3. Procesar cada enfermedad ---
-    for i, enfermedad in enumerate(lista_enfermedades):
-        print(f"\n({i+1}/{total}) Procesando: {enfermedad.get('nombre', 'Nombre Desconocido')}")
-        print(f"   URL: {enfermedad.get('url')}")
-        
-        detalles = extraer_detalles_completos(driver, enfermedad.get('url'))
-        
-        # Combinar todos los detalles
-        enfermedad.update(detalles)
-        enfermedades_con_detalles.append(enfermedad)
-        
-        # Pausa para no sobrecargar el servidor
-        time.sleep(2)
-
-    # --- 4. Cerrar el navegador ---
-    print("\nExtracción de detalles finalizada. Cerrando el navegador.")
-    driver.quit()
-
-    # --- 5. Guardar el resultado final ---
-    datos_finales = {
-        "metadata": {
-            "fuente": datos.get("metadata", {}).get("fuente"),
-            "total_registros": len(enfermedades_con_detalles),
-        },
-        "enfermedades": enfermedades_con_detalles
+    # --- 5. Compactar el checkpoint en el JSON final, en el orden de la lista de entrada ---
+    metadata = {
+        "fuente": datos.get("metadata", {}).get("fuente"),
+        "total_registros": len(lista_enfermedades),
     }
-
-    with open(ARCHIVO_SALIDA, 'w', encoding='utf-8') as f:
-        json.dump(datos_finales, f, ensure_ascii=False, indent=4)
+    with perfilador.etapa("compactar", elementos=len(lista_enfermedades)):
+        faltantes = checkpoint.compactar(lista_enfermedades, args.salida, metadata, detalles_vacios)
+    if cache:
+        manifiesto = cache.escribir_manifiesto([enf.get("id") for enf in lista_enfermedades], args.manifiesto)
+        print(f"\nEnfermedades modificadas desde la última ejecución: {manifiesto['total_modificadas']} de {manifiesto['total_revisadas']}")
+        print(f"Manifiesto de cambios guardado en '{args.manifiesto}'")
 
     print("\n" + "="*60)
-    print("¡Proceso completado con éxito!")
-    print(f"Los datos completos se han guardado en '{ARCHIVO_SALIDA}'")
-    print("="*60)
\ No newline at end of file
+    if faltantes:
+        print(f"¡Atención! {len(faltantes)} enfermedades quedaron sin detalles y se guardaron vacías.")
+        print(f"Vuelve a ejecutar el script para reintentarlas desde el checkpoint '{args.checkpoint}'.")
+    else:
+        checkpoint.eliminar()
+        print("¡Proceso completado con éxito!")
+    print(f"Los datos completos se han guardado en '{args.salida}'")
+    print("="*60)
+
+    perfilador.anotar("peticiones", planificador_peticiones.estadisticas())
+    perfilador.anotar("enfermedades", {"total": len(lista_enfermedades), "sin_detalles": len(faltantes)})
+    perfilador.escribir_reporte(args.reporte)
@@ -1,18 +1,55 @@
+import argparse
 import json
 import re
-import unicodedata
 import spacy
 from spacy.matcher import Matcher
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from indice_sintomas import IndiceSintomas
+import cache_procesamiento
+import flujo_json
+import normalizacion_texto
+import perfilador
 
 """
 Procesamiento y enriquecimiento de datos de enfermedades:
 - Extracción avanzada de síntomas estructurados.
 - Análisis demográfico mejorado.
-- Creación de un índice invertido desde categorías de síntomas hacia enfermedades.
-- Unión de archivos JSON en uno solo.
+- Creación de un índice invertido desde categorías y términos de síntomas hacia enfermedades.
+- Escritura en flujo de las enfermedades procesadas, el índice y el archivo unificado.
 """
 
+# Palabras del texto limpio (tras limpiar_texto solo quedan letras, dígitos y espacios)
+PATRON_PALABRA = re.compile(r'\w+')
+
+# --- CONFIGURACIÓN DE spaCy ---
+# El matcher de edades solo usa atributos léxicos (LOWER, LIKE_NUM): basta con el tokenizador
+COMPONENTES_DEMOGRAFIA = []
+TAMANO_LOTE_NLP = 64
+PROCESOS_NLP = 1
+WORKERS_POR_DEFECTO = 1
+TAMANO_PORCION = 32       # enfermedades que se envían juntas a cada proceso
+# Incrementar cuando cambie la lógica de extracción: invalida la caché del paso 3
+VERSION_PROCESAMIENTO = 1
+EDAD_MAXIMA = 100
+DEMOGRAFIA_POR_DEFECTO = {"min_edad": 18, "max_edad": 59, "rango_edad_comun": ["adulto"], "genero_mas_afectado": "Ambos"}
+RANGOS_EDAD_POR_DEFECTO = {"pediatrico": (0, 17), "joven": (12, 30), "adulto": (18, 59), "adulto_mayor": (60, EDAD_MAXIMA)}
+
+# Procesador propio de cada proceso del pool: el vocabulario y el modelo de spaCy se cargan una sola vez
+procesador_del_worker = None
+
+def inicializar_worker():
+    global procesador_del_worker
+    procesador_del_worker = ProcesadorEnfermedades()
+    # Con fork, el worker hereda las etapas ya medidas por el proceso principal: no deben volver a sumarse
+    perfilador.PERFILADOR.extraer_etapas()
+
+def procesar_porcion(porcion, batch_size=TAMANO_LOTE_NLP):
+    # Las mediciones del worker viajan con el resultado para sumarlas al reporte del proceso principal
+    resultado = procesador_del_worker.procesar_lote(porcion, batch_size=batch_size)
+    return resultado, perfilador.PERFILADOR.extraer_etapas()
+
 class ProcesadorEnfermedades:
     def __init__(self):
         """
@@ -118,66 +155,207 @@ class ProcesadorEnfermedades:
         }
         self.nlp = spacy.load("es_core_news_sm")
         self.configurar_matcher_demografia()
+        self.configurar_matcher_sintomas()
 
     def configurar_matcher_demografia(self):
         #Configuración de patrones para extraer información demográfica como edad y género.
     
         self.matcher = Matcher(self.nlp.vocab)
-        patrones = [
-            [{"LOWER": {"IN": ["mayores", "después", "partir"]}}, {"LIKE_NUM": True}],
-            [{"LOWER": {"IN": ["menores", "antes", "hasta"]}}, {"LIKE_NUM": True}],
-            [{"LOWER": {"IN": ["entre", "de"]}}, {"LIKE_NUM": True}, {"LOWER": {"IN": ["y", "a"]}}, {"LIKE_NUM": True}],
-            [{"LOWER": {"IN": ["edad", "edades"]}}, {"LIKE_NUM": True}, {"LOWER": {"IN": ["años", "año"]}}]
-        ]
-        for i, patron in enumerate(patrones):
-            self.matcher.add(f"PATRON_{i}", [patron])
+        articulos = {"LOWER": {"IN": ["de", "los", "las"]}, "OP": "*"}
+        patrones = {
+            # "mayores de 65 años", "a partir de los 40 años"
+            "EDAD_DESDE": [{"LOWER": {"IN": ["mayores", "después", "partir"]}}, articulos, {"LIKE_NUM": True}],
+            # "menores de 5 años", "hasta los 2 años"
+            "EDAD_HASTA": [{"LOWER": {"IN": ["menores", "antes", "hasta"]}}, articulos, {"LIKE_NUM": True}],
+            # "entre 20 y 40 años", "de 6 a 12 años"
+            "EDAD_ENTRE": [{"LOWER": {"IN": ["entre", "de"]}}, articulos, {"LIKE_NUM": True}, {"LOWER": {"IN": ["y", "a"]}}, {"LIKE_NUM": True}],
+            "EDAD_EXACTA": [{"LOWER": {"IN": ["edad", "edades"]}}, articulos, {"LIKE_NUM": True}]
+        }
+        for nombre, patron in patrones.items():
+            self.matcher.add(nombre, [patron])
+
+        self.keywords_genero = {"Hombres": ["hombre", "masculino", "varón", "prostático"], "Mujeres": ["mujer", "femenino", "embarazo", "menopausia", "ovárico"]}
+        self.keywords_edad = {"pediatrico": ["niño", "bebé", "infancia"], "joven": ["joven", "adolescente", "pubertad"], "adulto": ["adulto", "mediana edad"], "adulto_mayor": ["mayor", "anciano", "edad avanzada"]}
+        # Todas las palabras clave en una sola expresión; la búsqueda anticipada permite coincidencias solapadas
+        palabras_clave = [palabra for grupo in (self.keywords_genero, self.keywords_edad) for lista in grupo.values() for palabra in lista]
+        self.patron_keywords_demografia = re.compile('(?=(' + '|'.join(map(re.escape, sorted(palabras_clave, key=len, reverse=True))) + '))')
+
+    def configurar_matcher_sintomas(self):
+        """
+        Compila todo el vocabulario de síntomas una sola vez en un trie de palabras, para
+        encontrar todos los términos en una única pasada sobre el texto.
+        Además de los términos de 'categorias_sintomas' se incluyen los sinónimos de
+        'mapa_sintomas' y los 'sintomas_validos'. Cada término del trie guarda su forma
+        canónica y las categorías (con el término de la categoría) a las que pertenece.
+        """
+        # Términos de cada categoría normalizados igual que el texto, sin repetidos y en su orden original
+        self.vocabulario_categorias = {
+            categoria: list(dict.fromkeys(map(self.limpiar_texto, lista_sintomas)))
+            for categoria, lista_sintomas in self.categorias_sintomas.items()
+        }
+        categorias_termino = defaultdict(list)
+        for categoria, terminos in self.vocabulario_categorias.items():
+            for termino in terminos:
+                categorias_termino[termino].append((categoria, termino))
+
+        # Los síntomas válidos se comparan sin la aclaración entre paréntesis
+        canonicos = {self.limpiar_texto(re.sub(r'\s*\(.*?\)', '', sintoma)): sintoma for sintoma in self.sintomas_validos}
+        canonicos.update({self.limpiar_texto(sinonimo): canonico for sinonimo, canonico in self.mapa_sintomas.items()})
+
+        self.trie_sintomas = {}
+        for termino in set(categorias_termino) | set(canonicos):
+            if not termino.split():
+                continue
+            canonico = canonicos.get(termino, termino)
+            # Un sinónimo hereda las categorías de su forma canónica
+            categorias = categorias_termino.get(termino) or categorias_termino.get(self.limpiar_texto(canonico), [])
+            nodo = self.trie_sintomas
+            for palabra in termino.split():
+                nodo = nodo.setdefault(palabra, {})
+            nodo[None] = (termino, canonico, categorias)
+
+        # Una sola expresión con las primeras palabras localiza dónde puede empezar un término
+        primeras_palabras = sorted(self.trie_sintomas, key=len, reverse=True)
+        self.patron_inicio_sintoma = re.compile(r'\b(?:' + '|'.join(map(re.escape, primeras_palabras)) + r')\b')
+
+    def huella_procesamiento(self):
+        """
+        Huella de todo lo que determina el resultado del procesamiento: vocabulario, palabras
+        clave, modelo de spaCy y versión del código. Si cambia, la caché del paso 3 no sirve.
+        """
+        return cache_procesamiento.hash_json({
+            "version": VERSION_PROCESAMIENTO,
+            "categorias_sintomas": self.categorias_sintomas,
+            "sintomas_validos": self.sintomas_validos,
+            "mapa_sintomas": self.mapa_sintomas,
+            "keywords_genero": self.keywords_genero,
+            "keywords_edad": self.keywords_edad,
+            "modelo": f"{self.nlp.meta.get('name')}-{self.nlp.meta.get('version')}",
+            "spacy": spacy.__version__
+        })
 
     def limpiar_texto(self, texto):
-        # Normaliza y limpia el texto para facilitar la búsqueda de síntomas.
+        # Normaliza y limpia el texto para facilitar la búsqueda de síntomas (la app usa la misma normalización).
+        return normalizacion_texto.limpiar_texto(texto)
 
-        if not isinstance(texto, str): return ""
-        nfkd_form = unicodedata.normalize('NFKD', texto.lower())
-        texto_limpio = "".join([c for c in nfkd_form if not unicodedata.combining(c)])
-        return re.sub(r'[^\w\s]', '', texto_limpio)
+    def localizar_sintomas(self, contenido_texto):
+        """
+        Busca todos los términos del vocabulario en una sola pasada sobre el texto limpio.
+        Devuelve una lista de coincidencias con el término encontrado, su forma canónica,
+        sus categorías y su posición (inicio, fin) dentro del texto limpio.
+        Se encuentran también los términos contenidos en otros ('tos' dentro de 'tos seca').
+        """
+        contenido_limpio = self.limpiar_texto(contenido_texto)
+        coincidencias = []
+        for inicio_palabra in self.patron_inicio_sintoma.finditer(contenido_limpio):
+            nodo = self.trie_sintomas[inicio_palabra.group()]
+            fin = inicio_palabra.end()
+            while True:
+                if None in nodo:
+                    termino, canonico, categorias = nodo[None]
+                    coincidencias.append({
+                        "termino": termino,
+                        "canonico": canonico,
+                        "categorias": categorias,
+                        "inicio": inicio_palabra.start(),
+                        "fin": fin
+                    })
+                # Las palabras de un término van separadas por un único espacio
+                if contenido_limpio[fin:fin + 1] != ' ':
+                    break
+                siguiente = PATRON_PALABRA.match(contenido_limpio, fin + 1)
+                if not siguiente or siguiente.group() not in nodo:
+                    break
+                nodo = nodo[siguiente.group()]
+                fin = siguiente.end()
+        return coincidencias
 
     def extraer_sintomas_estructurados(self, contenido_texto):
         # Extrae síntomas del texto y los organiza por categorías.
-    
-        contenido_limpio = self.limpiar_texto(contenido_texto)
+
+        encontrados = {par for coincidencia in self.localizar_sintomas(contenido_texto) for par in coincidencia["categorias"]}
         sintomas_encontrados = {}
-        for categoria, lista_sintomas in self.categorias_sintomas.items():
-            sintomas_categoria = [sintoma for sintoma in lista_sintomas if re.search(r'\b' + re.escape(sintoma) + r'\b', contenido_limpio)]
+        for categoria, terminos in self.vocabulario_categorias.items():
+            # Se conserva el orden del vocabulario para que la salida sea estable entre ejecuciones
+            sintomas_categoria = [sintoma for sintoma in terminos if (categoria, sintoma) in encontrados]
             if sintomas_categoria:
-                sintomas_encontrados[categoria] = list(set(sintomas_categoria))
+                sintomas_encontrados[categoria] = sintomas_categoria
         return sintomas_encontrados
 
-    def analizar_demografia(self, texto):
-    
-        # Analiza el texto para extraer información demográfica como edad y género.
-        
-        if not texto or not texto.strip():
-            return {"min_edad": 18, "max_edad": 59, "rango_edad_comun": ["adulto"], "genero_mas_afectado": "Ambos"}
-            
-        doc = self.nlp(texto.lower())
-        keywords_genero = {"Hombres": ["hombre", "masculino", "varón", "prostático"], "Mujeres": ["mujer", "femenino", "embarazo", "menopausia", "ovárico"]}
-        keywords_edad = {"pediatrico": ["niño", "bebé", "infancia"], "joven": ["joven", "adolescente", "pubertad"], "adulto": ["adulto", "mediana edad"], "adulto_mayor": ["mayor", "anciano", "edad avanzada"]}
+    def extraer_rangos_edad(self, doc):
+        """
+        Aplica el matcher de edades a un documento y devuelve los rangos (min, max) mencionados.
+        Solo se aceptan las coincidencias seguidas de "años"/"año" para no confundir edades
+        con duraciones ("hasta 3 días") u otras cantidades.
+        """
+        rangos = []
+        for id_patron, inicio, fin in self.matcher(doc):
+            if fin >= len(doc) or doc[fin].lower_ not in ("años", "año"):
+                continue
+            numeros = [int(token.text) for token in doc[inicio:fin] if token.text.isdigit()]
+            if not numeros or max(numeros) > EDAD_MAXIMA:
+                continue
+            tipo = self.nlp.vocab.strings[id_patron]
+            if tipo == "EDAD_DESDE":
+                rangos.append((numeros[-1], EDAD_MAXIMA))
+            elif tipo == "EDAD_HASTA":
+                rangos.append((0, numeros[-1]))
+            elif tipo == "EDAD_ENTRE" and len(numeros) == 2 and numeros[0] <= numeros[1]:
+                rangos.append((numeros[0], numeros[1]))
+            elif tipo == "EDAD_EXACTA":
+                rangos.append((numeros[-1], numeros[-1]))
+        return rangos
+
+    def resumir_demografia(self, texto_minusculas, rangos_numericos):
+        # Combina las palabras clave (una sola pasada sobre el texto) con los rangos de edad numéricos.
+        encontradas = set(self.patron_keywords_demografia.findall(texto_minusculas))
         genero = "Ambos"
-        for gen, palabras in keywords_genero.items():
-            if any(palabra in texto.lower() for palabra in palabras):
+        for gen, palabras in self.keywords_genero.items():
+            if encontradas.intersection(palabras):
                 if genero == "Ambos": genero = gen
                 else: genero = "Ambos"; break
-        rangos_edad = {rango for rango, palabras in keywords_edad.items() if any(palabra in texto.lower() for palabra in palabras)}
+        rangos_edad = {rango for rango, palabras in self.keywords_edad.items() if encontradas.intersection(palabras)}
         if not rangos_edad: rangos_edad = {"adulto"}
-        rangos_por_defecto = {"pediatrico": (0, 17), "joven": (12, 30), "adulto": (18, 59), "adulto_mayor": (60, 100)}
-        min_edad = min(rangos_por_defecto[rango][0] for rango in rangos_edad)
-        max_edad = max(rangos_por_defecto[rango][1] for rango in rangos_edad)
-        return {"min_edad": min_edad, "max_edad": max_edad, "rango_edad_comun": list(rangos_edad), "genero_mas_afectado": genero}
+        # Las edades escritas en el texto son más precisas que los rangos por defecto de las palabras clave
+        rangos = rangos_numericos or [RANGOS_EDAD_POR_DEFECTO[rango] for rango in rangos_edad]
+        min_edad = min(rango[0] for rango in rangos)
+        max_edad = max(rango[1] for rango in rangos)
+        return {"min_edad": min_edad, "max_edad": max_edad, "rango_edad_comun": sorted(rangos_edad), "genero_mas_afectado": genero}
 
-    def procesar_enfermedad_completa(self, enfermedad):
+    def analizar_demografia_flujo(self, textos_con_contexto, batch_size=TAMANO_LOTE_NLP, n_process=PROCESOS_NLP):
         """
-        Procesa una enfermedad, extrayendo síntomas y demografía de TODO el texto disponible
-        para una cobertura máxima.
+        Generador que analiza la demografía de pares (texto, contexto) por lotes con nlp.pipe,
+        desactivando los componentes de spaCy que no se usan. Devuelve (demografía, contexto)
+        en el mismo orden; el contexto permite asociar cada resultado a su registro.
         """
+        desactivados = [nombre for nombre in self.nlp.pipe_names if nombre not in COMPONENTES_DEMOGRAFIA]
+        entradas = ((texto.lower() if texto and texto.strip() else "", contexto) for texto, contexto in textos_con_contexto)
+        docs = self.nlp.pipe(entradas, as_tuples=True, batch_size=batch_size, n_process=n_process, disable=desactivados)
+        while True:
+            # nlp.pipe pide las entradas a medida que las necesita: esta etapa incluye preparar cada lote
+            with perfilador.etapa("procesar.spacy") as medicion:
+                doc, contexto = next(docs, (None, None))
+                medicion["elementos"] = 0 if doc is None else 1
+            if doc is None:
+                return
+            with perfilador.etapa("procesar.demografia", elementos=1):
+                if not doc.text.strip():
+                    demografia = dict(DEMOGRAFIA_POR_DEFECTO)
+                else:
+                    demografia = self.resumir_demografia(doc.text, self.extraer_rangos_edad(doc))
+            yield demografia, contexto
+
+    def analizar_demografia_lote(self, textos, batch_size=TAMANO_LOTE_NLP, n_process=PROCESOS_NLP):
+        # Analiza la demografía de varios textos a la vez y devuelve los resultados en el mismo orden.
+        return [demografia for demografia, _ in self.analizar_demografia_flujo(((texto, None) for texto in textos), batch_size, n_process)]
+
+    def analizar_demografia(self, texto):
+    
+        # Analiza el texto para extraer información demográfica como edad y género.
+        return self.analizar_demografia_lote([texto])[0]
+
+    def texto_enfermedad(self, enfermedad):
+        # Une en un solo texto los párrafos y listas de todas las secciones de una enfermedad.
         texto_analisis = []
         
         # Lista de todas las secciones que pueden contener texto relevante
@@ -197,100 +375,188 @@ class ProcesadorEnfermedades:
                                     items_str = [str(sub_item) for sub_item in item.get("items", []) if sub_item is not None]
                                     texto_analisis.extend(items_str)
         
-        texto_completo = " ".join(filter(None, texto_analisis))
-        
-        sintomas_estructurados = self.extraer_sintomas_estructurados(texto_completo)
-        demografia = self.analizar_demografia(texto_completo)
-        
+        return " ".join(filter(None, texto_analisis))
+
+    def aplicar_resultado(self, enfermedad, resultado):
+        # Devuelve una copia de la enfermedad con la demografía y los síntomas extraídos.
         enfermedad_actualizada = enfermedad.copy()
-        enfermedad_actualizada["demografia"] = demografia
-        enfermedad_actualizada["sintomas_compartidos"] = sintomas_estructurados
-        
+        enfermedad_actualizada["demografia"] = resultado["demografia"]
+        enfermedad_actualizada["sintomas_compartidos"] = resultado["sintomas_compartidos"]
         return enfermedad_actualizada
 
+    def procesar_flujo(self, enfermedades, batch_size=TAMANO_LOTE_NLP, n_process=PROCESOS_NLP, cache=None):
+        """
+        Generador que procesa las enfermedades a medida que llegan: los síntomas se extraen de
+        cada texto y la demografía se analiza por lotes con nlp.pipe. Conserva el orden de entrada
+        y solo mantiene en memoria el lote en curso.
+        Con 'cache', las enfermedades sin cambios reutilizan su resultado anterior: pasan por
+        nlp.pipe como texto vacío solo para mantener su lugar en el orden.
+        """
+        def textos_con_contexto():
+            for enfermedad in enfermedades:
+                hash_enfermedad = cache_procesamiento.hash_contenido(enfermedad) if cache else None
+                previo = cache.buscar(enfermedad.get("id"), hash_enfermedad) if cache else None
+                with perfilador.etapa("procesar.texto", elementos=1):
+                    texto = "" if previo else self.texto_enfermedad(enfermedad)
+                yield texto, (enfermedad, texto, hash_enfermedad, previo)
+
+        for demografia, (enfermedad, texto_completo, hash_enfermedad, previo) in self.analizar_demografia_flujo(textos_con_contexto(), batch_size, n_process):
+            if previo:
+                yield self.aplicar_resultado(enfermedad, previo)
+                continue
+            with perfilador.etapa("procesar.sintomas", elementos=1):
+                sintomas = self.extraer_sintomas_estructurados(texto_completo)
+            resultado = {"demografia": demografia, "sintomas_compartidos": sintomas}
+            if cache:
+                cache.guardar(enfermedad.get("id"), hash_enfermedad, resultado)
+            yield self.aplicar_resultado(enfermedad, resultado)
+
+    def procesar_lote(self, enfermedades, batch_size=TAMANO_LOTE_NLP, n_process=PROCESOS_NLP):
+        # Procesa una lista de enfermedades y las devuelve en el mismo orden.
+        return list(self.procesar_flujo(enfermedades, batch_size, n_process))
+
+    def procesar_enfermedad_completa(self, enfermedad):
+        """
+        Procesa una enfermedad, extrayendo síntomas y demografía de TODO el texto disponible
+        para una cobertura máxima.
+        """
+        return self.procesar_lote([enfermedad])[0]
+
+    def procesar_en_paralelo(self, enfermedades, num_workers, batch_size=TAMANO_LOTE_NLP, tamano_porcion=TAMANO_PORCION, cache=None):
+        """
+        Generador que reparte las enfermedades en porciones entre 'num_workers' procesos.
+        Cada proceso crea su propio ProcesadorEnfermedades al arrancar. Las porciones se
+        devuelven en el orden de entrada, así que la salida es idéntica a la secuencial; solo
+        hay unas pocas porciones en curso a la vez para que la memoria no crezca con el corpus.
+        La caché se consulta en el proceso principal: solo se envían las enfermedades que cambiaron.
+        """
+        print(f"Repartiendo las enfermedades en porciones de {tamano_porcion} entre {num_workers} procesos.")
+        enfermedades = iter(enfermedades)
+        porciones = iter(lambda: list(islice(enfermedades, tamano_porcion)), [])
+
+        def completar(porcion, hashes, previos, futuro):
+            procesadas, etapas = futuro.result() if futuro else ([], {})
+            perfilador.PERFILADOR.combinar(etapas)
+            procesadas = iter(procesadas)
+            for enfermedad, hash_enfermedad, previo in zip(porcion, hashes, previos):
+                if previo:
+                    yield self.aplicar_resultado(enfermedad, previo)
+                    continue
+                enfermedad_actualizada = next(procesadas)
+                if cache:
+                    cache.guardar(enfermedad.get("id"), hash_enfermedad, {
+                        "demografia": enfermedad_actualizada["demografia"],
+                        "sintomas_compartidos": enfermedad_actualizada["sintomas_compartidos"]
+                    })
+                yield enfermedad_actualizada
+
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=inicializar_worker) as executor:
+            pendientes = deque()
+            for porcion in porciones:
+                hashes = [cache_procesamiento.hash_contenido(enfermedad) if cache else None for enfermedad in porcion]
+                previos = [cache.buscar(enfermedad.get("id"), hash_enfermedad) if cache else None
+                           for enfermedad, hash_enfermedad in zip(porcion, hashes)]
+                a_procesar = [enfermedad for enfermedad, previo in zip(porcion, previos) if not previo]
+                futuro = executor.submit(procesar_porcion, a_procesar, batch_size) if a_procesar else None
+                pendientes.append((porcion, hashes, previos, futuro))
+                if len(pendientes) >= 2 * num_workers:
+                    yield from completar(*pendientes.popleft())
+            while pendientes:
+                yield from completar(*pendientes.popleft())
+
     def crear_indice_sintomas(self, enfermedades_procesadas):
-        # Crea un índice invertido desde las CATEGORÍAS de síntomas hacia las enfermedades.
-        indice = defaultdict(list)
-        for enfermedad in enfermedades_procesadas:
-            info_enfermedad = {
-                "id": enfermedad.get("id"),
-                "nombre": enfermedad.get("nombre"),
-                "url": enfermedad.get("url"),
-                "demografia": enfermedad.get("demografia", {})
-            }
-            
-            if "sintomas_compartidos" in enfermedad and enfermedad["sintomas_compartidos"]:
-                for categoria in enfermedad["sintomas_compartidos"].keys():
-                    if not any(e['id'] == info_enfermedad['id'] for e in indice[categoria]):
-                        indice[categoria].append(info_enfermedad)
-                        
-        return dict(sorted(indice.items()))
-
-    def unir_archivos_json(self, archivo_enfermedades, archivo_indice, archivo_salida_unificado):
-        # Une los archivos de enfermedades procesadas y el índice de síntomas en uno solo.
-        print("\n=== UNIENDO ARCHIVOS JSON ===")
-        try:
-            with open(archivo_enfermedades, 'r', encoding='utf-8') as f:
-                datos_enfermedades = json.load(f)
-            with open(archivo_indice, 'r', encoding='utf-8') as f:
-                datos_indice = json.load(f)
-
-            datos_unificados = {
-                "enfermedades": datos_enfermedades.get("enfermedades", []),
-                "indice_sintomas": datos_indice
-            }
-            
-            with open(archivo_salida_unificado, 'w', encoding='utf-8') as f:
-                json.dump(datos_unificados, f, ensure_ascii=False, indent=4)
-            
-            print(f" Archivos unificados guardados en: {archivo_salida_unificado}")
-        except FileNotFoundError as e:
-            print(f"Error: No se pudo encontrar el archivo {e.filename}")
-        except json.JSONDecodeError:
-            print("Error: Uno de los archivos JSON es inválido.")
-
-    def ejecutar_pipeline_completo(self, archivo_entrada, archivo_salida_enfermedades, archivo_salida_indice, archivo_salida_unificado):
-        # Ejecuta todo el pipeline de procesamiento y enriquecimiento de datos.
+        # Crea un índice invertido desde las CATEGORÍAS y los TÉRMINOS de síntomas hacia las enfermedades.
+        return IndiceSintomas.construir(enfermedades_procesadas)
+
+    def ejecutar_pipeline_completo(self, archivo_entrada, archivo_salida_enfermedades, archivo_salida_indice, archivo_salida_unificado,
+                                   batch_size=TAMANO_LOTE_NLP, n_process=PROCESOS_NLP, num_workers=WORKERS_POR_DEFECTO,
+                                   backend_json=flujo_json.BACKEND_POR_DEFECTO, archivo_cache=None):
+        """
+        Ejecuta todo el pipeline de procesamiento y enriquecimiento de datos.
+        Las enfermedades se leen, procesan y escriben en flujo: cada una se serializa una sola vez
+        y se añade a la vez al archivo de enfermedades y al unificado, y el índice se construye
+        sobre la marcha. La memoria no crece con el número de enfermedades.
+        Con 'archivo_cache', solo se procesan las enfermedades cuyo contenido cambió desde la
+        ejecución anterior; el índice se reconstruye entero porque es una pasada lineal sin NLP.
+        """
         print("=== INICIANDO PROCESAMIENTO COMPLETO DE ENFERMEDADES ===")
         try:
-            with open(archivo_entrada, 'r', encoding='utf-8') as f:
-                datos = json.load(f)
+            enfermedades = flujo_json.leer_lista_json(archivo_entrada, "enfermedades")
+            primera = next(enfermedades, None)
         except (FileNotFoundError, json.JSONDecodeError) as e:
             print(f"Error al leer el archivo de entrada: {e}"); return
         
-        enfermedades = datos.get("enfermedades", [])
-        if not enfermedades:
+        if primera is None:
             print("Advertencia: No se encontraron enfermedades en el archivo de entrada.")
             return
+        enfermedades = chain([primera], enfermedades)
 
-        print(f"Enfermedades a procesar: {len(enfermedades)}")
-        
-        enfermedades_procesadas = [self.procesar_enfermedad_completa(enf) for enf in enfermedades]
-        print(f"Procesamiento de {len(enfermedades)} enfermedades completado.")
-        
-        datos_salida = {"enfermedades": enfermedades_procesadas}
-        with open(archivo_salida_enfermedades, 'w', encoding='utf-8') as f:
-            json.dump(datos_salida, f, ensure_ascii=False, indent=4)
+        cache = cache_procesamiento.CacheProcesamiento(archivo_cache, self.huella_procesamiento()) if archivo_cache else None
+        if num_workers > 1:
+            enfermedades_procesadas = self.procesar_en_paralelo(enfermedades, num_workers, batch_size=batch_size, cache=cache)
+        else:
+            enfermedades_procesadas = self.procesar_flujo(enfermedades, batch_size=batch_size, n_process=n_process, cache=cache)
+
+        serializar = flujo_json.crear_serializador(backend_json)
+        indice_sintomas = IndiceSintomas()
+        with perfilador.etapa("procesar_enfermedades") as medicion, \
+             flujo_json.EscritorJSON(archivo_salida_enfermedades, "enfermedades", serializar) as salida_enfermedades, \
+             flujo_json.EscritorJSON(archivo_salida_unificado, "enfermedades", serializar) as salida_unificada:
+            for enfermedad in enfermedades_procesadas:
+                with perfilador.etapa("escritura", elementos=1):
+                    registro_json = serializar(enfermedad)
+                    salida_enfermedades.agregar(registro_json)
+                    salida_unificada.agregar(registro_json)
+                with perfilador.etapa("indice", elementos=1):
+                    indice_sintomas.agregar(enfermedad)
+                if salida_enfermedades.total % 100 == 0:
+                    print(f"  -> {salida_enfermedades.total} enfermedades procesadas")
+            salida_unificada.extras["indice_sintomas"] = indice_sintomas.a_diccionario()
+            medicion["elementos"] = salida_enfermedades.total
+        total_procesadas = salida_enfermedades.total
+        print(f"Procesamiento de {total_procesadas} enfermedades completado.")
+        if cache:
+            cache.escribir()
+            print(f" Caché: {cache.reutilizadas} enfermedades sin cambios reutilizadas, {cache.procesadas} procesadas de nuevo.")
+            perfilador.anotar("cache", {"reutilizadas": cache.reutilizadas, "procesadas": cache.procesadas})
         print(f" Enfermedades procesadas guardadas en: {archivo_salida_enfermedades}")
-        
-        indice_sintomas = self.crear_indice_sintomas(enfermedades_procesadas)
-        with open(archivo_salida_indice, 'w', encoding='utf-8') as f:
-            json.dump(indice_sintomas, f, ensure_ascii=False, indent=4)
+        print(f" Archivos unificados guardados en: {archivo_salida_unificado}")
+
+        indice_sintomas.guardar(archivo_salida_indice)
         print(f" Índice de síntomas por categoría guardado en: {archivo_salida_indice}")
         
-        self.unir_archivos_json(archivo_salida_enfermedades, archivo_salida_indice, archivo_salida_unificado)
-        
         print(f"\n=== ESTADÍSTICAS FINALES ===")
-        print(f"Enfermedades procesadas: {len(enfermedades_procesadas)}")
-        print(f"Categorías de síntomas únicas en el índice: {len(indice_sintomas)}")
-        if indice_sintomas:
-            top_categorias = sorted(indice_sintomas.items(), key=lambda item: len(item[1]), reverse=True)
+        print(f"Enfermedades procesadas: {total_procesadas}")
+        print(f"Categorías de síntomas únicas en el índice: {len(indice_sintomas.categorias)}")
+        print(f"Términos de síntomas únicos en el índice: {len(indice_sintomas.terminos)}")
+        if indice_sintomas.categorias:
+            top_categorias = sorted(indice_sintomas.categorias.items(), key=lambda item: len(item[1]), reverse=True)
             print("Categorías con más enfermedades asociadas:")
             for categoria, lista in top_categorias[:10]:
                 print(f"- {categoria}: {len(lista)} enfermedades")
 
+def parsear_argumentos():
+    parser = argparse.ArgumentParser(description="Procesa y enriquece los datos de las enfermedades.")
+    parser.add_argument("--workers", type=int, default=WORKERS_POR_DEFECTO,
+                        help="Procesos en paralelo, cada uno con su propio modelo de spaCy (1 = modo secuencial).")
+    parser.add_argument("--cache", default=cache_procesamiento.ARCHIVO_CACHE,
+                        help="Archivo de caché con el resultado de cada enfermedad para reprocesar solo las que cambian.")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="Procesa todas las enfermedades aunque no hayan cambiado (y no actualiza la caché).")
+    parser.add_argument("--backend-json", choices=flujo_json.BACKENDS_JSON, default=flujo_json.BACKEND_POR_DEFECTO,
+                        help="Serializador de las salidas: 'auto' usa orjson si está instalado.")
+    parser.add_argument("--tamano-lote", type=int, default=TAMANO_LOTE_NLP,
+                        help="Textos que spaCy procesa por lote (nlp.pipe).")
+    parser.add_argument("--procesos-nlp", type=int, default=PROCESOS_NLP,
+                        help="Procesos que usa spaCy para el análisis demográfico (n_process); solo en modo secuencial.")
+    perfilador.agregar_argumentos(parser, "3_procesar_y_enriquecer_datos")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    procesador = ProcesadorEnfermedades()
+    args = parsear_argumentos()
+    perfilador.iniciar("3_procesar_y_enriquecer_datos", cprofile=args.perfilar)
+    with perfilador.etapa("cargar_modelo"):
+        procesador = ProcesadorEnfermedades()
     archivo_entrada = "2_enfermedades_detallado_crudo.json"
     archivo_salida_enfermedades = "enfermedades_demograficas.json"
     archivo_salida_indice = "indice_sintomas.json"
@@ -300,5 +566,11 @@ if __name__ == "__main__":
         archivo_entrada, 
         archivo_salida_enfermedades, 
         archivo_salida_indice,
-        archivo_salida_unificado
-    )
\ No newline at end of file
+        archivo_salida_unificado,
+        batch_size=args.tamano_lote,
+        n_process=args.procesos_nlp,
+        num_workers=args.workers,
+        backend_json=args.backend_json,
+        archivo_cache=None if args.sin_cache else args.cache
+    )
+    perfilador.escribir_reporte(args.reporte)
@@ -1,7 +1,12 @@
+import argparse
 import json
-import pandas as pd
-from sentence_transformers import SentenceTransformer
-import torch # Usaremos PyTorch para guardar los embeddings
+import torch
+import almacen_enfermedades
+import cache_embeddings
+import indice_ann
+import matriz_embeddings
+import motor_embeddings
+import perfilador
 
 """
 Script para pre-calcular y guardar los embeddings de las enfermedades
@@ -15,8 +20,9 @@ estén en el formato correcto.
 # --- CONSTANTES Y CONFIGURACIÓN ---
 MODEL_NAME = 'hiiamsid/sentence_similarity_spanish_es'
 INPUT_JSON = '3_datos_completos_procesados.json'
-OUTPUT_DATA_FILE = 'processed_data.pkl' # Guardaremos los datos de las enfermedades
-OUTPUT_EMBEDDINGS_FILE = 'disease_embeddings.pt' # Guardaremos los vectores en un archivo de PyTorch
+OUTPUT_DATA_FILE = almacen_enfermedades.ARCHIVO_ALMACEN # Almacén SQLite con los datos de las enfermedades
+OUTPUT_EMBEDDINGS_FILE = 'disease_embeddings.emb' # Matriz normalizada que la app abre con memoria mapeada
+OUTPUT_ANN_INDEX_FILE = 'disease_embeddings.ivf' # Índice aproximado (opcional) sobre esa matriz
 
 def obtener_texto_sintomas(enfermedad):
     """
@@ -30,67 +36,136 @@ def obtener_texto_sintomas(enfermedad):
             if s.get('titulo', '').lower() == 'síntomas'
         )
         
-        # Concatena todo el contenido de la sección
-        texto_completo = []
-        for item in seccion_sintomas.get('contenido', []):
-            if item.get('tipo') == 'parrafo':
-                texto_completo.append(item.get('contenido', ''))
-            elif item.get('tipo') == 'lista':
-                texto_completo.extend([f"- {li}" for li in item.get('items', [])])
-        return "\n".join(texto_completo)
+        # Concatena todo el contenido de la sección (la app usa la misma función)
+        return almacen_enfermedades.texto_seccion(seccion_sintomas)
     except (StopIteration, TypeError):
         # Si no hay sección de síntomas o hay algún error, devuelve un string vacío.
         return ""
 
+def calcular_embeddings(textos, motor, cache=None):
+    """
+    Devuelve la matriz de embeddings de 'textos' (una fila por texto, en el mismo orden).
+    Con 'cache', solo se codifican los textos nuevos o modificados; si no hay ninguno,
+    el modelo ni siquiera se carga.
+    """
+    if not textos:
+        return torch.empty(0)
+    hashes = [cache_embeddings.hash_texto(texto) for texto in textos]
+    pendientes = {}
+    for texto, hash_vector in zip(textos, hashes):
+        if hash_vector not in pendientes and (cache is None or cache.buscar(hash_vector) is None):
+            pendientes[hash_vector] = texto
+
+    nuevos = {}
+    if pendientes:
+        print(f"Codificando {len(pendientes)} textos nuevos o modificados con '{motor.clave_cache()}' "
+              f"({motor.procesos} procesos, lotes de {motor.batch_size})... (cargar el modelo puede tardar unos minutos la primera vez)")
+        # El resultado es un tensor de PyTorch, que es lo que la función de búsqueda semántica espera.
+        with perfilador.etapa("encode", elementos=len(pendientes)):
+            vectores = motor.codificar(list(pendientes.values()))
+        nuevos = dict(zip(pendientes, vectores))
+        if cache:
+            for hash_vector, vector in nuevos.items():
+                cache.guardar(hash_vector, vector)
+    return torch.stack([nuevos[h] if h in nuevos else cache.buscar(h) for h in hashes])
+
+def parsear_argumentos():
+    parser = argparse.ArgumentParser(description="Pre-calcula los embeddings de los síntomas de cada enfermedad.")
+    parser.add_argument("--cache", default=cache_embeddings.ARCHIVO_CACHE,
+                        help="Caché de embeddings por (modelo, hash del texto) para codificar solo los textos nuevos o modificados.")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="Codifica todos los textos de nuevo sin usar ni actualizar la caché.")
+    parser.add_argument("--tamano-lote", type=int, default=motor_embeddings.TAMANO_LOTE,
+                        help="Textos que el modelo codifica a la vez.")
+    parser.add_argument("--tamano-cubeta", type=int, default=motor_embeddings.TAMANO_CUBETA,
+                        help="Textos de longitud parecida que se envían juntos a cada proceso.")
+    parser.add_argument("--procesos", type=int, default=motor_embeddings.PROCESOS,
+                        help="Procesos que codifican en paralelo (cada uno carga su copia del modelo).")
+    parser.add_argument("--cuantizar", action="store_true",
+                        help="Cuantiza las capas lineales del modelo a int8 para codificar más rápido en CPU.")
+    parser.add_argument("--tolerancia", type=float, default=motor_embeddings.TOLERANCIA_COSENO,
+                        help="Desviación máxima de las similitudes coseno del modelo int8 respecto al fp32.")
+    parser.add_argument("--muestra-verificacion", type=int, default=motor_embeddings.MUESTRA_VERIFICACION,
+                        help="Textos con los que se compara el modelo int8 con el fp32 (0 desactiva la verificación).")
+    parser.add_argument("--tipo-matriz", choices=list(matriz_embeddings.TIPOS), default=matriz_embeddings.TIPO_POR_DEFECTO,
+                        help="Tipo de dato de la matriz guardada: float16 ocupa la mitad e int8 (con una escala por fila) la cuarta parte.")
+    parser.add_argument("--indice-ann", action="store_true",
+                        help="Construye también un índice aproximado (IVF) para que la búsqueda no recorra toda la matriz.")
+    parser.add_argument("--listas-ann", type=int, default=None,
+                        help="Listas del índice IVF (por defecto, la raíz cuadrada del número de enfermedades).")
+    perfilador.agregar_argumentos(parser, "4_preparar_embeddings")
+    return parser.parse_args()
+
 def main():
     """
     Función principal para cargar los datos, generar los embeddings y guardarlos.
     """
+    args = parsear_argumentos()
+    perfilador.iniciar("4_preparar_embeddings", cprofile=args.perfilar)
     print("--- Iniciando pre-cálculo de embeddings ---")
     
-    # 1. Cargar el modelo de SentenceTransformer
-    print(f"Cargando el modelo '{MODEL_NAME}'... (Esto puede tardar unos minutos la primera vez)")
-    model = SentenceTransformer(MODEL_NAME)
-    print(" Modelo cargado.")
-
-    # 2. Cargar y procesar los datos JSON
+    # 1. Cargar y procesar los datos JSON
     print(f"Cargando datos desde '{INPUT_JSON}'...")
-    with open(INPUT_JSON, 'r', encoding='utf-8') as f:
+    with perfilador.etapa("cargar_datos"), open(INPUT_JSON, 'r', encoding='utf-8') as f:
         data = json.load(f)
     
     enfermedades = data.get('enfermedades', [])
     print(f" Se encontraron {len(enfermedades)} enfermedades.")
     
-    # 3. Extraer el texto de los síntomas de cada enfermedad
+    # 2. Extraer el texto de los síntomas de cada enfermedad
     textos_sintomas = []
     enfermedades_validas = [] # Guardaremos solo las enfermedades que tengan texto de síntomas
 
-    for enf in enfermedades:
-        texto = obtener_texto_sintomas(enf)
-        if texto: # Solo procesamos enfermedades con descripción de síntomas
-            textos_sintomas.append(texto)
-            enfermedades_validas.append(enf)
+    with perfilador.etapa("textos", elementos=len(enfermedades)):
+        for enf in enfermedades:
+            texto = obtener_texto_sintomas(enf)
+            if texto: # Solo procesamos enfermedades con descripción de síntomas
+                textos_sintomas.append(texto)
+                enfermedades_validas.append(enf)
             
     print(f"Generando embeddings para {len(enfermedades_validas)} enfermedades con descripción de síntomas.")
 
     """
-    4. Generar los embeddings para todos los textos
-    Usamos convert_to_tensor=True para que el resultado sea un tensor de PyTorch,
-    que es lo que la función de búsqueda semántica espera.
+    3. Generar los embeddings para todos los textos
+    El modelo de SentenceTransformer solo se carga si hay textos que no están en la caché.
     """
-    embeddings = model.encode(textos_sintomas, show_progress_bar=True, convert_to_tensor=True)
+    motor = motor_embeddings.MotorEmbeddings(MODEL_NAME, cuantizar=args.cuantizar, procesos=args.procesos,
+                                             batch_size=args.tamano_lote, tamano_cubeta=args.tamano_cubeta,
+                                             tolerancia=args.tolerancia, muestra_verificacion=args.muestra_verificacion)
+    cache = None if args.sin_cache else cache_embeddings.CacheEmbeddings(args.cache, motor.clave_cache())
+    try:
+        embeddings = calcular_embeddings(textos_sintomas, motor, cache)
+    except motor_embeddings.CuantizacionFueraDeTolerancia as e:
+        print(f"Error: {e} Ejecuta sin --cuantizar o ajusta --tolerancia.")
+        return
+    if motor.verificacion:
+        perfilador.anotar("verificacion_int8", motor.verificacion)
+    if cache:
+        cache.escribir()
+        print(f" Caché: {cache.reutilizados} embeddings reutilizados, {cache.codificados} codificados de nuevo.")
+        perfilador.anotar("cache", {"reutilizados": cache.reutilizados, "codificados": cache.codificados})
 
     """
-    5. Guardar los resultados
-    Guardamos los embeddings en el formato nativo de PyTorch, es muy eficiente.
+    4. Guardar los resultados
+    Los embeddings se guardan normalizados en una matriz cruda que la app abre con memoria
+    mapeada; la cabecera guarda el id de la enfermedad de cada fila.
     """
-    torch.save(embeddings, OUTPUT_EMBEDDINGS_FILE)
-    print(f"✓ Embeddings guardados en '{OUTPUT_EMBEDDINGS_FILE}'")
+    with perfilador.etapa("guardar"):
+        ids = [enf.get('id') for enf in enfermedades_validas]
+        matriz_embeddings.guardar_matriz(OUTPUT_EMBEDDINGS_FILE, embeddings.numpy(), MODEL_NAME, ids, args.tipo_matriz)
+        print(f"✓ Embeddings guardados en '{OUTPUT_EMBEDDINGS_FILE}' ({args.tipo_matriz})")
+
+        if args.indice_ann and ids:
+            matriz = matriz_embeddings.MatrizEmbeddings.abrir(OUTPUT_EMBEDDINGS_FILE)
+            indice = indice_ann.IndiceIVF.construir(matriz, args.listas_ann)
+            indice.guardar(OUTPUT_ANN_INDEX_FILE)
+            print(f"✓ Índice IVF con {indice.cabecera['listas']} listas guardado en '{OUTPUT_ANN_INDEX_FILE}'")
 
-    # Guardamos los datos de las enfermedades (sin los embeddings) en un archivo pickle
-    df = pd.DataFrame(enfermedades_validas)
-    df.to_pickle(OUTPUT_DATA_FILE)
-    print(f"✓ Datos de enfermedades guardados en '{OUTPUT_DATA_FILE}'")
+        # Guardamos los datos de las enfermedades (sin los embeddings) con la misma fila que en la matriz
+        almacen_enfermedades.guardar_almacen(OUTPUT_DATA_FILE, enfermedades_validas)
+        print(f"✓ Datos de enfermedades guardados en '{OUTPUT_DATA_FILE}'")
+    perfilador.anotar("modelo", motor.clave_cache())
+    perfilador.escribir_reporte(args.reporte)
     
     print("\n--- ¡Proceso completado con éxito! ---")
 
@@ -0,0 +1,93 @@
+import argparse
+import almacen_enfermedades
+import perfilador
+import resumenes
+
+"""
+Script para precalcular el resumen de la 'Descripción general' de cada enfermedad.
+Los resúmenes se generan por lotes y se guardan en el almacén de la app, así que la app no
+tiene que ejecutar el modelo de resumen al mostrar los resultados.
+Usa la misma caché persistente que la app: en las siguientes ejecuciones solo se resumen las
+enfermedades cuyo texto cambió (o si cambia el backend o las longitudes del resumen).
+Es importante ejecutar este script después de '4_preparar_embeddings.py', que crea el almacén.
+"""
+
+# --- CONFIGURACIÓN ---
+LOTES_POR_BLOQUE = 4  # cada bloque se guarda en la caché al terminar, por si se interrumpe
+
+def parsear_argumentos():
+    parser = argparse.ArgumentParser(description="Precalcula los resúmenes de las enfermedades para la app.")
+    parser.add_argument("--almacen", default=almacen_enfermedades.ARCHIVO_ALMACEN,
+                        help="Almacén SQLite generado por el paso 4.")
+    parser.add_argument("--cache", default=resumenes.ARCHIVO_CACHE,
+                        help="Caché persistente de resúmenes (compartida con la app).")
+    parser.add_argument("--backend", choices=resumenes.BACKENDS_RESUMEN, default=resumenes.BACKEND_POR_DEFECTO,
+                        help="'extractivo' elige oraciones con el modelo de la búsqueda; 'bart' las genera con "
+                             f"'{resumenes.MODELO_BART}' (debe ser el mismo que usa la app).")
+    parser.add_argument("--max-longitud", type=int, default=resumenes.LONGITUD_MAXIMA,
+                        help="Longitud máxima del resumen.")
+    parser.add_argument("--min-longitud", type=int, default=resumenes.LONGITUD_MINIMA,
+                        help="Longitud mínima del resumen (los textos más cortos no se resumen).")
+    parser.add_argument("--tamano-lote", type=int, default=resumenes.TAMANO_LOTE,
+                        help="Textos que el modelo resume a la vez.")
+    perfilador.agregar_argumentos(parser, "5_precalcular_resumenes")
+    return parser.parse_args()
+
+def main():
+    args = parsear_argumentos()
+    perfilador.iniciar("5_precalcular_resumenes", cprofile=args.perfilar)
+    print("--- Iniciando pre-cálculo de resúmenes ---")
+
+    try:
+        almacen = almacen_enfermedades.AlmacenEnfermedades(args.almacen)
+    except FileNotFoundError:
+        print(f"Error: No se encontró el almacén '{args.almacen}'. Ejecuta antes '4_preparar_embeddings.py'.")
+        return
+    cache = resumenes.CacheResumenes(args.cache)
+    modelo = resumenes.nombre_modelo(args.backend)
+
+    # 1. Reutilizar lo que ya está en la caché y separar lo que hay que resumir
+    listos = []  # (fila, clave, resumen)
+    pendientes = []  # (fila, clave, texto)
+    for fila, id_enfermedad, secciones in almacen.secciones():
+        texto = secciones.get(resumenes.SECCION_RESUMEN)
+        if not texto:
+            continue
+        clave = resumenes.clave_resumen(id_enfermedad, texto, modelo, args.max_longitud, args.min_longitud)
+        if not resumenes.necesita_resumen(texto, args.min_longitud):
+            listos.append((fila, clave, texto))
+            continue
+        resumen = cache.buscar(clave)
+        if resumen is None:
+            pendientes.append((fila, clave, texto))
+        else:
+            listos.append((fila, clave, resumen))
+    print(f" {len(listos)} resúmenes listos o en caché, {len(pendientes)} por generar.")
+
+    # 2. Resumir lo pendiente por lotes
+    if pendientes:
+        print(f"Cargando el resumidor '{modelo}'... (Esto puede tardar unos minutos la primera vez)")
+        with perfilador.etapa("cargar_modelo"):
+            summarizer = resumenes.cargar_resumidor(args.backend)
+        tamano_bloque = args.tamano_lote * LOTES_POR_BLOQUE
+        for inicio in range(0, len(pendientes), tamano_bloque):
+            bloque = pendientes[inicio:inicio + tamano_bloque]
+            with perfilador.etapa("resumir", elementos=len(bloque)):
+                generados = resumenes.resumir_textos(summarizer, [texto for _, _, texto in bloque],
+                                                     args.max_longitud, args.min_longitud, args.tamano_lote)
+            for (fila, clave, _), resumen in zip(bloque, generados):
+                cache.guardar(clave, resumen)
+                listos.append((fila, clave, resumen))
+            print(f"  -> {min(inicio + tamano_bloque, len(pendientes))}/{len(pendientes)} resúmenes generados")
+
+    # 3. Guardar los resúmenes junto a cada enfermedad
+    with perfilador.etapa("guardar"):
+        almacen_enfermedades.guardar_resumenes(args.almacen, sorted(listos))
+    print(f"✓ {len(listos)} resúmenes guardados en '{args.almacen}'")
+    perfilador.anotar("resumenes", {"en_cache": cache.aciertos, "generados": len(pendientes), "modelo": modelo})
+    perfilador.escribir_reporte(args.reporte)
+
+    print("\n--- ¡Proceso completado con éxito! ---")
+
+if __name__ == "__main__":
+    main()
@@ -1,85 +1,149 @@
 import streamlit as st
 import pandas as pd
-from sentence_transformers import SentenceTransformer, util
-import torch
-from transformers import pipeline 
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+import functools
+import requests
+import resumenes
 
 # --- 1. CONFIGURACIÓN Y CONSTANTES ---
-DATA_FILE = 'processed_data.pkl'
-EMBEDDINGS_FILE = 'disease_embeddings.pt'
-MODEL_NAME = 'hiiamsid/sentence_similarity_spanish_es'
-SUMMARIZER_MODEL = 'facebook/bart-large-cnn' # El especialista en español
+# La búsqueda y los resúmenes los hace servicio_busqueda.py; la app no carga ningún modelo
+SEARCH_SERVICE_URL = 'http://127.0.0.1:8770'
+SEARCH_TIMEOUT = 30
+SUMMARY_TIMEOUT = 300 # La primera vez con BART, el servicio tiene que cargar el modelo
+SUMMARY_BACKEND = resumenes.BACKEND_POR_DEFECTO # El mismo con el que el paso 5 precalcula los resúmenes
+SUMMARIZER_MODEL = resumenes.nombre_modelo(SUMMARY_BACKEND)
+SUMMARY_CACHE_FILE = resumenes.ARCHIVO_CACHE
+SUMMARY_POLL_SECONDS = 0.5 # Cada cuánto se revisa si terminaron los resúmenes en segundo plano
 NUM_RESULTADOS = 5
 
 # --- 2. CARGA DE RECURSOS ---
 @st.cache_resource
-def load_model():
-    return SentenceTransformer(MODEL_NAME)
-
-@st.cache_data
-def load_data():
-    try:
-        return pd.read_pickle(DATA_FILE)
-    except FileNotFoundError:
-        return None
+def load_search_session():
+    """Sesión HTTP con keep-alive hacia el servicio de búsqueda."""
+    return requests.Session()
 
 @st.cache_resource
-def load_embeddings():
-    try:
-        return torch.load(EMBEDDINGS_FILE)
-    except FileNotFoundError:
-        return None
+def load_summary_cache():
+    return resumenes.CacheResumenes(SUMMARY_CACHE_FILE)
 
 @st.cache_resource
-def load_summarizer():
-    """Carga el pipeline de resumen una sola vez."""
-    return pipeline("summarization", model=SUMMARIZER_MODEL)
+def load_summary_executor():
+    """Un solo hilo de fondo para todas las sesiones: el servicio resume de uno en uno."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="resumenes")
 
 
 # --- 3. LÓGICA DEL NEGOCIO ---
-def find_similar_diseases_semantic(query, model, disease_embeddings, df):
-    """Busca enfermedades similares usando búsqueda semántica."""
-    if not query or disease_embeddings is None:
+def find_similar_diseases_semantic(query, session):
+    """Envía la consulta al servicio de búsqueda y devuelve sus resultados (con su similitud)."""
+    if not query:
         return pd.DataFrame()
-    query_embedding = model.encode(query, convert_to_tensor=True)
-    hits = util.semantic_search(query_embedding, disease_embeddings, top_k=NUM_RESULTADOS)
-    hits = hits[0] 
-    result_indices = [hit['corpus_id'] for hit in hits]
-    scores = [hit['score'] for hit in hits]
-    results_df = df.iloc[result_indices].copy()
-    results_df['similarity'] = scores
-    return results_df
+    response = session.post(f"{SEARCH_SERVICE_URL}/buscar", json={"consulta": query, "top_k": NUM_RESULTADOS},
+                            timeout=SEARCH_TIMEOUT)
+    response.raise_for_status()
+    return pd.DataFrame(response.json()["resultados"])
 
 def get_section_text(disease_data, section_title):
-    """Extrae el texto completo de una sección específica (ej. 'Descripción general')."""
-    all_sections = disease_data.get('sintomas_causas', []) + disease_data.get('diagnostico_tratamiento', [])
-    try:
-        seccion = next(s for s in all_sections if s.get('titulo', '').lower() == section_title.lower())
-        texto_completo = []
-        for item in seccion.get('contenido', []):
-            if item.get('tipo') == 'parrafo':
-                texto_completo.append(item.get('contenido', ''))
-            elif item.get('tipo') == 'lista':
-                texto_completo.extend([f"- {li}" for li in item.get('items', [])])
-        return "\n".join(texto_completo)
-    except (StopIteration, TypeError):
+    """Texto completo de una sección específica (ej. 'Descripción general'), ya armado en el paso 4."""
+    secciones = disease_data.get('secciones')
+    return secciones.get(section_title.lower()) if isinstance(secciones, dict) else None
+
+def summarize_remote(session, textos, max_length=resumenes.LONGITUD_MAXIMA,
+                     min_length=resumenes.LONGITUD_MINIMA, **kwargs):
+    """
+    Resumidor con la misma forma de llamarse que los de resumenes.py, pero que pide los
+    resúmenes al servicio (con el backend SUMMARY_BACKEND) en vez de cargar un modelo.
+    """
+    response = session.post(f"{SEARCH_SERVICE_URL}/resumir", timeout=SUMMARY_TIMEOUT, json={
+        "textos": textos, "backend": SUMMARY_BACKEND, "max_length": max_length, "min_length": min_length})
+    response.raise_for_status()
+    return [{"summary_text": summary} for summary in response.json()["resumenes"]]
+
+def lookup_summary(disease_data, text):
+    """
+    Devuelve (clave, resumen) con el resumen precalculado por el paso 5 si sigue vigente o, si no,
+    el de la caché persistente. El resumen es None si hay que generarlo.
+    """
+    clave = resumenes.clave_resumen(disease_data.get('id'), text, SUMMARIZER_MODEL)
+    precalculado = disease_data.get('resumen')
+    if isinstance(precalculado, dict) and precalculado.get('clave') == clave:
+        return clave, precalculado['texto']
+    if not resumenes.necesita_resumen(text):
+        return clave, text
+    return clave, load_summary_cache().buscar(clave)
+
+def start_summaries(results_df):
+    """
+    Envía al hilo de fondo, por lotes pequeños, los resúmenes que faltan para los resultados de
+    una búsqueda. Devuelve el trabajo (o None si no falta ninguno).
+    """
+    pendientes = {}
+    for _, row in results_df.iterrows():
+        desc_text = get_section_text(row, "Descripción general")
+        if desc_text:
+            clave, summary = lookup_summary(row, desc_text)
+            if summary is None:
+                pendientes[clave] = desc_text
+    if not pendientes:
         return None
+    summarizer = functools.partial(summarize_remote, load_search_session())
+    trabajo = resumenes.TrabajoResumenes(pendientes, lambda: summarizer, load_summary_cache())
+    return trabajo.enviar(load_summary_executor())
 
-def summarize_text(text, summarizer, max_length=150, min_length=40):
-    """Genera un resumen del texto si es suficientemente largo."""
-    if not text or len(text.split()) < min_length:
-        return text # Devuelve el original si es muy corto
-    summary = summarizer(text, max_length=max_length, min_length=min_length, do_sample=False)
-    return summary[0]['summary_text']
+def cancel_summaries():
+    """Cancela los resúmenes de la búsqueda anterior: sus resultados ya no se van a mostrar."""
+    trabajo = st.session_state.get('summary_job')
+    if trabajo is not None:
+        trabajo.cancelar()
+    st.session_state.summary_job = None
 
 
+def finished_summaries(summary_job):
+    """{clave: resumen} de un trabajo ya terminado; vacío si se canceló o falló."""
+    try:
+        return summary_job.futuro.result(timeout=0)
+    except CancelledError:
+        return {}
+    except Exception as e:
+        st.warning(f"No se pudieron generar los resúmenes: {e}")
+        return {}
+
+@st.fragment(run_every=SUMMARY_POLL_SECONDS)
+def pending_summary(summary_job):
+    """
+    Se vuelve a ejecutar sola mientras el trabajo sigue en marcha, sin bloquear la página: otra
+    búsqueda o "Nueva Consulta" se atienden enseguida. Al terminar, recarga la página para mostrarlo.
+    """
+    if summary_job.futuro.done():
+        st.rerun()
+    st.caption("Generando resumen...")
+
+def display_cache_stats(session):
+    """
+    Aciertos y fallos de las cachés de consultas del servicio, en la barra lateral. Se piden al
+    final de la ejecución, así que ya incluyen la búsqueda que se acaba de lanzar.
+    """
+    try:
+        response = session.get(f"{SEARCH_SERVICE_URL}/estadisticas", timeout=SEARCH_TIMEOUT)
+        response.raise_for_status()
+        stats = response.json()
+    except requests.RequestException:
+        return
+    with st.sidebar:
+        st.caption("Caché de consultas")
+        for name, key in (("Embeddings", "cache_embeddings"), ("Resultados", "cache_resultados")):
+            if stats.get(key):
+                st.caption(f"{name}: {stats[key]['aciertos']} aciertos, {stats[key]['fallos']} fallos "
+                           f"({stats[key]['entradas']} entradas)")
+
 def setup_page():
     st.set_page_config(page_title="Asistente de Diagnóstico Semántico", layout="wide")
     st.title("Asistente de Diagnóstico Semántico ")
 
-def display_results(results_df, summarizer):
-    """Ahora esta función también necesita el 'summarizer' para funcionar.
-     Muestra los resultados en la interfaz de Streamlit."""
+def display_results(results_df, summary_job=None):
+    """
+    Muestra los resultados en la interfaz de Streamlit. Los resúmenes que se están generando
+    en segundo plano aparecen en cuanto terminan, sin retrasar el resto de los resultados.
+    """
     if results_df is None:
         st.info("El asistente está listo para analizar tus síntomas.")
         return
@@ -87,6 +151,8 @@ def display_results(results_df, summarizer):
         st.warning("No se encontraron resultados para la búsqueda realizada.")
         return
 
+    # Si el trabajo ya terminó, sus resúmenes se muestran directamente (sin esperar a nada)
+    generados = finished_summaries(summary_job) if summary_job is not None and summary_job.futuro.done() else None
     for _, row in results_df.iterrows():
         similarity_score = row['similarity'] * 100
         st.subheader(f"{row['nombre']} ({similarity_score:.2f}% de similitud)")
@@ -95,9 +161,16 @@ def display_results(results_df, summarizer):
             desc_text = get_section_text(row, "Descripción general")
             if desc_text:
                 st.markdown("** Resumen General**")
-                with st.spinner("Generando resumen..."):
-                    summary = summarize_text(desc_text, summarizer)
-                st.write(summary)
+                clave, summary = lookup_summary(row, desc_text)
+                if summary is not None:
+                    st.write(summary)
+                elif summary_job is not None and clave in summary_job.pendientes:
+                    if generados is None:
+                        pending_summary(summary_job)
+                    else:
+                        st.write(generados.get(clave, desc_text))
+                else:
+                    st.write(desc_text)
                 st.markdown("---")
 
             # Información demográfica
@@ -113,25 +186,36 @@ def display_results(results_df, summarizer):
 def main():
     setup_page()
     
-    # Cargar todos los recursos, incluido el nuevo resumidor
-    model = load_model()
-    df = load_data()
-    disease_embeddings = load_embeddings()
-    summarizer = load_summarizer() # Cargamos el modelo de resumen
-    
-    if df is None or disease_embeddings is None:
-        st.error("Error: Faltan archivos de datos. Asegúrate de ejecutar `precompute_embeddings.py` primero.")
+    # El modelo de resumen solo se carga si hace falta un resumen no precalculado
+    session = load_search_session()
+    try:
+        session.get(f"{SEARCH_SERVICE_URL}/salud", timeout=SEARCH_TIMEOUT).raise_for_status()
+    except requests.RequestException:
+        st.error(f"Error: No se pudo conectar con el servicio de búsqueda en {SEARCH_SERVICE_URL}. "
+                 "Inícialo con `python servicio_busqueda.py`.")
         return
 
     if 'results' not in st.session_state:
         st.session_state.results = None
     if 'query_input' not in st.session_state:
         st.session_state.query_input = ""
+    if 'summary_job' not in st.session_state:
+        st.session_state.summary_job = None
 
     def trigger_search():
-        st.session_state.results = find_similar_diseases_semantic(st.session_state.query_input, model, disease_embeddings, df)
+        cancel_summaries()
+        try:
+            results = find_similar_diseases_semantic(st.session_state.query_input, session)
+        except requests.RequestException as e:
+            st.session_state.search_error = f"La búsqueda falló: {e}"
+            return
+        st.session_state.results = results
+        # Los resúmenes que falten se generan en segundo plano mientras se muestran los resultados
+        if not results.empty:
+            st.session_state.summary_job = start_summaries(results)
 
     def clear_search():
+        cancel_summaries()
         st.session_state.query_input = ""
         st.session_state.results = None
 
@@ -152,10 +236,12 @@ def main():
     st.markdown("---")
     st.subheader("2. Resultados del Análisis")
     
-    # Pasamos el 'summarizer' a la función que muestra los resultados
-    display_results(st.session_state.results, summarizer)
+    if st.session_state.get('search_error'):
+        st.error(st.session_state.pop('search_error'))
+    display_results(st.session_state.results, st.session_state.summary_job)
 
     st.markdown("---")
+    display_cache_stats(session)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,113 @@
+import json
+import os
+import sqlite3
+import threading
+
+"""
+Almacén de enfermedades para la app, en SQLite.
+La tabla 'enfermedades' guarda solo lo que se muestra en los resultados: nombre, url,
+demografía y el texto ya armado de cada sección. El registro completo (con las secciones
+crudas de 'sintomas_causas' y 'diagnostico_tratamiento') va en una tabla aparte y solo se
+lee si se pide. La tabla 'resumenes' la llena el paso 5 con el resumen precalculado de cada
+enfermedad. La fila de cada enfermedad es la misma que su fila en la matriz de
+embeddings, así que un resultado de la búsqueda se busca por clave primaria en O(1).
+"""
+
+ARCHIVO_ALMACEN = 'disease_data.sqlite'
+VERSION_ALMACEN = 1
+SECCIONES_CRUDAS = ['sintomas_causas', 'diagnostico_tratamiento']
+
+def texto_seccion(seccion):
+    """Concatena los párrafos y las listas de una sección (las listas con '- ' delante)."""
+    texto_completo = []
+    for item in seccion.get('contenido', []):
+        if item.get('tipo') == 'parrafo':
+            texto_completo.append(item.get('contenido', ''))
+        elif item.get('tipo') == 'lista':
+            texto_completo.extend([f"- {li}" for li in item.get('items', [])])
+    return "\n".join(texto_completo)
+
+def textos_secciones(enfermedad):
+    """{título en minúsculas: texto} de todas las secciones; si un título se repite, gana el primero."""
+    textos = {}
+    for nombre in SECCIONES_CRUDAS:
+        for seccion in enfermedad.get(nombre) or []:
+            if isinstance(seccion, dict) and seccion.get('titulo'):
+                textos.setdefault(seccion['titulo'].lower(), texto_seccion(seccion))
+    return textos
+
+def guardar_almacen(archivo, enfermedades):
+    """Escribe el almacén; la fila de cada enfermedad es su posición en 'enfermedades'."""
+    if os.path.exists(archivo + '.tmp'):
+        os.remove(archivo + '.tmp')
+    conexion = sqlite3.connect(archivo + '.tmp')
+    with conexion:
+        conexion.execute(f"PRAGMA user_version = {VERSION_ALMACEN}")
+        conexion.execute("CREATE TABLE enfermedades (fila INTEGER PRIMARY KEY, id TEXT, nombre TEXT, url TEXT, "
+                         "demografia TEXT, secciones TEXT)")
+        conexion.execute("CREATE TABLE registros (fila INTEGER PRIMARY KEY, registro TEXT)")
+        conexion.execute("CREATE TABLE resumenes (fila INTEGER PRIMARY KEY, clave TEXT, resumen TEXT)")
+        conexion.executemany("INSERT INTO enfermedades VALUES (?, ?, ?, ?, ?, ?)", (
+            (fila, enf.get('id'), enf.get('nombre'), enf.get('url'),
+             json.dumps(enf.get('demografia') or {}, ensure_ascii=False),
+             json.dumps(textos_secciones(enf), ensure_ascii=False))
+            for fila, enf in enumerate(enfermedades)))
+        conexion.executemany("INSERT INTO registros VALUES (?, ?)", (
+            (fila, json.dumps(enf, ensure_ascii=False, separators=(',', ':')))
+            for fila, enf in enumerate(enfermedades)))
+    conexion.close()
+    # Se escribe en un temporal y se renombra para que la app nunca abra un almacén a medias.
+    os.replace(archivo + '.tmp', archivo)
+
+def guardar_resumenes(archivo, resumenes):
+    """Reemplaza los resúmenes precalculados; 'resumenes' es una lista de (fila, clave, resumen)."""
+    conexion = sqlite3.connect(archivo)
+    with conexion:
+        conexion.execute("CREATE TABLE IF NOT EXISTS resumenes (fila INTEGER PRIMARY KEY, clave TEXT, resumen TEXT)")
+        conexion.execute("DELETE FROM resumenes")
+        conexion.executemany("INSERT INTO resumenes VALUES (?, ?, ?)", resumenes)
+    conexion.close()
+
+class AlmacenEnfermedades:
+    def __init__(self, archivo=ARCHIVO_ALMACEN):
+        if not os.path.exists(archivo):
+            raise FileNotFoundError(archivo)
+        # Solo lectura; la conexión se comparte entre los hilos de la app y se protege con un lock
+        self.conexion = sqlite3.connect(f"file:{archivo}?mode=ro", uri=True, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.total = self.conexion.execute("SELECT COUNT(*) FROM enfermedades").fetchone()[0]
+
+    def __len__(self):
+        return self.total
+
+    def obtener(self, filas):
+        """Datos resumidos de las filas pedidas, en el mismo orden (una fila inexistente se omite)."""
+        filas = [int(fila) for fila in filas]
+        if not filas:
+            return []
+        marcas = ",".join("?" * len(filas))
+        with self.lock:
+            resultado = self.conexion.execute(
+                "SELECT e.fila, e.id, e.nombre, e.url, e.demografia, e.secciones, r.clave, r.resumen "
+                f"FROM enfermedades e LEFT JOIN resumenes r ON r.fila = e.fila WHERE e.fila IN ({marcas})", filas).fetchall()
+        por_fila = {
+            fila: {"fila": fila, "id": id_enfermedad, "nombre": nombre, "url": url,
+                   "demografia": json.loads(demografia), "secciones": json.loads(secciones),
+                   "resumen": {"clave": clave, "texto": resumen} if clave else None}
+            for fila, id_enfermedad, nombre, url, demografia, secciones, clave, resumen in resultado
+        }
+        return [por_fila[fila] for fila in filas if fila in por_fila]
+
+    def secciones(self):
+        """Recorre (fila, id, secciones) de todas las enfermedades."""
+        with self.lock:
+            resultado = self.conexion.execute("SELECT fila, id, secciones FROM enfermedades ORDER BY fila").fetchall()
+        for fila, id_enfermedad, secciones in resultado:
+            yield fila, id_enfermedad, json.loads(secciones)
+
+    def registro_completo(self, fila):
+        """Registro original completo de la enfermedad (con las secciones crudas), o None."""
+        with self.lock:
+            resultado = self.conexion.execute("SELECT registro FROM registros WHERE fila = ?", (int(fila),)).fetchone()
+        return json.loads(resultado[0]) if resultado else None
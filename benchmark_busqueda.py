@@ -0,0 +1,116 @@
+from sentence_transformers import util
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import torch
+from indice_ann import IndiceIVF
+from matriz_embeddings import MatrizEmbeddings, normalizar
+
+"""
+Benchmark de la búsqueda semántica aproximada (IVF) frente a la exacta.
+Sobre la matriz de embeddings del paso 4 (opcionalmente multiplicada con copias ruidosas para
+simular un corpus mayor) lanza consultas una a una y reporta:
+- latencia p50 / p99 de util.semantic_search (la referencia exacta),
+- latencia p50 / p99 y recall@k del índice IVF para cada número de sondas.
+Las consultas son filas del corpus con ruido, así que no hace falta cargar el modelo.
+"""
+
+ARCHIVO_MATRIZ = 'disease_embeddings.emb'
+ARCHIVO_MATRIZ_ANTERIOR = 'disease_embeddings.pt'
+SONDAS = [1, 2, 4, 8, 16, 32]
+RUIDO_CONSULTAS = 0.05
+RUIDO_COPIAS = 0.03
+
+def cargar_matriz(archivo):
+    if archivo.endswith('.pt'):
+        embeddings = torch.load(archivo, map_location='cpu').numpy()
+        return MatrizEmbeddings.desde_arreglo(embeddings, "", range(len(embeddings)))
+    return MatrizEmbeddings.abrir(archivo)
+
+def multiplicar_corpus(matriz, veces, semilla=0):
+    """Corpus 'veces' más grande: cada fila original más copias con ruido (como documentos parecidos)."""
+    if veces <= 1:
+        return matriz
+    rng = np.random.default_rng(semilla)
+    base = matriz.filas()
+    copias = [base] + [base + rng.normal(0, RUIDO_COPIAS, base.shape).astype(np.float32) for _ in range(veces - 1)]
+    return MatrizEmbeddings.desde_arreglo(np.concatenate(copias), matriz.modelo, range(len(base) * veces))
+
+def generar_consultas(matriz, cantidad, semilla=1):
+    rng = np.random.default_rng(semilla)
+    filas = matriz.vectores(np.sort(rng.choice(len(matriz), cantidad, replace=False)))
+    return normalizar(filas + rng.normal(0, RUIDO_CONSULTAS, filas.shape).astype(np.float32))
+
+def percentiles_ms(latencias):
+    return {"p50_ms": round(float(np.percentile(latencias, 50)) * 1000, 3),
+            "p99_ms": round(float(np.percentile(latencias, 99)) * 1000, 3)}
+
+def medir(buscar, consultas):
+    """Lanza las consultas una a una y devuelve (ids de cada resultado, latencias en segundos)."""
+    buscar(consultas[0])  # calentamiento
+    ids, latencias = [], []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        hits = buscar(consulta)
+        latencias.append(time.perf_counter() - inicio)
+        ids.append([hit["corpus_id"] for hit in hits])
+    return ids, latencias
+
+def ejecutar_benchmark(matriz, consultas, top_k, sondas, listas=None):
+    corpus = torch.from_numpy(np.ascontiguousarray(matriz.filas()))
+    exactos, latencias = medir(lambda q: util.semantic_search(torch.from_numpy(q), corpus, top_k=top_k)[0], consultas)
+    metricas = {"filas": len(matriz), "consultas": len(consultas), "top_k": top_k,
+                "exacta": percentiles_ms(latencias)}
+
+    inicio = time.perf_counter()
+    indice = IndiceIVF.construir(matriz, listas)
+    metricas["ivf"] = {"listas": indice.cabecera["listas"], "segundos_construccion": round(time.perf_counter() - inicio, 3),
+                       "por_sondas": {}}
+    for n in sondas:
+        aproximados, latencias = medir(lambda q: indice.buscar(matriz, q, top_k, n)[0], consultas)
+        recall = np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(aproximados, exactos) if e])
+        metricas["ivf"]["por_sondas"][n] = {f"recall@{top_k}": round(float(recall), 4), **percentiles_ms(latencias)}
+    return metricas
+
+def parsear_argumentos():
+    parser = argparse.ArgumentParser(description="Benchmark de la búsqueda aproximada (IVF) frente a util.semantic_search.")
+    parser.add_argument("--matriz", default=None,
+                        help=f"Matriz de embeddings (por defecto '{ARCHIVO_MATRIZ}' o, si no existe, '{ARCHIVO_MATRIZ_ANTERIOR}').")
+    parser.add_argument("--multiplicar", type=int, default=1,
+                        help="Multiplica el corpus con copias ruidosas de cada fila para simular un corpus mayor.")
+    parser.add_argument("--consultas", type=int, default=200, help="Consultas que se lanzan.")
+    parser.add_argument("--top-k", type=int, default=5, help="Resultados por consulta.")
+    parser.add_argument("--sondas", default=",".join(map(str, SONDAS)),
+                        help="Valores de sondas a probar, separados por comas.")
+    parser.add_argument("--listas", type=int, default=None,
+                        help="Listas del índice IVF (por defecto, la raíz cuadrada del número de filas).")
+    parser.add_argument("--salida-json", default=None,
+                        help="Si se indica, guarda las métricas en este archivo.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parsear_argumentos()
+    archivo = args.matriz or (ARCHIVO_MATRIZ if os.path.exists(ARCHIVO_MATRIZ) else ARCHIVO_MATRIZ_ANTERIOR)
+    if not os.path.exists(archivo):
+        print(f"Error: No se encontró la matriz de embeddings '{archivo}'.")
+        sys.exit(1)
+
+    matriz = multiplicar_corpus(cargar_matriz(archivo), args.multiplicar)
+    consultas = generar_consultas(matriz, min(args.consultas, len(matriz)))
+    print(f"Corpus: {len(matriz)} filas de '{archivo}' (x{args.multiplicar}), {len(consultas)} consultas.")
+    metricas = ejecutar_benchmark(matriz, consultas, args.top_k, [int(n) for n in args.sondas.split(',')], args.listas)
+
+    print("\n=== RESULTADOS ===")
+    print(f"Exacta (util.semantic_search): p50 {metricas['exacta']['p50_ms']} ms, p99 {metricas['exacta']['p99_ms']} ms")
+    print(f"IVF con {metricas['ivf']['listas']} listas (construido en {metricas['ivf']['segundos_construccion']} s):")
+    for n, resultado in metricas["ivf"]["por_sondas"].items():
+        print(f"  - {n} sondas: recall@{args.top_k} {resultado[f'recall@{args.top_k}']}, "
+              f"p50 {resultado['p50_ms']} ms, p99 {resultado['p99_ms']} ms")
+
+    if args.salida_json:
+        with open(args.salida_json, 'w', encoding='utf-8') as f:
+            json.dump(metricas, f, ensure_ascii=False, indent=4)
+        print(f"Métricas guardadas en '{args.salida_json}'")
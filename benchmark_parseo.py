@@ -0,0 +1,193 @@
+from bs4 import BeautifulSoup
+from collections import defaultdict
+import argparse
+import contextlib
+import glob
+import importlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+"""
+Benchmark sin conexión del parseo de páginas de enfermedades.
+Reproduce el camino completo de extracción del paso 2 (BeautifulSoup + extraer_secciones_pagina
++ extraer_contenido_seccion + extraer_departamentos) sobre un corpus de páginas grabadas y reporta:
+- páginas por segundo,
+- tiempo acumulado por función,
+- pico de memoria (tracemalloc).
+Además compara lo extraído con una salida de referencia ("golden") para que una optimización
+no cambie el resultado sin que nos demos cuenta.
+"""
+
+# El nombre del script empieza con un número, por eso se importa con importlib
+scraper = importlib.import_module("2_scrape_detalles_enfermedades")
+
+DIRECTORIO_CORPUS = 'fixtures'
+ARCHIVO_GOLDEN = os.path.join('fixtures', 'golden_parseo.json')
+PESTANAS = ["symptoms-causes", "diagnosis-treatment", "doctors-departments"]
+FUNCIONES_MEDIDAS = ["extraer_secciones_pagina", "extraer_contenido_seccion", "extraer_departamentos"]
+PARSER_HTML = 'lxml'
+
+def cargar_corpus(directorio):
+    """
+    Devuelve [(ruta relativa, html)] de las páginas del corpus.
+    En la carpeta de fixtures solo se usan las pestañas de enfermedades (no el índice A-Z);
+    en cualquier otra carpeta (p. ej. 'cache_paginas/html') se usan todos los .html.
+    """
+    paginas = []
+    for ruta in sorted(glob.glob(os.path.join(directorio, '**', '*.html'), recursive=True)):
+        if os.path.normpath(directorio) == os.path.normpath(DIRECTORIO_CORPUS):
+            if os.path.basename(os.path.dirname(ruta)) not in PESTANAS:
+                continue
+        with open(ruta, 'r', encoding='utf-8') as f:
+            paginas.append((os.path.relpath(ruta, directorio).replace(os.sep, '/'), f.read()))
+    return paginas
+
+def extraer_pagina(html):
+    """Camino completo de parseo de una página, igual que en el scraper."""
+    soup = BeautifulSoup(html, PARSER_HTML)
+    return {
+        "sintomas_causas": scraper.extraer_secciones_pagina(soup, scraper.SECCIONES_SINTOMAS_CAUSAS),
+        "diagnostico_tratamiento": scraper.extraer_secciones_pagina(soup, scraper.SECCIONES_DIAGNOSTICO_TRATAMIENTO),
+        "departamentos": scraper.extraer_departamentos(soup)
+    }
+
+@contextlib.contextmanager
+def medir_funciones(tiempos, llamadas):
+    """
+    Sustituye temporalmente las funciones del scraper por versiones que acumulan su tiempo.
+    Los tiempos son inclusivos: el de extraer_secciones_pagina incluye el de extraer_contenido_seccion.
+    """
+    originales = {nombre: getattr(scraper, nombre) for nombre in FUNCIONES_MEDIDAS}
+
+    def envolver(nombre, funcion):
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                tiempos[nombre] += time.perf_counter() - inicio
+                llamadas[nombre] += 1
+        return medida
+
+    for nombre, funcion in originales.items():
+        setattr(scraper, nombre, envolver(nombre, funcion))
+    try:
+        yield
+    finally:
+        for nombre, funcion in originales.items():
+            setattr(scraper, nombre, funcion)
+
+def ejecutar_benchmark(paginas, repeticiones):
+    """Parsea el corpus 'repeticiones' veces y devuelve (métricas, salidas de la última vuelta)."""
+    tiempos = defaultdict(float)
+    llamadas = defaultdict(int)
+    salidas = {}
+
+    # Los print del scraper se descartan para no medir la consola
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Pasada de calentamiento (imports perezosos, cachés de expresiones regulares)
+        for _, html in paginas:
+            extraer_pagina(html)
+
+        with medir_funciones(tiempos, llamadas):
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                for ruta, html in paginas:
+                    t0 = time.perf_counter()
+                    BeautifulSoup(html, PARSER_HTML)
+                    tiempos["BeautifulSoup"] += time.perf_counter() - t0
+                    salidas[ruta] = extraer_pagina(html)
+            total = time.perf_counter() - inicio
+
+        # La memoria se mide en una pasada aparte: tracemalloc ralentiza mucho el parseo
+        tracemalloc.start()
+        for _, html in paginas:
+            extraer_pagina(html)
+        _, pico_memoria = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    # El árbol se construye dos veces por página (medición aislada + camino completo)
+    total_paginas = len(paginas) * repeticiones
+    tiempo_camino = total - tiempos["BeautifulSoup"]
+    metricas = {
+        "paginas": len(paginas),
+        "repeticiones": repeticiones,
+        "segundos_totales": round(tiempo_camino, 4),
+        "paginas_por_segundo": round(total_paginas / tiempo_camino, 2) if tiempo_camino else None,
+        "tiempo_por_funcion_ms": {
+            nombre: round(tiempos[nombre] * 1000 / total_paginas, 3)
+            for nombre in ["BeautifulSoup"] + FUNCIONES_MEDIDAS
+        },
+        "llamadas_por_pagina": {
+            nombre: round(llamadas[nombre] / total_paginas, 2) for nombre in FUNCIONES_MEDIDAS
+        },
+        "pico_memoria_mb": round(pico_memoria / 1024 / 1024, 2)
+    }
+    return metricas, salidas
+
+def comparar_golden(salidas, archivo_golden):
+    """Devuelve la lista de páginas cuya salida difiere de la referencia."""
+    with open(archivo_golden, 'r', encoding='utf-8') as f:
+        golden = json.load(f)
+    diferencias = [ruta for ruta in sorted(set(golden) | set(salidas)) if golden.get(ruta) != salidas.get(ruta)]
+    return diferencias
+
+def parsear_argumentos():
+    parser = argparse.ArgumentParser(description="Benchmark sin conexión del parseo de páginas de enfermedades.")
+    parser.add_argument("--corpus", default=DIRECTORIO_CORPUS,
+                        help="Carpeta con las páginas grabadas (por defecto, 'fixtures').")
+    parser.add_argument("--repeticiones", type=int, default=50,
+                        help="Veces que se parsea el corpus completo.")
+    parser.add_argument("--golden", default=ARCHIVO_GOLDEN,
+                        help="Salida de referencia contra la que se compara lo extraído.")
+    parser.add_argument("--actualizar-golden", action="store_true",
+                        help="Sobrescribe la salida de referencia con la extracción actual.")
+    parser.add_argument("--salida-json", default=None,
+                        help="Si se indica, guarda las métricas en este archivo.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parsear_argumentos()
+    paginas = cargar_corpus(args.corpus)
+    if not paginas:
+        print(f"Error: No se encontraron páginas en '{args.corpus}'.")
+        sys.exit(1)
+
+    print(f"Corpus: {len(paginas)} páginas de '{args.corpus}', {args.repeticiones} repeticiones.")
+    metricas, salidas = ejecutar_benchmark(paginas, args.repeticiones)
+
+    print("\n=== RESULTADOS ===")
+    print(f"Páginas por segundo: {metricas['paginas_por_segundo']}")
+    print(f"Pico de memoria: {metricas['pico_memoria_mb']} MB")
+    print("Tiempo medio por página (ms):")
+    for nombre, ms in metricas["tiempo_por_funcion_ms"].items():
+        print(f"  - {nombre}: {ms}")
+
+    if args.actualizar_golden:
+        with open(args.golden, 'w', encoding='utf-8') as f:
+            json.dump(salidas, f, ensure_ascii=False, indent=4)
+        print(f"\nSalida de referencia actualizada en '{args.golden}'")
+        metricas["golden"] = "actualizado"
+    elif os.path.exists(args.golden):
+        diferencias = comparar_golden(salidas, args.golden)
+        metricas["golden"] = "ok" if not diferencias else diferencias
+        if diferencias:
+            print(f"\n¡Atención! La extracción cambió en {len(diferencias)} páginas respecto a '{args.golden}':")
+            for ruta in diferencias:
+                print(f"  - {ruta}")
+        else:
+            print(f"\nLa extracción coincide con la salida de referencia '{args.golden}'.")
+    else:
+        print(f"\nNo existe '{args.golden}'; usa --actualizar-golden para crearla.")
+
+    if args.salida_json:
+        with open(args.salida_json, 'w', encoding='utf-8') as f:
+            json.dump(metricas, f, ensure_ascii=False, indent=4)
+        print(f"Métricas guardadas en '{args.salida_json}'")
+
+    if isinstance(metricas.get("golden"), list):
+        sys.exit(1)
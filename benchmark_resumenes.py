@@ -0,0 +1,113 @@
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+import numpy as np
+import almacen_enfermedades
+import perfilador
+import resumenes
+
+"""
+Benchmark de los backends de resumen (extractivo y BART) sobre las 'Descripción general' del
+almacén. Cada backend se mide en un proceso nuevo para que la memoria de uno no cuente en el
+otro. En ese proceso primero se carga el modelo de la búsqueda (la app siempre lo tiene cargado)
+y luego el resumidor, y se reporta:
+- segundos de carga y memoria (pico RSS) que el resumidor añade sobre el modelo de la búsqueda,
+- latencia p50 / p99 de resumir los resultados de una búsqueda (NUM_RESULTADOS textos juntos),
+- textos por segundo resumiendo todo el conjunto por lotes, como el paso 5.
+"""
+
+# --- CONFIGURACIÓN ---
+NUM_RESULTADOS = 5  # textos que resume la app por búsqueda
+
+def cargar_textos(archivo, cantidad):
+    almacen = almacen_enfermedades.AlmacenEnfermedades(archivo)
+    textos = [secciones.get(resumenes.SECCION_RESUMEN) for _, _, secciones in almacen.secciones()]
+    return [texto for texto in textos if texto and resumenes.necesita_resumen(texto)][:cantidad]
+
+def percentiles_ms(latencias):
+    return {"p50_ms": round(float(np.percentile(latencias, 50)) * 1000, 1),
+            "p99_ms": round(float(np.percentile(latencias, 99)) * 1000, 1)}
+
+def medir_backend(backend, textos, tamano_lote):
+    """Se ejecuta en un proceso aparte: devuelve las métricas de un backend."""
+    from sentence_transformers import SentenceTransformer
+    modelo_busqueda = SentenceTransformer(resumenes.MODELO_ORACIONES)
+    rss_busqueda = perfilador.pico_rss_mb()
+
+    inicio = time.perf_counter()
+    summarizer = resumenes.cargar_resumidor(backend, modelo_busqueda)
+    segundos_carga = time.perf_counter() - inicio
+    resumenes.resumir_textos(summarizer, textos[:1])  # calentamiento
+
+    latencias = []
+    for i in range(0, len(textos), NUM_RESULTADOS):
+        inicio = time.perf_counter()
+        resumenes.resumir_textos(summarizer, textos[i:i + NUM_RESULTADOS], batch_size=tamano_lote)
+        latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    generados = resumenes.resumir_textos(summarizer, textos, batch_size=tamano_lote)
+    segundos_total = time.perf_counter() - inicio
+
+    palabras = [len(resumen.split()) for resumen in generados]
+    rss_total = perfilador.pico_rss_mb()
+    return {"backend": backend, "modelo": resumenes.nombre_modelo(backend),
+            "segundos_carga": round(segundos_carga, 2),
+            "pico_rss_busqueda_mb": rss_busqueda, "pico_rss_total_mb": rss_total,
+            "rss_adicional_mb": round(rss_total - rss_busqueda, 1) if rss_total is not None else None,
+            "por_busqueda": percentiles_ms(latencias),
+            "textos_por_segundo": round(len(textos) / segundos_total, 2),
+            "palabras_resumen_media": round(float(np.mean(palabras)), 1)}
+
+def parsear_argumentos():
+    parser = argparse.ArgumentParser(description="Compara latencia y memoria de los backends de resumen.")
+    parser.add_argument("--almacen", default=almacen_enfermedades.ARCHIVO_ALMACEN,
+                        help="Almacén SQLite generado por el paso 4.")
+    parser.add_argument("--backends", default=",".join(resumenes.BACKENDS_RESUMEN),
+                        help="Backends a comparar, separados por comas.")
+    parser.add_argument("--textos", type=int, default=50, help="Textos a resumir.")
+    parser.add_argument("--tamano-lote", type=int, default=resumenes.TAMANO_LOTE,
+                        help="Textos que el modelo resume a la vez.")
+    parser.add_argument("--salida-json", default=None,
+                        help="Si se indica, guarda las métricas en este archivo.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parsear_argumentos()
+    try:
+        textos = cargar_textos(args.almacen, args.textos)
+    except FileNotFoundError:
+        print(f"Error: No se encontró el almacén '{args.almacen}'. Ejecuta antes '4_preparar_embeddings.py'.")
+        sys.exit(1)
+    if not textos:
+        print("Error: El almacén no tiene descripciones lo bastante largas para resumir.")
+        sys.exit(1)
+    print(f"{len(textos)} descripciones de '{args.almacen}'.")
+
+    metricas = []
+    contexto = multiprocessing.get_context("spawn")
+    for backend in args.backends.split(','):
+        print(f"Midiendo el backend '{backend}'...")
+        # Un proceso por backend (maxtasksperchild=1): el pico de memoria de cada uno es independiente
+        with contexto.Pool(1, maxtasksperchild=1) as pool:
+            try:
+                metricas.append(pool.apply(medir_backend, (backend, textos, args.tamano_lote)))
+            except Exception as e:
+                print(f"  -> No se pudo medir '{backend}': {e}")
+
+    print("\n=== RESULTADOS ===")
+    for resultado in metricas:
+        print(f"{resultado['backend']} ({resultado['modelo']}):")
+        print(f"  - carga {resultado['segundos_carga']} s, +{resultado['rss_adicional_mb']} MB sobre el modelo de la búsqueda "
+              f"({resultado['pico_rss_total_mb']} MB en total)")
+        print(f"  - por búsqueda ({NUM_RESULTADOS} textos): p50 {resultado['por_busqueda']['p50_ms']} ms, "
+              f"p99 {resultado['por_busqueda']['p99_ms']} ms")
+        print(f"  - por lotes: {resultado['textos_por_segundo']} textos/s, "
+              f"{resultado['palabras_resumen_media']} palabras por resumen")
+
+    if args.salida_json:
+        with open(args.salida_json, 'w', encoding='utf-8') as f:
+            json.dump(metricas, f, ensure_ascii=False, indent=4)
+        print(f"Métricas guardadas en '{args.salida_json}'")
@@ -0,0 +1,122 @@
+import numpy as np
+import torch
+from indice_ann import IndiceIVF
+from matriz_embeddings import MatrizEmbeddings
+from normalizacion_texto import normalizar_consulta
+
+"""
+Búsqueda semántica de enfermedades, independiente de la interfaz (la usa servicio_busqueda.py).
+- buscar_lote recibe varias consultas a la vez: las que no están en caché se codifican juntas
+  en una sola llamada al modelo y, en la búsqueda exacta, se puntúan con un solo producto de
+  matrices contra la matriz de embeddings.
+- El embedding de cada consulta se guarda por su texto normalizado (como en el paso 3) y la
+  lista de sus MAXIMO_TOP_K mejores resultados, además, por versión de la matriz y método de
+  búsqueda (sin el top_k: cada petición se queda con los primeros que pidió).
+- resultados completa cada resultado con los datos de la enfermedad del almacén.
+"""
+
+# --- CONFIGURACIÓN ---
+MODELO = 'hiiamsid/sentence_similarity_spanish_es'
+ARCHIVO_MATRIZ = 'disease_embeddings.emb'
+ARCHIVO_MATRIZ_ANTERIOR = 'disease_embeddings.pt'
+ARCHIVO_INDICE_ANN = 'disease_embeddings.ivf'
+SONDAS_ANN = 8 # Listas del índice que se revisan por consulta: más sondas, más recall y más latencia
+NUM_RESULTADOS = 5
+MAXIMO_TOP_K = 50 # resultados que se guardan por consulta: cualquier top_k menor sale de la misma entrada
+
+def cargar_matriz(archivo=ARCHIVO_MATRIZ, archivo_anterior=ARCHIVO_MATRIZ_ANTERIOR):
+    """Abre la matriz con memoria mapeada; si no existe, usa el tensor del formato anterior."""
+    try:
+        return MatrizEmbeddings.abrir(archivo)
+    except FileNotFoundError:
+        pass
+    # Formato anterior: el tensor de PyTorch se carga entero en memoria
+    embeddings = torch.load(archivo_anterior, map_location='cpu')
+    return MatrizEmbeddings.desde_arreglo(embeddings.numpy(), MODELO, range(len(embeddings)))
+
+def cargar_indice_ann(matriz, archivo=ARCHIVO_INDICE_ANN):
+    """Índice aproximado opcional; solo se usa si se construyó sobre la misma matriz."""
+    try:
+        indice = IndiceIVF.abrir(archivo)
+    except FileNotFoundError:
+        return None
+    return indice if indice.corresponde_a(matriz) else None
+
+class MotorBusqueda:
+    def __init__(self, modelo, matriz, almacen, indice_ann=None, sondas=SONDAS_ANN,
+                 cache_embeddings=None, cache_resultados=None):
+        self.modelo = modelo
+        self.matriz = matriz
+        self.almacen = almacen
+        self.indice_ann = indice_ann
+        self.sondas = sondas
+        self.cache_embeddings = cache_embeddings
+        self.cache_resultados = cache_resultados
+        self.metodo = f"ivf:{sondas}" if indice_ann is not None else "exacta"
+
+    @property
+    def version(self):
+        """Cambia cada vez que el paso 4 escribe la matriz: los resultados guardados dejan de servir."""
+        return self.matriz.cabecera.get("version")
+
+    def buscar_lote(self, consultas, top_k=NUM_RESULTADOS):
+        """
+        Devuelve, por cada consulta, la lista de los 'top_k' resultados como
+        {"corpus_id": fila, "score": similitud}, igual que MatrizEmbeddings.buscar.
+        """
+        normalizadas = [normalizar_consulta(consulta) or consulta.strip() for consulta in consultas]
+        claves = [(self.version, self.metodo, normalizada) for normalizada in normalizadas]
+        # Con caché se guardan siempre los MAXIMO_TOP_K mejores, pida cada consulta los que pida
+        top_k_busqueda = max(top_k, MAXIMO_TOP_K) if self.cache_resultados is not None else top_k
+        hits = [self.cache_resultados.buscar(clave) if self.cache_resultados is not None else None for clave in claves]
+        faltan = [i for i, hit in enumerate(hits) if hit is None]
+        if faltan:
+            vectores = self.codificar([consultas[i] for i in faltan], [normalizadas[i] for i in faltan])
+            if self.indice_ann is not None:
+                nuevos = self.indice_ann.buscar(self.matriz, vectores, top_k=top_k_busqueda, sondas=self.sondas)
+            else:
+                # Las filas están normalizadas: todo el lote se puntúa con un solo producto de matrices
+                nuevos = self.matriz.buscar(vectores, top_k=top_k_busqueda)
+            for i, hit in zip(faltan, nuevos):
+                hits[i] = hit
+                if self.cache_resultados is not None:
+                    self.cache_resultados.guardar(claves[i], hit)
+        return [hit[:top_k] for hit in hits]
+
+    def codificar(self, consultas, normalizadas):
+        """
+        Embeddings de las consultas (matriz consultas x dimensión). Las que no están en la caché
+        se codifican juntas en una sola llamada; las que solo difieren en mayúsculas, tildes,
+        puntuación o espacios comparten el embedding de la primera que se codificó.
+        """
+        vectores = [self.cache_embeddings.buscar(normalizada) if self.cache_embeddings is not None else None
+                    for normalizada in normalizadas]
+        pendientes = {}
+        for consulta, normalizada, vector in zip(consultas, normalizadas, vectores):
+            if vector is None:
+                pendientes.setdefault(normalizada, consulta)
+        if pendientes:
+            codificados = self.modelo.encode(list(pendientes.values()), batch_size=len(pendientes),
+                                             convert_to_numpy=True, show_progress_bar=False)
+            nuevos = dict(zip(pendientes, codificados))
+            if self.cache_embeddings is not None:
+                for normalizada, vector in nuevos.items():
+                    self.cache_embeddings.guardar(normalizada, vector)
+            vectores = [nuevos[normalizada] if vector is None else vector
+                        for normalizada, vector in zip(normalizadas, vectores)]
+        return np.stack(vectores)
+
+    def resultados(self, hits):
+        """Datos de la enfermedad de cada resultado (del almacén) con su 'similarity', en el mismo orden."""
+        similitudes = {hit['corpus_id']: hit['score'] for hit in hits}
+        enfermedades = self.almacen.obtener([hit['corpus_id'] for hit in hits])
+        for enfermedad in enfermedades:
+            enfermedad['similarity'] = similitudes[enfermedad['fila']]
+        return enfermedades
+
+    def estadisticas(self):
+        return {
+            "version": self.version, "filas": len(self.matriz), "metodo": self.metodo,
+            "cache_embeddings": self.cache_embeddings.estadisticas() if self.cache_embeddings is not None else None,
+            "cache_resultados": self.cache_resultados.estadisticas() if self.cache_resultados is not None else None,
+        }
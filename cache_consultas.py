@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import OrderedDict
+
+"""
+Caché LRU en memoria, con caducidad, para las consultas de la app.
+La app usa dos: el embedding de cada consulta (por su texto normalizado, así que una consulta
+repetida no vuelve a pasar por el modelo) y la lista de resultados (por versión de la base
+de conocimiento, método de búsqueda y texto normalizado). Cuenta aciertos y fallos para
+mostrarlos en la app.
+"""
+
+# --- CONFIGURACIÓN ---
+MAXIMO_ENTRADAS = 1024
+SEGUNDOS_VIGENCIA = 3600
+
+class CacheConsultas:
+    def __init__(self, maximo_entradas=MAXIMO_ENTRADAS, segundos_vigencia=SEGUNDOS_VIGENCIA):
+        self.maximo_entradas = maximo_entradas
+        self.segundos_vigencia = segundos_vigencia
+        # clave -> (valor, instante en que se guardó); el orden es el del último uso
+        self.entradas = OrderedDict()
+        # Las sesiones de Streamlit corren en hilos distintos y comparten la caché
+        self.lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def __len__(self):
+        return len(self.entradas)
+
+    def buscar(self, clave):
+        """Devuelve el valor guardado, o None si no está o ya caducó."""
+        with self.lock:
+            entrada = self.entradas.get(clave)
+            if entrada is not None and time.monotonic() - entrada[1] > self.segundos_vigencia:
+                del self.entradas[clave]
+                entrada = None
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self.entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[0]
+
+    def guardar(self, clave, valor):
+        with self.lock:
+            self.entradas[clave] = (valor, time.monotonic())
+            self.entradas.move_to_end(clave)
+            # Se descartan los menos usados recientemente si se supera el máximo
+            while len(self.entradas) > self.maximo_entradas:
+                self.entradas.popitem(last=False)
+
+    def estadisticas(self):
+        with self.lock:
+            consultas = self.aciertos + self.fallos
+            return {"aciertos": self.aciertos, "fallos": self.fallos, "entradas": len(self.entradas),
+                    "tasa_aciertos": round(self.aciertos / consultas, 3) if consultas else 0.0}
@@ -0,0 +1,69 @@
+import hashlib
+import os
+import torch
+
+"""
+Caché persistente de embeddings del paso 4.
+Cada vector se guarda con la clave (modelo, hash del texto de síntomas): en la siguiente
+ejecución solo se codifican los textos nuevos o modificados y la matriz final se arma con
+las filas guardadas. Los vectores de cada modelo se guardan juntos en un único tensor, así
+que cambiar de modelo no mezcla ni invalida los vectores de otro.
+"""
+
+ARCHIVO_CACHE = '4_cache_embeddings.pt'
+VERSION_CACHE = 1
+
+def hash_texto(texto):
+    """Hash SHA-256 del texto que se codifica."""
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+class CacheEmbeddings:
+    def __init__(self, archivo=ARCHIVO_CACHE, modelo=""):
+        self.archivo = archivo
+        self.modelo = modelo
+        self.modelos = {}
+        self.filas = {}
+        self.vectores = None
+        # Solo se vuelven a escribir los vectores usados en esta ejecución
+        self.vigentes = {}
+        self.reutilizados = 0
+        self.codificados = 0
+        try:
+            datos = torch.load(archivo, map_location='cpu')
+            if datos.get("version") == VERSION_CACHE:
+                self.modelos = datos["modelos"]
+            else:
+                print(f"La caché '{archivo}' es de otra versión; se codificará todo de nuevo.")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Advertencia: La caché '{archivo}' está dañada; se ignora. ({e})")
+        if modelo in self.modelos:
+            guardado = self.modelos[modelo]
+            self.filas = {hash_vector: fila for fila, hash_vector in enumerate(guardado["hashes"])}
+            self.vectores = guardado["vectores"]
+
+    def buscar(self, hash_vector):
+        """Devuelve el vector guardado para el texto con ese hash, o None."""
+        if hash_vector in self.vigentes:
+            return self.vigentes[hash_vector]
+        fila = self.filas.get(hash_vector)
+        if fila is None:
+            return None
+        self.vigentes[hash_vector] = self.vectores[fila]
+        self.reutilizados += 1
+        return self.vigentes[hash_vector]
+
+    def guardar(self, hash_vector, vector):
+        self.vigentes[hash_vector] = vector.detach().cpu()
+        self.codificados += 1
+
+    def escribir(self):
+        if self.vigentes:
+            hashes = list(self.vigentes)
+            self.modelos[self.modelo] = {"hashes": hashes, "vectores": torch.stack([self.vigentes[h] for h in hashes])}
+        else:
+            self.modelos.pop(self.modelo, None)
+        # Se escribe en un temporal y se renombra para no dejar la caché a medias.
+        torch.save({"version": VERSION_CACHE, "modelos": self.modelos}, self.archivo + '.tmp')
+        os.replace(self.archivo + '.tmp', self.archivo)
@@ -0,0 +1,113 @@
+from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+
+"""
+Caché en disco de las páginas descargadas por el scraper de detalles.
+- El HTML se guarda por contenido: 'html/<hash>.html', así una página idéntica se guarda una sola vez.
+- Cada enfermedad tiene una entrada 'entradas/<id>.json' con, por pestaña, la URL, los
+  validadores HTTP (ETag / Last-Modified), el hash del contenido y lo que se extrajo de ella.
+Con esta información se hacen peticiones condicionales y las páginas sin cambios no se
+descargan ni se vuelven a parsear. Al final se escribe un manifiesto con los ids modificados.
+"""
+
+DIRECTORIO_CACHE = 'cache_paginas'
+
+def hash_contenido(html):
+    """Hash SHA-256 del contenido de una página."""
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+class CachePaginas:
+    def __init__(self, directorio=DIRECTORIO_CACHE, version_extraccion=1):
+        """
+        'version_extraccion' debe incrementarse cuando cambia la lógica de extracción: las
+        páginas guardadas con otra versión se vuelven a parsear desde el HTML en caché.
+        """
+        self.directorio = directorio
+        self.version_extraccion = version_extraccion
+        os.makedirs(os.path.join(directorio, 'html'), exist_ok=True)
+        os.makedirs(os.path.join(directorio, 'entradas'), exist_ok=True)
+
+    def ruta_entrada(self, id_enfermedad):
+        return os.path.join(self.directorio, 'entradas', f"{id_enfermedad}.json")
+
+    def ruta_html(self, hash_html):
+        return os.path.join(self.directorio, 'html', f"{hash_html}.html")
+
+    def cargar_entrada(self, id_enfermedad):
+        """Devuelve la entrada guardada de una enfermedad, o una entrada vacía."""
+        try:
+            with open(self.ruta_entrada(id_enfermedad), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"id": id_enfermedad, "paginas": {}}
+
+    def guardar_entrada(self, entrada):
+        # Se escribe en un temporal y se renombra para no dejar entradas a medias.
+        ruta = self.ruta_entrada(entrada["id"])
+        with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(entrada, f, ensure_ascii=False)
+        os.replace(ruta + '.tmp', ruta)
+
+    def pagina_previa(self, entrada, pestana, url):
+        """Devuelve la página guardada para esa pestaña si corresponde a la misma URL."""
+        previa = entrada["paginas"].get(pestana)
+        if previa and previa.get("url") == url:
+            return previa
+        return None
+
+    def leer_html(self, hash_html):
+        try:
+            with open(self.ruta_html(hash_html), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def guardar_pagina(self, entrada, pestana, url, descarga, hash_html, resultado):
+        """Guarda el HTML (si aún no existe) y actualiza la pestaña en la entrada."""
+        ruta_html = self.ruta_html(hash_html)
+        if descarga.get("html") is not None and not os.path.exists(ruta_html):
+            # Dos enfermedades pueden compartir una página: el temporal es único por hilo
+            temporal = f"{ruta_html}.{threading.get_ident()}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                f.write(descarga["html"])
+            os.replace(temporal, ruta_html)
+        entrada["paginas"][pestana] = {
+            "url": url,
+            "etag": descarga.get("etag"),
+            "last_modified": descarga.get("last_modified"),
+            "hash": hash_html,
+            "version_extraccion": self.version_extraccion,
+            "resultado": resultado
+        }
+
+    def marcar_revisada(self, entrada, modificada):
+        """
+        Guarda la entrada anotando si alguna de sus páginas cambió en esta revisión.
+        La marca queda en disco para que el manifiesto sea correcto aunque la ejecución
+        se reanude desde un checkpoint.
+        """
+        entrada["modificada"] = modificada
+        entrada["fecha_revision"] = datetime.now().isoformat(timespec='seconds')
+        self.guardar_entrada(entrada)
+
+    def escribir_manifiesto(self, ids_enfermedades, archivo_salida):
+        """
+        Escribe el manifiesto de ids modificados para los pasos siguientes del pipeline.
+        Las enfermedades sin entrada en la caché se consideran modificadas.
+        """
+        ids_modificados = [
+            id_enfermedad for id_enfermedad in ids_enfermedades
+            if self.cargar_entrada(id_enfermedad).get("modificada", True)
+        ]
+        manifiesto = {
+            "fecha": datetime.now().isoformat(timespec='seconds'),
+            "total_revisadas": len(ids_enfermedades),
+            "total_modificadas": len(ids_modificados),
+            "ids_modificados": ids_modificados
+        }
+        with open(archivo_salida, 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, ensure_ascii=False, indent=4)
+        return manifiesto
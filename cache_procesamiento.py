@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+
+"""
+Caché persistente del paso 3 (procesamiento y enriquecimiento).
+Por cada enfermedad se guarda el hash de su contenido crudo ('sintomas_causas' y
+'diagnostico_tratamiento') junto con la demografía y los síntomas extraídos. En la siguiente
+ejecución, las enfermedades cuyo contenido no cambió reutilizan ese resultado sin pasar por
+spaCy ni por el buscador de síntomas.
+Toda la caché lleva una huella del vocabulario, del modelo de spaCy y de la versión del
+procesamiento: si alguno cambia, la caché anterior se descarta entera.
+"""
+
+ARCHIVO_CACHE = '3_cache_procesamiento.json'
+SECCIONES_CONTENIDO = ['sintomas_causas', 'diagnostico_tratamiento']
+
+def hash_json(objeto):
+    """Hash SHA-256 estable de un objeto JSON (las claves se ordenan)."""
+    texto = json.dumps(objeto, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+def hash_contenido(enfermedad):
+    """Hash del contenido crudo del que se extraen la demografía y los síntomas."""
+    return hash_json({seccion: enfermedad.get(seccion) for seccion in SECCIONES_CONTENIDO})
+
+class CacheProcesamiento:
+    def __init__(self, archivo=ARCHIVO_CACHE, huella=""):
+        self.archivo = archivo
+        self.huella = huella
+        self.entradas = {}
+        # Solo se vuelven a escribir las enfermedades vistas en esta ejecución
+        self.vigentes = {}
+        self.reutilizadas = 0
+        self.procesadas = 0
+        try:
+            with open(archivo, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            if datos.get("huella") == huella:
+                self.entradas = datos.get("entradas", {})
+            else:
+                print(f"La caché '{archivo}' es de otro vocabulario o modelo; se procesará todo de nuevo.")
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError:
+            print(f"Advertencia: La caché '{archivo}' está dañada; se ignora.")
+
+    def buscar(self, id_enfermedad, hash_enfermedad):
+        """Devuelve el resultado guardado si el contenido de la enfermedad no cambió, o None."""
+        entrada = self.entradas.get(id_enfermedad)
+        if id_enfermedad is None or not entrada or entrada["hash"] != hash_enfermedad:
+            return None
+        self.vigentes[id_enfermedad] = entrada
+        self.reutilizadas += 1
+        return entrada["resultado"]
+
+    def guardar(self, id_enfermedad, hash_enfermedad, resultado):
+        if id_enfermedad is None:
+            return
+        self.vigentes[id_enfermedad] = {"hash": hash_enfermedad, "resultado": resultado}
+        self.procesadas += 1
+
+    def escribir(self):
+        # Se escribe en un temporal y se renombra para no dejar la caché a medias.
+        with open(self.archivo + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({"huella": self.huella, "entradas": self.vigentes}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(self.archivo + '.tmp', self.archivo)
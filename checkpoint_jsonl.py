@@ -0,0 +1,92 @@
+import json
+import os
+import textwrap
+import threading
+
+"""
+Checkpoint en formato JSONL para los pasos largos del pipeline.
+Cada registro se añade al archivo en cuanto se termina de procesar, de modo que
+una ejecución interrumpida puede reanudarse saltando los ids ya guardados.
+Al final, el checkpoint se compacta en el JSON definitivo sin cargarlo entero en memoria.
+"""
+
+class CheckpointJSONL:
+    def __init__(self, ruta):
+        """Abre (o prepara) el checkpoint en 'ruta'. Es seguro usarlo desde varios hilos."""
+        self.ruta = ruta
+        self.lock = threading.Lock()
+        self.reparar_ultima_linea()
+
+    def reparar_ultima_linea(self):
+        # Si la ejecución anterior se cortó a mitad de una escritura, descarta la línea incompleta.
+        if not os.path.exists(self.ruta) or os.path.getsize(self.ruta) == 0:
+            return
+        with open(self.ruta, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b'\n':
+                return
+            f.seek(0)
+            contenido = f.read()
+            f.truncate(contenido.rfind(b'\n') + 1)
+
+    def indice_offsets(self):
+        """
+        Devuelve un diccionario {id: posición en bytes} con la última versión de cada registro.
+        Solo se guarda la posición, no el registro, para que la memoria no crezca con el corpus.
+        """
+        offsets = {}
+        if not os.path.exists(self.ruta):
+            return offsets
+        with open(self.ruta, 'rb') as f:
+            offset = f.tell()
+            for linea in iter(f.readline, b''):
+                try:
+                    offsets[json.loads(linea)["id"]] = offset
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    print(f"Advertencia: línea inválida en el checkpoint '{self.ruta}' (byte {offset}), se ignora.")
+                offset = f.tell()
+        return offsets
+
+    def ids_completados(self):
+        """Conjunto de ids que ya tienen un registro guardado en el checkpoint."""
+        return set(self.indice_offsets())
+
+    def agregar(self, registro):
+        """Añade un registro al final del checkpoint y lo vuelca a disco inmediatamente."""
+        linea = json.dumps(registro, ensure_ascii=False) + "\n"
+        with self.lock:
+            with open(self.ruta, 'a', encoding='utf-8') as f:
+                f.write(linea)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def compactar(self, enfermedades, archivo_salida, metadata, relleno):
+        """
+        Escribe el JSON definitivo con los registros en el orden de 'enfermedades'.
+        Los que no estén en el checkpoint se completan con 'relleno()' y se devuelven
+        sus ids para poder avisar de ellos.
+        """
+        offsets = self.indice_offsets()
+        faltantes = []
+        with open(self.ruta if os.path.exists(self.ruta) else os.devnull, 'rb') as checkpoint, \
+                open(archivo_salida, 'w', encoding='utf-8') as salida:
+            metadata_json = textwrap.indent(json.dumps(metadata, ensure_ascii=False, indent=4), ' ' * 4).lstrip()
+            salida.write('{\n    "metadata": ' + metadata_json + ',\n    "enfermedades": [')
+            for i, enfermedad in enumerate(enfermedades):
+                offset = offsets.get(enfermedad.get("id"))
+                if offset is not None:
+                    checkpoint.seek(offset)
+                    registro = json.loads(checkpoint.readline())
+                else:
+                    faltantes.append(enfermedad.get("id"))
+                    registro = dict(enfermedad)
+                    registro.update(relleno())
+                registro_json = textwrap.indent(json.dumps(registro, ensure_ascii=False, indent=4), ' ' * 8)
+                salida.write((',\n' if i else '\n') + registro_json)
+            salida.write('\n    ]\n}' if enfermedades else ']\n}')
+        return faltantes
+
+    def eliminar(self):
+        """Borra el checkpoint (tras una compactación completa)."""
+        if os.path.exists(self.ruta):
+            os.remove(self.ruta)
@@ -0,0 +1,92 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urljoin
+from planificador import CODIGOS_REINTENTABLES, ErrorReintentable, espera_retry_after
+
+"""
+Capa de descarga HTTP para los scrapers.
+Descarga las páginas de Mayo Clinic con conexiones persistentes (keep-alive)
+reutilizadas desde un pool, sin necesidad de levantar un navegador.
+Selenium queda como respaldo para las páginas que necesitan JavaScript.
+Si la sesión tiene un planificador, cada petición respeta su ritmo y sus reintentos.
+"""
+
+# --- CONFIGURACIÓN ---
+TIMEOUT_SEGUNDOS = 15
+CONEXIONES_POR_HOST = 4
+CABECERAS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Language": "es-ES,es;q=0.9",
+}
+
+def crear_sesion(conexiones_por_host=CONEXIONES_POR_HOST, planificador=None):
+    """
+    Crea una sesión HTTP con un pool de conexiones keep-alive.
+    Cada worker debe usar su propia sesión; el planificador sí puede compartirse.
+    """
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conexiones_por_host)
+    sesion.mount("http://", adaptador)
+    sesion.mount("https://", adaptador)
+    sesion.headers.update(CABECERAS)
+    sesion.planificador = planificador
+    return sesion
+
+def descargar_condicional(sesion, url, etag=None, last_modified=None, timeout=TIMEOUT_SEGUNDOS):
+    """
+    Descarga una página enviando los validadores de la versión guardada (ETag / Last-Modified).
+    Devuelve un diccionario con 'html', 'etag', 'last_modified' y 'no_modificada'
+    (True si el servidor respondió 304 y no se descargó nada), o None si la petición falla.
+    """
+    cabeceras = {}
+    if etag:
+        cabeceras["If-None-Match"] = etag
+    if last_modified:
+        cabeceras["If-Modified-Since"] = last_modified
+
+    def peticion():
+        try:
+            respuesta = sesion.get(url, headers=cabeceras, timeout=timeout)
+        except (requests.Timeout, requests.ConnectionError) as e:
+            raise ErrorReintentable(f"{type(e).__name__}: {e}") from e
+        if respuesta.status_code in CODIGOS_REINTENTABLES:
+            raise ErrorReintentable(
+                f"HTTP {respuesta.status_code}",
+                espera_retry_after(respuesta.headers.get("Retry-After"))
+            )
+        return respuesta
+
+    planificador = getattr(sesion, "planificador", None)
+    try:
+        respuesta = planificador.ejecutar(url, peticion) if planificador else peticion()
+        if respuesta.status_code == 304:
+            return {"html": None, "etag": etag, "last_modified": last_modified, "no_modificada": True}
+        respuesta.raise_for_status()
+        if "charset" not in respuesta.headers.get("Content-Type", "").lower():
+            respuesta.encoding = "utf-8"
+        return {
+            "html": respuesta.text,
+            "etag": respuesta.headers.get("ETag"),
+            "last_modified": respuesta.headers.get("Last-Modified"),
+            "no_modificada": False
+        }
+    except (requests.RequestException, ErrorReintentable) as e:
+        print(f"      -> ERROR HTTP al descargar {url}: {e}")
+        return None
+
+def descargar_html(sesion, url, timeout=TIMEOUT_SEGUNDOS):
+    """Descarga una página y devuelve su HTML, o None si la petición falla."""
+    descarga = descargar_condicional(sesion, url, timeout=timeout)
+    return descarga["html"] if descarga else None
+
+def buscar_url_pestana(soup, url_base, fragmento_href):
+    """
+    Devuelve la URL absoluta de la pestaña cuyo enlace contiene 'fragmento_href'
+    (por ejemplo 'diagnosis-treatment'), o None si la página no la enlaza.
+    """
+    enlace = soup.select_one(f'a[id*="{fragmento_href}"][href], a[href*="{fragmento_href}"]')
+    if enlace is None:
+        return None
+    return urljoin(url_base, enlace["href"])
@@ -0,0 +1,146 @@
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+"""
+Lectura y escritura de JSON en flujo para los pasos del pipeline.
+- leer_lista_json recorre los elementos de una lista dentro de un JSON grande sin cargarlo
+  entero: solo mantiene en memoria un bloque del archivo y el elemento actual.
+- EscritorJSON escribe un objeto {clave: [registros...], ...} registro a registro en formato
+  compacto, así que la memoria no crece con el número de registros.
+Si 'orjson' está instalado se puede usar para serializar (es varias veces más rápido que json).
+"""
+
+BACKENDS_JSON = ["auto", "orjson", "json"]
+BACKEND_POR_DEFECTO = "auto"
+TAMANO_BLOQUE = 1 << 20  # caracteres que se leen del archivo cada vez
+
+def crear_serializador(backend=BACKEND_POR_DEFECTO):
+    """
+    Devuelve una función que convierte un objeto en texto JSON compacto.
+    'auto' usa orjson si está disponible y, si no, el módulo json estándar.
+    """
+    if backend == "orjson" or (backend == "auto" and orjson is not None):
+        if orjson is None:
+            raise ImportError("Se pidió el backend 'orjson' pero no está instalado (pip install orjson).")
+        return lambda objeto: orjson.dumps(objeto).decode('utf-8')
+    return lambda objeto: json.dumps(objeto, ensure_ascii=False, separators=(',', ':'))
+
+class LectorBloques:
+    """Decodifica valores JSON consecutivos de un archivo leyéndolo por bloques."""
+    def __init__(self, archivo, tamano_bloque=TAMANO_BLOQUE):
+        self.archivo = archivo
+        self.tamano_bloque = tamano_bloque
+        self.decodificador = json.JSONDecoder()
+        self.buffer = ""
+        self.posicion = 0
+        self.fin_archivo = False
+
+    def leer_mas(self):
+        if self.fin_archivo:
+            return False
+        bloque = self.archivo.read(self.tamano_bloque)
+        if not bloque:
+            self.fin_archivo = True
+            return False
+        # Se descarta lo ya consumido para que el buffer no crezca con el archivo
+        self.buffer = self.buffer[self.posicion:] + bloque
+        self.posicion = 0
+        return True
+
+    def siguiente_caracter(self):
+        """Salta los espacios y devuelve el siguiente carácter sin consumirlo ('' al final)."""
+        while True:
+            while self.posicion < len(self.buffer) and self.buffer[self.posicion] in ' \t\r\n':
+                self.posicion += 1
+            if self.posicion < len(self.buffer):
+                return self.buffer[self.posicion]
+            if not self.leer_mas():
+                return ''
+
+    def consumir(self, esperado):
+        if self.siguiente_caracter() != esperado:
+            raise json.JSONDecodeError(f"Se esperaba '{esperado}'", self.buffer, self.posicion)
+        self.posicion += 1
+
+    def valor(self):
+        """Decodifica el siguiente valor completo, leyendo más bloques si está cortado."""
+        self.siguiente_caracter()
+        while True:
+            try:
+                valor, fin = self.decodificador.raw_decode(self.buffer, self.posicion)
+                # Un número al final del buffer podría continuar en el siguiente bloque
+                if fin < len(self.buffer) or not self.leer_mas():
+                    self.posicion = fin
+                    return valor
+            except json.JSONDecodeError:
+                if not self.leer_mas():
+                    raise
+
+def leer_lista_json(archivo, clave, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Generador con los elementos de la lista 'clave' del objeto JSON guardado en 'archivo'
+    (por ejemplo, las enfermedades de {"metadata": {...}, "enfermedades": [...]}).
+    """
+    with open(archivo, 'r', encoding='utf-8') as f:
+        lector = LectorBloques(f, tamano_bloque)
+        lector.consumir('{')
+        while lector.siguiente_caracter() not in ('}', ''):
+            nombre = lector.valor()
+            lector.consumir(':')
+            if nombre == clave:
+                lector.consumir('[')
+                if lector.siguiente_caracter() == ']':
+                    return
+                while True:
+                    yield lector.valor()
+                    if lector.siguiente_caracter() == ']':
+                        return
+                    lector.consumir(',')
+            lector.valor()
+            if lector.siguiente_caracter() == ',':
+                lector.consumir(',')
+
+class EscritorJSON:
+    """
+    Escribe {clave_lista: [registros...], extras...} de forma incremental.
+    Se escribe en un temporal que solo reemplaza al archivo final al cerrar sin errores,
+    para no dejar una salida a medias si el proceso se interrumpe.
+    """
+    def __init__(self, archivo, clave_lista, serializar=None):
+        self.archivo = archivo
+        self.serializar = serializar or crear_serializador()
+        self.extras = {}
+        self.total = 0
+        self.f = open(archivo + '.tmp', 'w', encoding='utf-8')
+        self.f.write('{' + self.serializar(clave_lista) + ':[')
+
+    def agregar(self, registro_json):
+        """Añade un registro ya serializado (así puede escribirse en varios archivos sin repetir el trabajo)."""
+        self.f.write((',\n' if self.total else '\n') + registro_json)
+        self.total += 1
+
+    def cerrar(self):
+        self.f.write('\n]')
+        for clave, valor in self.extras.items():
+            self.f.write(',' + self.serializar(clave) + ':' + self.serializar(valor))
+        self.f.write('}\n')
+        self.f.close()
+        os.replace(self.archivo + '.tmp', self.archivo)
+
+    def descartar(self):
+        self.f.close()
+        os.remove(self.archivo + '.tmp')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_error, error, traza):
+        if tipo_error is None:
+            self.cerrar()
+        else:
+            self.descartar()
@@ -0,0 +1,121 @@
+import json
+import math
+import os
+import struct
+import numpy as np
+from matriz_embeddings import alinear, normalizar, FILAS_POR_BLOQUE
+
+"""
+Índice aproximado de vecinos más cercanos (IVF) sobre la matriz de embeddings.
+- Al construirlo, las filas se agrupan con k-means esférico en 'listas' grupos; cada grupo
+  guarda su centroide y las posiciones de sus filas.
+- Al buscar, la consulta se compara con los centroides y solo se puntúan las filas de las
+  'sondas' listas más cercanas. Las sondas son la perilla recall / latencia: más sondas
+  revisan más filas y se acercan al resultado exacto.
+Con listas ~ raíz(filas), cada consulta puntúa del orden de sondas * raíz(filas) filas en lugar
+de todas. El índice se guarda junto a la matriz con la versión de esta, para no usarlo
+con una matriz distinta de la que lo generó.
+"""
+
+MAGICO = b'EMBIVF01'
+SONDAS = 8
+ITERACIONES_KMEANS = 10
+FILAS_ENTRENAMIENTO_POR_LISTA = 64
+
+def listas_por_defecto(filas):
+    return max(1, round(math.sqrt(filas)))
+
+def kmeans_esferico(vectores, listas, iteraciones=ITERACIONES_KMEANS, semilla=0):
+    """Centroides normalizados de 'vectores' (también normalizados), agrupando por similitud coseno."""
+    rng = np.random.default_rng(semilla)
+    centroides = vectores[rng.choice(len(vectores), listas, replace=False)].copy()
+    for _ in range(iteraciones):
+        asignacion = np.argmax(vectores @ centroides.T, axis=1)
+        sumas = np.zeros_like(centroides)
+        np.add.at(sumas, asignacion, vectores)
+        vacias = np.flatnonzero(np.bincount(asignacion, minlength=listas) == 0)
+        # Una lista sin filas se vuelve a sembrar con una fila al azar
+        sumas[vacias] = vectores[rng.choice(len(vectores), len(vacias))]
+        centroides = normalizar(sumas)
+    return centroides
+
+class IndiceIVF:
+    def __init__(self, cabecera, centroides, inicios, posiciones):
+        """
+        'centroides' es listas x dimensión; las filas de la lista i son
+        posiciones[inicios[i]:inicios[i + 1]].
+        """
+        self.cabecera = cabecera
+        self.centroides = centroides
+        self.inicios = inicios
+        self.posiciones = posiciones
+
+    @classmethod
+    def construir(cls, matriz, listas=None, iteraciones=ITERACIONES_KMEANS, semilla=0):
+        """Agrupa las filas de una MatrizEmbeddings; se entrena con una muestra de hasta 64 filas por lista."""
+        listas = min(listas or listas_por_defecto(len(matriz)), len(matriz))
+        rng = np.random.default_rng(semilla)
+        muestra = np.sort(rng.choice(len(matriz), min(len(matriz), listas * FILAS_ENTRENAMIENTO_POR_LISTA), replace=False))
+        centroides = kmeans_esferico(matriz.vectores(muestra), listas, iteraciones, semilla)
+
+        asignacion = np.empty(len(matriz), dtype=np.int64)
+        for inicio in range(0, len(matriz), FILAS_POR_BLOQUE):
+            fin = min(inicio + FILAS_POR_BLOQUE, len(matriz))
+            asignacion[inicio:fin] = np.argmax(matriz.filas(inicio, fin) @ centroides.T, axis=1)
+        posiciones = np.argsort(asignacion, kind='stable').astype('<i4')
+        inicios = np.concatenate([[0], np.cumsum(np.bincount(asignacion, minlength=listas))]).astype('<i8')
+        cabecera = {
+            "modelo": matriz.modelo,
+            "dimension": matriz.dimension,
+            "filas": len(matriz),
+            "listas": listas,
+            "version_matriz": matriz.cabecera.get("version")
+        }
+        return cls(cabecera, centroides.astype('<f4'), inicios, posiciones)
+
+    def guardar(self, archivo):
+        texto_cabecera = json.dumps(self.cabecera, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        with open(archivo + '.tmp', 'wb') as f:
+            f.write(MAGICO + struct.pack('<I', len(texto_cabecera)) + texto_cabecera)
+            for arreglo in (self.centroides, self.inicios, self.posiciones):
+                f.write(b'\0' * (alinear(f.tell()) - f.tell()))
+                f.write(arreglo.tobytes())
+        os.replace(archivo + '.tmp', archivo)
+
+    @classmethod
+    def abrir(cls, archivo):
+        with open(archivo, 'rb') as f:
+            if f.read(len(MAGICO)) != MAGICO:
+                raise ValueError(f"'{archivo}' no es un índice IVF.")
+            longitud, = struct.unpack('<I', f.read(4))
+            cabecera = json.loads(f.read(longitud).decode('utf-8'))
+        posicion = len(MAGICO) + 4 + longitud
+        arreglos = []
+        for tipo, forma in (('<f4', (cabecera["listas"], cabecera["dimension"])),
+                            ('<i8', (cabecera["listas"] + 1,)),
+                            ('<i4', (cabecera["filas"],))):
+            posicion = alinear(posicion)
+            arreglos.append(np.memmap(archivo, dtype=tipo, mode='r', offset=posicion, shape=forma))
+            posicion += arreglos[-1].nbytes
+        return cls(cabecera, *arreglos)
+
+    def corresponde_a(self, matriz):
+        """Indica si el índice se construyó sobre esta misma matriz."""
+        return (self.cabecera["filas"] == len(matriz) and
+                self.cabecera["version_matriz"] == matriz.cabecera.get("version"))
+
+    def buscar(self, matriz, consultas, top_k=5, sondas=SONDAS):
+        """Igual que MatrizEmbeddings.buscar, pero solo puntúa las filas de las 'sondas' listas más cercanas."""
+        consultas = normalizar(np.atleast_2d(consultas))
+        sondas = min(sondas, self.cabecera["listas"])
+        resultados = []
+        for consulta in consultas:
+            similitud_listas = self.centroides @ consulta
+            cercanas = np.argpartition(-similitud_listas, sondas - 1)[:sondas]
+            candidatas = np.sort(np.concatenate([self.posiciones[self.inicios[i]:self.inicios[i + 1]] for i in cercanas]))
+            puntuaciones = matriz.vectores(candidatas) @ consulta
+            k = min(top_k, len(candidatas))
+            mejores = np.argpartition(-puntuaciones, k - 1)[:k] if k else np.empty(0, dtype=np.int64)
+            mejores = mejores[np.argsort(-puntuaciones[mejores], kind='stable')]
+            resultados.append([{"corpus_id": int(candidatas[i]), "score": float(puntuaciones[i])} for i in mejores])
+        return resultados
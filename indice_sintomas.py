@@ -0,0 +1,133 @@
+import json
+
+"""
+Índice invertido de síntomas hacia enfermedades con ids enteros.
+- Cada enfermedad recibe un id entero denso (su posición en la lista procesada) y sus datos
+  (id, nombre, url, demografía) se guardan una sola vez.
+- Por cada categoría y por cada término de síntoma se guarda la lista ordenada de ids enteros.
+- En la primera consulta, las listas se convierten en bitsets (enteros de Python) para
+  responder consultas AND / OR con operaciones de bits, sin recorrer el JSON.
+"""
+
+VERSION_INDICE = 2
+
+def a_bitset(ids):
+    """Convierte una lista de ids enteros en un bitset (el bit i indica la enfermedad i)."""
+    if not ids:
+        return 0
+    bits = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, 'little')
+
+def desde_bitset(bitset):
+    """Devuelve la lista ordenada de ids enteros activos en un bitset."""
+    return [i for i, bit in enumerate(reversed(bin(bitset)[2:])) if bit == '1']
+
+class IndiceSintomas:
+    def __init__(self, enfermedades=None, categorias=None, terminos=None):
+        """
+        'enfermedades' es la lista de datos de cada enfermedad (el id entero es su posición);
+        'categorias' y 'terminos' son diccionarios {clave: [ids enteros ordenados]}.
+        """
+        self.enfermedades = enfermedades or []
+        self.categorias = categorias or {}
+        self.terminos = terminos or {}
+        self.bits_categorias = None
+        self.bits_terminos = None
+
+    def agregar(self, enfermedad):
+        """Añade una enfermedad procesada al final del índice y devuelve su id entero."""
+        id_entero = len(self.enfermedades)
+        self.enfermedades.append({
+            "id": enfermedad.get("id"),
+            "nombre": enfermedad.get("nombre"),
+            "url": enfermedad.get("url"),
+            "demografia": enfermedad.get("demografia", {})
+        })
+        # Los ids se asignan en orden creciente, así que cada lista queda ordenada sin ordenarla
+        for categoria, lista_terminos in (enfermedad.get("sintomas_compartidos") or {}).items():
+            self.categorias.setdefault(categoria, []).append(id_entero)
+            for termino in lista_terminos:
+                ids_termino = self.terminos.setdefault(termino, [])
+                if not ids_termino or ids_termino[-1] != id_entero:
+                    ids_termino.append(id_entero)
+        self.bits_categorias = self.bits_terminos = None
+        return id_entero
+
+    @classmethod
+    def construir(cls, enfermedades_procesadas):
+        """Construye el índice en una sola pasada (tiempo lineal) sobre las enfermedades procesadas."""
+        indice = cls()
+        for enfermedad in enfermedades_procesadas:
+            indice.agregar(enfermedad)
+        return indice
+
+    @classmethod
+    def desde_formato_anterior(cls, datos):
+        """
+        Convierte el índice antiguo ({categoría: [datos de cada enfermedad]}) al nuevo formato.
+        Ese formato no guardaba los términos, así que solo se recuperan las categorías.
+        """
+        enfermedades = []
+        posiciones = {}
+        categorias = {}
+        for categoria, lista in datos.items():
+            ids = set()
+            for info in lista:
+                if info["id"] not in posiciones:
+                    posiciones[info["id"]] = len(enfermedades)
+                    enfermedades.append(info)
+                ids.add(posiciones[info["id"]])
+            categorias[categoria] = sorted(ids)
+        return cls(enfermedades, categorias, {})
+
+    @classmethod
+    def cargar(cls, archivo):
+        with open(archivo, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+        if datos.get("version") != VERSION_INDICE:
+            return cls.desde_formato_anterior(datos)
+        return cls(datos["enfermedades"], datos["categorias"], datos["terminos"])
+
+    def a_diccionario(self):
+        return {
+            "version": VERSION_INDICE,
+            "enfermedades": self.enfermedades,
+            "categorias": dict(sorted(self.categorias.items())),
+            "terminos": dict(sorted(self.terminos.items()))
+        }
+
+    def guardar(self, archivo):
+        # Sin sangría: las listas de ids ocuparían una línea por número
+        with open(archivo, 'w', encoding='utf-8') as f:
+            json.dump(self.a_diccionario(), f, ensure_ascii=False, separators=(',', ':'))
+
+    def bitset(self, categorias=(), terminos=()):
+        """Bitsets de las categorías y términos pedidos (una clave desconocida no tiene enfermedades)."""
+        if self.bits_categorias is None:
+            self.bits_categorias = {clave: a_bitset(ids) for clave, ids in self.categorias.items()}
+            self.bits_terminos = {clave: a_bitset(ids) for clave, ids in self.terminos.items()}
+        return ([self.bits_categorias.get(clave, 0) for clave in categorias] +
+                [self.bits_terminos.get(clave, 0) for clave in terminos])
+
+    def ids_con_todos(self, categorias=(), terminos=()):
+        """Ids enteros de las enfermedades que tienen TODAS las categorías y términos pedidos (AND)."""
+        bitsets = self.bitset(categorias, terminos)
+        if not bitsets:
+            return []
+        resultado = bitsets[0]
+        for bitset in bitsets[1:]:
+            resultado &= bitset
+        return desde_bitset(resultado)
+
+    def ids_con_alguno(self, categorias=(), terminos=()):
+        """Ids enteros de las enfermedades que tienen ALGUNA de las categorías o términos pedidos (OR)."""
+        resultado = 0
+        for bitset in self.bitset(categorias, terminos):
+            resultado |= bitset
+        return desde_bitset(resultado)
+
+    def datos_enfermedades(self, ids):
+        """Devuelve los datos guardados de cada id entero."""
+        return [self.enfermedades[i] for i in ids]
@@ -0,0 +1,154 @@
+import json
+import os
+import secrets
+import struct
+import numpy as np
+
+"""
+Formato compacto de la matriz de embeddings, pensado para abrirse con memoria mapeada.
+El archivo tiene una cabecera pequeña y después los datos crudos:
+- 8 bytes mágicos, 4 bytes con la longitud de la cabecera y la cabecera en JSON (modelo,
+  dimensión, número de filas, tipo de dato y el id de la enfermedad de cada fila).
+- La matriz de filas x dimensión, ya normalizada (norma 1), alineada a 64 bytes.
+- Con 'int8', una escala float32 por fila: el vector real es fila * escala.
+Como las filas están normalizadas, la similitud coseno con una consulta normalizada es un
+solo producto matriz-vector. Al abrirse con np.memmap no se copia nada a memoria: varios
+procesos del servidor comparten las mismas páginas de la caché del sistema operativo.
+"""
+
+MAGICO = b'EMBMAT01'
+ALINEACION = 64
+TIPOS = {"float32": np.dtype('<f4'), "float16": np.dtype('<f2'), "int8": np.dtype('i1')}
+TIPO_POR_DEFECTO = "float32"
+FILAS_POR_BLOQUE = 65536  # filas que se convierten a float32 a la vez al puntuar
+
+def alinear(posicion):
+    return (posicion + ALINEACION - 1) // ALINEACION * ALINEACION
+
+def normalizar(vectores):
+    vectores = np.asarray(vectores, dtype=np.float32)
+    normas = np.linalg.norm(vectores, axis=-1, keepdims=True)
+    return vectores / np.maximum(normas, 1e-12)
+
+def guardar_matriz(archivo, embeddings, modelo, ids, tipo=TIPO_POR_DEFECTO):
+    """Normaliza 'embeddings' (filas x dimensión) y los guarda con el 'tipo' pedido."""
+    matriz = normalizar(embeddings).reshape(len(ids), -1) if len(ids) else np.zeros((0, 0), dtype=np.float32)
+    escalas = None
+    if tipo == "int8":
+        # Cuantización simétrica por fila: el mayor valor absoluto de cada fila se lleva a 127
+        escalas = (np.maximum(np.abs(matriz).max(axis=1, initial=0), 1e-12) / 127).astype('<f4')
+        datos = np.round(matriz / escalas[:, None]).astype(TIPOS["int8"])
+    else:
+        datos = matriz.astype(TIPOS[tipo])
+
+    cabecera = {
+        "modelo": modelo,
+        "dimension": int(matriz.shape[1]),
+        "filas": int(matriz.shape[0]),
+        "tipo": tipo,
+        "normalizada": True,
+        # Identifica esta escritura: los índices construidos sobre la matriz guardan la versión
+        "version": secrets.token_hex(8),
+        "ids": list(ids)
+    }
+    texto_cabecera = json.dumps(cabecera, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    inicio_datos = alinear(len(MAGICO) + 4 + len(texto_cabecera))
+    # Se escribe en un temporal y se renombra para que ningún lector vea la matriz a medias.
+    with open(archivo + '.tmp', 'wb') as f:
+        f.write(MAGICO + struct.pack('<I', len(texto_cabecera)) + texto_cabecera)
+        f.write(b'\0' * (inicio_datos - f.tell()))
+        f.write(datos.tobytes())
+        if escalas is not None:
+            f.write(b'\0' * (alinear(f.tell()) - f.tell()))
+            f.write(escalas.tobytes())
+    os.replace(archivo + '.tmp', archivo)
+    return cabecera
+
+class MatrizEmbeddings:
+    def __init__(self, cabecera, datos, escalas=None):
+        self.cabecera = cabecera
+        self.modelo = cabecera["modelo"]
+        self.ids = cabecera["ids"]
+        self.tipo = cabecera["tipo"]
+        self.datos = datos
+        self.escalas = escalas
+
+    @classmethod
+    def desde_arreglo(cls, embeddings, modelo, ids):
+        """Matriz float32 en memoria, por ejemplo a partir de un antiguo 'disease_embeddings.pt'."""
+        datos = normalizar(embeddings)
+        cabecera = {"modelo": modelo, "dimension": int(datos.shape[1]), "filas": int(datos.shape[0]),
+                    "tipo": "float32", "normalizada": True, "version": None, "ids": list(ids)}
+        return cls(cabecera, datos)
+
+    @classmethod
+    def abrir(cls, archivo):
+        """Abre la matriz con memoria mapeada (solo lectura); los datos se leen de disco al usarse."""
+        with open(archivo, 'rb') as f:
+            if f.read(len(MAGICO)) != MAGICO:
+                raise ValueError(f"'{archivo}' no es una matriz de embeddings.")
+            longitud, = struct.unpack('<I', f.read(4))
+            cabecera = json.loads(f.read(longitud).decode('utf-8'))
+        forma = (cabecera["filas"], cabecera["dimension"])
+        inicio_datos = alinear(len(MAGICO) + 4 + longitud)
+        tipo = TIPOS[cabecera["tipo"]]
+        if not cabecera["filas"]:
+            return cls(cabecera, np.empty(forma, dtype=tipo))
+        datos = np.memmap(archivo, dtype=tipo, mode='r', offset=inicio_datos, shape=forma)
+        escalas = None
+        if cabecera["tipo"] == "int8":
+            inicio_escalas = alinear(inicio_datos + datos.nbytes)
+            escalas = np.memmap(archivo, dtype='<f4', mode='r', offset=inicio_escalas, shape=(forma[0],))
+        return cls(cabecera, datos, escalas)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dimension(self):
+        return self.cabecera["dimension"]
+
+    def filas(self, inicio=0, fin=None):
+        """Filas [inicio, fin) convertidas a float32 (y reescaladas si son int8)."""
+        bloque = np.asarray(self.datos[inicio:fin], dtype=np.float32)
+        if self.escalas is not None:
+            bloque *= self.escalas[inicio:fin, None]
+        return bloque
+
+    def vectores(self, posiciones):
+        """Filas sueltas (por posición) convertidas a float32."""
+        bloque = np.asarray(self.datos[posiciones], dtype=np.float32)
+        if self.escalas is not None:
+            bloque *= self.escalas[posiciones, None]
+        return bloque
+
+    def puntuar(self, consultas):
+        """
+        Similitud coseno de cada consulta (vector o matriz consultas x dimensión) con todas las filas.
+        Devuelve un array consultas x filas.
+        """
+        consultas = normalizar(np.atleast_2d(consultas))
+        if self.tipo == "float32":
+            return consultas @ self.datos.T
+        puntuaciones = np.empty((len(consultas), len(self)), dtype=np.float32)
+        for inicio in range(0, len(self), FILAS_POR_BLOQUE):
+            fin = min(inicio + FILAS_POR_BLOQUE, len(self))
+            puntuaciones[:, inicio:fin] = consultas @ self.filas(inicio, fin).T
+        return puntuaciones
+
+    def buscar(self, consultas, top_k=5):
+        """
+        Devuelve, por cada consulta, la lista de los 'top_k' resultados como
+        {"corpus_id": fila, "score": similitud} ordenados de mayor a menor (como util.semantic_search).
+        """
+        puntuaciones = self.puntuar(consultas)
+        top_k = min(top_k, len(self))
+        resultados = []
+        for fila_puntuaciones in puntuaciones:
+            if top_k == 0:
+                resultados.append([])
+                continue
+            mejores = np.argpartition(-fila_puntuaciones, top_k - 1)[:top_k]
+            mejores = mejores[np.argsort(-fila_puntuaciones[mejores], kind='stable')]
+            resultados.append([{"corpus_id": int(i), "score": float(fila_puntuaciones[i])} for i in mejores])
+        return resultados
@@ -0,0 +1,149 @@
+import copy
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import torch
+from sentence_transformers import SentenceTransformer
+
+"""
+Motor de codificación del paso 4 pensado para CPU.
+- Los textos se ordenan por longitud y se reparten en cubetas contiguas: cada lote junta
+  textos de longitud parecida y casi no hay relleno (padding) desperdiciado.
+- Las cubetas se pueden repartir entre varios procesos; cada uno carga el modelo una vez
+  y usa su parte de los núcleos para que los hilos de PyTorch no compitan entre sí.
+- Opcionalmente, las capas lineales se cuantizan a int8 (cuantización dinámica). Antes de
+  codificar con el modelo cuantizado se compara con el modelo fp32 sobre una muestra y se
+  rechaza si las similitudes coseno se desvían más que la tolerancia.
+"""
+
+# --- CONFIGURACIÓN ---
+TAMANO_LOTE = 32
+TAMANO_CUBETA = 256  # textos por tarea enviada a un proceso
+PROCESOS = 1
+TOLERANCIA_COSENO = 0.02
+MUESTRA_VERIFICACION = 64
+
+class CuantizacionFueraDeTolerancia(Exception):
+    """El modelo cuantizado se aleja del fp32 más de lo permitido."""
+    def __init__(self, mensaje, verificacion):
+        super().__init__(mensaje)
+        self.verificacion = verificacion
+
+def cargar_modelo(nombre_modelo, cuantizar=False):
+    modelo = SentenceTransformer(nombre_modelo, device='cpu')
+    return cuantizar_modelo(modelo) if cuantizar else modelo
+
+def cuantizar_modelo(modelo):
+    """Cuantización dinámica int8 de las capas lineales (pesos int8, activaciones cuantizadas al vuelo)."""
+    modelo.eval()
+    return torch.ao.quantization.quantize_dynamic(modelo, {torch.nn.Linear}, dtype=torch.qint8)
+
+def dividir_en_cubetas(textos, tamano_cubeta=TAMANO_CUBETA):
+    """
+    Devuelve listas de posiciones de 'textos' ordenadas de mayor a menor longitud y partidas
+    en cubetas de 'tamano_cubeta' textos.
+    """
+    orden = sorted(range(len(textos)), key=lambda i: len(textos[i]), reverse=True)
+    return [orden[i:i + tamano_cubeta] for i in range(0, len(orden), tamano_cubeta)]
+
+# Modelo propio de cada proceso del pool
+modelo_del_worker = None
+
+def inicializar_worker(nombre_modelo, cuantizar, hilos):
+    global modelo_del_worker
+    torch.set_num_threads(hilos)
+    modelo_del_worker = cargar_modelo(nombre_modelo, cuantizar)
+
+def codificar_cubeta(textos, batch_size=TAMANO_LOTE):
+    return codificar_textos(modelo_del_worker, textos, batch_size).numpy()
+
+def codificar_textos(modelo, textos, batch_size=TAMANO_LOTE):
+    with torch.inference_mode():
+        return modelo.encode(textos, batch_size=batch_size, convert_to_tensor=True, show_progress_bar=False).cpu()
+
+def similitud_coseno(a, b):
+    a = torch.nn.functional.normalize(a, dim=1)
+    b = torch.nn.functional.normalize(b, dim=1)
+    return a @ b.T
+
+class MotorEmbeddings:
+    def __init__(self, nombre_modelo, cuantizar=False, procesos=PROCESOS, batch_size=TAMANO_LOTE,
+                 tamano_cubeta=TAMANO_CUBETA, tolerancia=TOLERANCIA_COSENO, muestra_verificacion=MUESTRA_VERIFICACION):
+        self.nombre_modelo = nombre_modelo
+        self.cuantizar = cuantizar
+        self.procesos = max(1, procesos)
+        self.batch_size = batch_size
+        self.tamano_cubeta = tamano_cubeta
+        self.tolerancia = tolerancia
+        self.muestra_verificacion = muestra_verificacion
+        self.modelo = None
+        self.verificacion = None
+
+    def clave_cache(self):
+        """Nombre con el que se guardan los vectores en la caché: los del modelo cuantizado no son los del fp32."""
+        return f"{self.nombre_modelo}+int8" if self.cuantizar else self.nombre_modelo
+
+    def modelo_local(self):
+        if self.modelo is None:
+            self.modelo = cargar_modelo(self.nombre_modelo, self.cuantizar)
+        return self.modelo
+
+    def verificar_cuantizacion(self, textos):
+        """
+        Codifica una muestra con el modelo fp32 y con el cuantizado y compara:
+        - el coseno entre el vector fp32 y el cuantizado de cada texto (debe ser >= 1 - tolerancia);
+        - la mayor diferencia entre las matrices de similitud de la muestra (debe ser <= tolerancia).
+        """
+        # Muestra repartida entre textos cortos y largos
+        paso = max(1, len(textos) // self.muestra_verificacion)
+        muestra = sorted(textos, key=len)[::paso][:self.muestra_verificacion]
+        modelo_fp32 = SentenceTransformer(self.nombre_modelo, device='cpu')
+        modelo_int8 = cuantizar_modelo(copy.deepcopy(modelo_fp32))
+        base = codificar_textos(modelo_fp32, muestra, self.batch_size)
+        cuantizados = codificar_textos(modelo_int8, muestra, self.batch_size)
+        coseno_propio = torch.nn.functional.cosine_similarity(base, cuantizados, dim=1)
+        desviacion = (similitud_coseno(base, base) - similitud_coseno(cuantizados, cuantizados)).abs()
+        self.verificacion = {
+            "textos": len(muestra),
+            "tolerancia": self.tolerancia,
+            "coseno_minimo": round(coseno_propio.min().item(), 5),
+            "coseno_medio": round(coseno_propio.mean().item(), 5),
+            "desviacion_similitud_maxima": round(desviacion.max().item(), 5),
+        }
+        self.verificacion["aprobada"] = (self.verificacion["coseno_minimo"] >= 1 - self.tolerancia and
+                                         self.verificacion["desviacion_similitud_maxima"] <= self.tolerancia)
+        if self.procesos == 1:
+            # El modelo cuantizado ya está cargado: se reutiliza para codificar
+            self.modelo = modelo_int8
+        return self.verificacion
+
+    def codificar(self, textos):
+        """Devuelve un tensor fp32 en CPU con una fila por texto, en el mismo orden que 'textos'."""
+        if not textos:
+            return torch.empty(0)
+        if self.cuantizar and self.muestra_verificacion and self.verificacion is None:
+            verificacion = self.verificar_cuantizacion(textos)
+            print(f" Verificación int8: coseno mínimo {verificacion['coseno_minimo']}, "
+                  f"desviación máxima de similitud {verificacion['desviacion_similitud_maxima']} (tolerancia {self.tolerancia})")
+            if not verificacion["aprobada"]:
+                raise CuantizacionFueraDeTolerancia(
+                    f"El modelo int8 se desvía del fp32 más de la tolerancia ({self.tolerancia}).", verificacion)
+
+        cubetas = dividir_en_cubetas(textos, self.tamano_cubeta)
+        textos_cubetas = [[textos[i] for i in cubeta] for cubeta in cubetas]
+        if self.procesos == 1:
+            modelo = self.modelo_local()
+            resultados = [codificar_textos(modelo, lote, self.batch_size) for lote in textos_cubetas]
+        else:
+            # 'spawn' evita heredar por fork el estado de los hilos de PyTorch del proceso principal
+            hilos = max(1, (os.cpu_count() or 1) // self.procesos)
+            with ProcessPoolExecutor(max_workers=self.procesos, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=inicializar_worker,
+                                     initargs=(self.nombre_modelo, self.cuantizar, hilos)) as executor:
+                resultados = [torch.from_numpy(matriz) for matriz in
+                              executor.map(codificar_cubeta, textos_cubetas, [self.batch_size] * len(textos_cubetas))]
+
+        embeddings = torch.empty(len(textos), resultados[0].shape[1], dtype=torch.float32)
+        for cubeta, matriz in zip(cubetas, resultados):
+            embeddings[cubeta] = matriz.float()
+        return embeddings
@@ -0,0 +1,18 @@
+import re
+import unicodedata
+
+"""
+Normalización de texto compartida por el paso 3 (búsqueda de síntomas) y la app (caché de
+consultas). No depende de spaCy, así que la app puede importarla sin cargar el paso 3.
+"""
+
+def limpiar_texto(texto):
+    """Minúsculas, sin tildes ni diacríticos y sin signos de puntuación (quedan letras, dígitos y espacios)."""
+    if not isinstance(texto, str): return ""
+    nfkd_form = unicodedata.normalize('NFKD', texto.lower())
+    texto_limpio = "".join([c for c in nfkd_form if not unicodedata.combining(c)])
+    return re.sub(r'[^\w\s]', '', texto_limpio)
+
+def normalizar_consulta(texto):
+    """limpiar_texto con los espacios colapsados: dos consultas con la misma forma normalizada son la misma."""
+    return " ".join(limpiar_texto(texto).split())
@@ -0,0 +1,175 @@
+from contextlib import contextmanager
+from datetime import datetime
+import cProfile
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # No existe en Windows
+    resource = None
+
+"""
+Instrumentación común de los pasos del pipeline.
+Cada paso mide sus etapas con 'with perfilador.etapa("nombre", elementos)' y al terminar
+escribe un reporte JSON con, por etapa: llamadas, tiempo real, tiempo de CPU, elementos
+procesados y elementos por segundo; además del pico de memoria (RSS) del proceso y,
+opcionalmente, las funciones más costosas según cProfile.
+Los nombres de las subetapas llevan el prefijo de su etapa ("detalles.parseo") y los tiempos
+son inclusivos: una etapa incluye el tiempo de las subetapas que se ejecutan dentro de ella.
+El tiempo de CPU de cada etapa es el del hilo que la ejecuta (time.thread_time).
+"""
+
+DIRECTORIO_REPORTES = 'reportes'
+FUNCIONES_EN_REPORTE = 20
+
+def pico_rss_mb(quien=None):
+    """Pico de memoria residente en MB del proceso (o de sus hijos), si el sistema lo permite."""
+    if resource is None:
+        return None
+    uso = resource.getrusage(resource.RUSAGE_SELF if quien is None else quien)
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(uso.ru_maxrss / divisor, 1)
+
+class Perfilador:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.paso = None
+        self.etapas = {}
+        self.metadatos = {}
+        self.perfil = None
+        self.inicio_fecha = datetime.now()
+        self.inicio = time.perf_counter()
+        self.inicio_cpu = time.process_time()
+
+    def iniciar(self, paso, cprofile=False):
+        """Empieza a medir un paso del pipeline; con cprofile=True también se perfila el hilo principal."""
+        self.paso = paso
+        self.etapas = {}
+        self.inicio_fecha = datetime.now()
+        self.inicio = time.perf_counter()
+        self.inicio_cpu = time.process_time()
+        self.perfil = None
+        if cprofile:
+            self.perfil = cProfile.Profile()
+            self.perfil.enable()
+
+    @contextmanager
+    def etapa(self, nombre, elementos=0):
+        """
+        Mide el bloque como una ejecución de la etapa 'nombre'. Devuelve un diccionario en el
+        que el bloque puede actualizar 'elementos' si no los conoce de antemano.
+        """
+        medicion = {"elementos": elementos}
+        inicio = time.perf_counter()
+        inicio_cpu = time.thread_time()
+        try:
+            yield medicion
+        finally:
+            self.registrar(nombre, time.perf_counter() - inicio, time.thread_time() - inicio_cpu, medicion["elementos"])
+
+    def registrar(self, nombre, segundos, cpu_segundos, elementos=0, llamadas=1):
+        with self.lock:
+            etapa = self.etapas.setdefault(nombre, {"llamadas": 0, "segundos": 0.0, "cpu_segundos": 0.0, "elementos": 0})
+            etapa["llamadas"] += llamadas
+            etapa["segundos"] += segundos
+            etapa["cpu_segundos"] += cpu_segundos
+            etapa["elementos"] += elementos
+
+    def extraer_etapas(self):
+        """Devuelve las etapas medidas hasta ahora y las reinicia (para enviarlas desde un proceso hijo)."""
+        with self.lock:
+            etapas, self.etapas = self.etapas, {}
+        return etapas
+
+    def combinar(self, etapas):
+        """Suma las etapas medidas en otro proceso (por ejemplo, un worker de un pool)."""
+        for nombre, etapa in etapas.items():
+            self.registrar(nombre, etapa["segundos"], etapa["cpu_segundos"], etapa["elementos"], etapa["llamadas"])
+
+    def reporte(self):
+        duracion = time.perf_counter() - self.inicio
+        with self.lock:
+            etapas = {}
+            for nombre, etapa in sorted(self.etapas.items()):
+                etapas[nombre] = {
+                    "llamadas": etapa["llamadas"],
+                    "segundos": round(etapa["segundos"], 4),
+                    "cpu_segundos": round(etapa["cpu_segundos"], 4),
+                    "elementos": etapa["elementos"],
+                    "elementos_por_segundo": round(etapa["elementos"] / etapa["segundos"], 2) if etapa["elementos"] and etapa["segundos"] else None
+                }
+        hijos = os.times()
+        reporte = {
+            "paso": self.paso,
+            "inicio": self.inicio_fecha.isoformat(timespec='seconds'),
+            "duracion_segundos": round(duracion, 3),
+            "cpu_segundos": round(time.process_time() - self.inicio_cpu, 3),
+            "cpu_hijos_segundos": round(hijos.children_user + hijos.children_system, 3),
+            "pico_rss_mb": pico_rss_mb(),
+            "pico_rss_hijos_mb": pico_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+            "entorno": {"python": platform.python_version(), "plataforma": platform.platform(), "argumentos": sys.argv[1:]},
+            "metadatos": self.metadatos,
+            "etapas": etapas
+        }
+        if self.perfil:
+            reporte["funciones_mas_costosas"] = self.funciones_mas_costosas()
+        return reporte
+
+    def funciones_mas_costosas(self, limite=FUNCIONES_EN_REPORTE):
+        self.perfil.disable()
+        estadisticas = pstats.Stats(self.perfil)
+        filas = sorted(estadisticas.stats.items(), key=lambda item: item[1][3], reverse=True)[:limite]
+        return [
+            {
+                "funcion": f"{os.path.basename(archivo)}:{linea}({nombre})",
+                "llamadas": llamadas,
+                "segundos_propios": round(tiempo_propio, 4),
+                "segundos_acumulados": round(tiempo_acumulado, 4)
+            }
+            for (archivo, linea, nombre), (_, llamadas, tiempo_propio, tiempo_acumulado, _) in filas
+        ]
+
+    def escribir_reporte(self, archivo):
+        """Escribe el reporte JSON (y, si se perfiló, el volcado de cProfile junto a él)."""
+        reporte = self.reporte()
+        directorio = os.path.dirname(archivo)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        if self.perfil:
+            archivo_perfil = os.path.splitext(archivo)[0] + '.prof'
+            self.perfil.dump_stats(archivo_perfil)
+            reporte["perfil_cprofile"] = archivo_perfil
+        with open(archivo, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=4)
+        print(f"Reporte de rendimiento guardado en '{archivo}'")
+        return reporte
+
+# Instancia compartida por todos los módulos de un mismo proceso
+PERFILADOR = Perfilador()
+
+def iniciar(paso, cprofile=False):
+    PERFILADOR.iniciar(paso, cprofile)
+
+def etapa(nombre, elementos=0):
+    return PERFILADOR.etapa(nombre, elementos)
+
+def anotar(clave, valor):
+    """Añade un dato propio del paso (contadores, configuración...) al reporte."""
+    PERFILADOR.metadatos[clave] = valor
+
+def escribir_reporte(archivo):
+    return PERFILADOR.escribir_reporte(archivo)
+
+def agregar_argumentos(parser, paso):
+    """Añade las opciones comunes de medición (--reporte y --perfilar) al parser de un paso."""
+    parser.add_argument("--reporte", default=os.path.join(DIRECTORIO_REPORTES, f"{paso}.json"),
+                        help="Archivo JSON donde se guarda el reporte de rendimiento de la ejecución.")
+    parser.add_argument("--perfilar", action="store_true",
+                        help="Perfila el hilo principal con cProfile e incluye las funciones más costosas en el reporte.")
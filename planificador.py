@@ -0,0 +1,207 @@
+from collections import deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import random
+import threading
+import time
+
+"""
+Planificador de peticiones compartido por los scrapers.
+Sustituye las pausas fijas por un ritmo que se adapta a las respuestas del servidor:
+- Una cubeta de tokens por host limita las peticiones por segundo.
+- La tasa crece rápido al principio (arranque exponencial), después sube poco a poco
+  mientras todo va bien y se reduce a la mitad ante un 429, un 5xx o un timeout
+  (incremento aditivo, reducción multiplicativa).
+- Un semáforo global limita las peticiones en curso.
+- Las peticiones fallidas se reintentan con espera exponencial y jitter.
+- Se llevan contadores de peticiones por segundo y tasa de errores para mostrarlos en vivo.
+"""
+
+# --- CONFIGURACIÓN ---
+TASA_INICIAL = 2.0        # peticiones por segundo y host al empezar
+TASA_MINIMA = 0.2
+TASA_MAXIMA = 20.0
+FACTOR_ARRANQUE = 1.1     # crecimiento por respuesta correcta hasta el primer error
+INCREMENTO_TASA = 0.1     # cuánto sube la tasa con cada respuesta correcta después
+FACTOR_REDUCCION = 0.5    # cuánto se multiplica la tasa ante un error de servidor
+MAX_CONCURRENTES = 8
+MAX_REINTENTOS = 4
+ESPERA_BASE = 1.0         # segundos; se duplica en cada reintento
+ESPERA_MAXIMA = 60.0
+VENTANA_ESTADISTICAS = 10.0
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+class ErrorReintentable(Exception):
+    """Respuesta que indica que el servidor está saturado o falló temporalmente."""
+    def __init__(self, mensaje, espera_sugerida=None):
+        super().__init__(mensaje)
+        self.espera_sugerida = espera_sugerida
+
+class CubetaTokens:
+    """Cubeta de tokens de un host con una tasa que se ajusta según las respuestas."""
+    def __init__(self, tasa, tasa_minima, tasa_maxima):
+        self.tasa = tasa
+        self.tasa_minima = tasa_minima
+        self.tasa_maxima = tasa_maxima
+        self.tokens = 1.0
+        self.ultima_recarga = time.monotonic()
+        self.pausa_hasta = 0.0
+        self.en_arranque = True
+        self.lock = threading.Lock()
+
+    def tomar(self):
+        """Bloquea hasta que haya un token disponible y lo consume."""
+        while True:
+            with self.lock:
+                ahora = time.monotonic()
+                capacidad = max(1.0, self.tasa)
+                self.tokens = min(capacidad, self.tokens + (ahora - self.ultima_recarga) * self.tasa)
+                self.ultima_recarga = ahora
+                if ahora >= self.pausa_hasta and self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                espera = max(self.pausa_hasta - ahora, (1.0 - self.tokens) / self.tasa)
+            time.sleep(espera)
+
+    def exito(self):
+        with self.lock:
+            if self.en_arranque:
+                self.tasa = min(self.tasa_maxima, self.tasa * FACTOR_ARRANQUE)
+            else:
+                self.tasa = min(self.tasa_maxima, self.tasa + INCREMENTO_TASA)
+
+    def saturado(self, factor, pausa):
+        """El servidor pidió que bajemos el ritmo: se reduce la tasa y se pausa el host."""
+        with self.lock:
+            self.en_arranque = False
+            self.tasa = max(self.tasa_minima, self.tasa * factor)
+            self.tokens = 0.0
+            self.pausa_hasta = max(self.pausa_hasta, time.monotonic() + pausa)
+
+class PlanificadorPeticiones:
+    def __init__(self, tasa_inicial=TASA_INICIAL, tasa_maxima=TASA_MAXIMA,
+                 max_concurrentes=MAX_CONCURRENTES, max_reintentos=MAX_REINTENTOS):
+        self.tasa_inicial = tasa_inicial
+        self.tasa_maxima = tasa_maxima
+        self.max_reintentos = max_reintentos
+        self.semaforo = threading.BoundedSemaphore(max_concurrentes)
+        self.cubetas = {}
+        self.lock = threading.Lock()
+        self.inicio = time.monotonic()
+        self.total_peticiones = 0
+        self.total_errores = 0
+        self.total_reintentos = 0
+        self.en_curso = 0
+        self.eventos = deque()  # (instante, fue_error) de la ventana reciente
+        self.detener_reporte = threading.Event()
+
+    def cubeta(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.cubetas:
+                self.cubetas[host] = CubetaTokens(self.tasa_inicial, TASA_MINIMA, self.tasa_maxima)
+            return self.cubetas[host]
+
+    def registrar(self, fue_error):
+        with self.lock:
+            ahora = time.monotonic()
+            self.total_peticiones += 1
+            self.total_errores += fue_error
+            self.eventos.append((ahora, fue_error))
+            while self.eventos and ahora - self.eventos[0][0] > VENTANA_ESTADISTICAS:
+                self.eventos.popleft()
+
+    @contextmanager
+    def turno(self, url, saturacion=(ErrorReintentable,)):
+        """
+        Espera el turno de una petición a 'url' (token del host y hueco de concurrencia).
+        Si el bloque lanza una de las excepciones de 'saturacion' (por ejemplo, el timeout
+        del navegador), se reduce el ritmo del host.
+        """
+        cubeta = self.cubeta(url)
+        # Primero el hueco y después el token: si el token se tomara antes, los hilos que esperan
+        # un hueco ya lo tendrían y saldrían seguidos al liberarse, incluso durante una pausa
+        with self.semaforo:
+            cubeta.tomar()
+            with self.lock:
+                self.en_curso += 1
+            try:
+                yield
+            except saturacion as e:
+                self.registrar(True)
+                cubeta.saturado(FACTOR_REDUCCION, getattr(e, "espera_sugerida", None) or ESPERA_BASE)
+                raise
+            except Exception:
+                self.registrar(True)
+                raise
+            else:
+                self.registrar(False)
+                cubeta.exito()
+            finally:
+                with self.lock:
+                    self.en_curso -= 1
+
+    def ejecutar(self, url, funcion, es_reintentable=lambda e: isinstance(e, ErrorReintentable)):
+        """
+        Ejecuta 'funcion()' respetando el ritmo del host de 'url' y la reintenta con espera
+        exponencial y jitter mientras falle con un error reintentable.
+        """
+        for intento in range(self.max_reintentos + 1):
+            try:
+                with self.turno(url):
+                    return funcion()
+            except Exception as e:
+                if not es_reintentable(e) or intento == self.max_reintentos:
+                    raise
+                espera = min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** intento)
+                espera = max(espera, getattr(e, "espera_sugerida", None) or 0)
+                espera += random.uniform(0, ESPERA_BASE)
+                with self.lock:
+                    self.total_reintentos += 1
+                print(f"      -> Reintento {intento + 1}/{self.max_reintentos} de {url} en {espera:.1f}s ({e})")
+                time.sleep(espera)
+
+    def estadisticas(self):
+        """Contadores en vivo: peticiones por segundo y tasa de errores de la ventana reciente."""
+        with self.lock:
+            ahora = time.monotonic()
+            ventana = min(VENTANA_ESTADISTICAS, max(ahora - self.inicio, 1e-6))
+            recientes = [e for t, e in self.eventos if ahora - t <= VENTANA_ESTADISTICAS]
+            return {
+                "peticiones_por_segundo": len(recientes) / ventana,
+                "tasa_errores": (sum(recientes) / len(recientes)) if recientes else 0.0,
+                "total_peticiones": self.total_peticiones,
+                "total_errores": self.total_errores,
+                "total_reintentos": self.total_reintentos,
+                "en_curso": self.en_curso,
+                "tasa_permitida": {host: round(c.tasa, 2) for host, c in self.cubetas.items()}
+            }
+
+    def iniciar_reporte(self, intervalo=15.0):
+        """Imprime las estadísticas cada 'intervalo' segundos desde un hilo en segundo plano."""
+        def reportar():
+            while not self.detener_reporte.wait(intervalo):
+                print(self.resumen())
+        threading.Thread(target=reportar, daemon=True).start()
+
+    def resumen(self):
+        e = self.estadisticas()
+        tasas = ", ".join(f"{host}: {tasa} pet/s" for host, tasa in e["tasa_permitida"].items())
+        return (f"[Planificador] {e['peticiones_por_segundo']:.2f} pet/s | errores {e['tasa_errores']:.1%} | "
+                f"en curso {e['en_curso']} | reintentos {e['total_reintentos']} | permitido: {tasas}")
+
+    def detener(self):
+        self.detener_reporte.set()
+
+def espera_retry_after(valor):
+    """Convierte la cabecera Retry-After (segundos o fecha HTTP) en segundos de espera."""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
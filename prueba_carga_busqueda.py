@@ -0,0 +1,110 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import numpy as np
+import requests
+
+"""
+Prueba de carga del servicio de búsqueda (servicio_busqueda.py) en localhost.
+Para cada nivel de concurrencia lanza ese número de clientes, cada uno con su conexión
+keep-alive, que envían consultas una tras otra, y reporta consultas por segundo, latencia
+p50 / p99 y cuántas consultas juntó el servicio por lote (de /estadisticas).
+Las consultas combinan al azar frases de síntomas, así que casi nunca se repiten; para medir
+sin ninguna ayuda de la caché, inicia el servicio con --sin-cache.
+"""
+
+# --- CONFIGURACIÓN ---
+URL_POR_DEFECTO = 'http://127.0.0.1:8770'
+CONCURRENCIAS = [1, 4, 16, 64]
+FRASES_SINTOMAS = [
+    "dolor de cabeza", "fiebre alta", "tos seca", "dolor en el pecho", "dificultad para respirar",
+    "náuseas y vómitos", "dolor abdominal", "diarrea", "cansancio constante", "mareos",
+    "pérdida de peso", "erupción en la piel", "picazón", "dolor en las articulaciones",
+    "rigidez por la mañana", "visión borrosa", "zumbido en los oídos", "dolor de garganta",
+    "sudores nocturnos", "palpitaciones", "hinchazón en las piernas", "sangrado de encías",
+    "orina oscura", "entumecimiento en las manos",
+]
+
+def generar_consultas(cantidad, semilla):
+    rng = random.Random(semilla)
+    return [", ".join(rng.sample(FRASES_SINTOMAS, rng.randint(2, 5))) for _ in range(cantidad)]
+
+def estadisticas_lotes(url):
+    respuesta = requests.get(f"{url}/estadisticas", timeout=30)
+    respuesta.raise_for_status()
+    return respuesta.json()["lotes"]
+
+def cliente(url, consultas, top_k, latencias, errores):
+    sesion = requests.Session()
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        try:
+            respuesta = sesion.post(f"{url}/buscar", json={"consulta": consulta, "top_k": top_k}, timeout=60)
+            respuesta.raise_for_status()
+        except requests.RequestException:
+            errores.append(consulta)
+            continue
+        latencias.append(time.perf_counter() - inicio)
+
+def medir_concurrencia(url, concurrencia, consultas_por_cliente, top_k, semilla):
+    antes = estadisticas_lotes(url)
+    latencias, errores = [], []
+    hilos = [threading.Thread(target=cliente, args=(url, generar_consultas(consultas_por_cliente, semilla + i),
+                                                    top_k, latencias, errores))
+             for i in range(concurrencia)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.perf_counter() - inicio
+    despues = estadisticas_lotes(url)
+
+    lotes = despues["lotes"] - antes["lotes"]
+    return {"concurrencia": concurrencia, "consultas": len(latencias), "errores": len(errores),
+            "consultas_por_segundo": round(len(latencias) / segundos, 1),
+            "p50_ms": round(float(np.percentile(latencias, 50)) * 1000, 1) if latencias else None,
+            "p99_ms": round(float(np.percentile(latencias, 99)) * 1000, 1) if latencias else None,
+            "consultas_por_lote": round((despues["consultas"] - antes["consultas"]) / lotes, 2) if lotes else 0.0}
+
+def parsear_argumentos():
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio de búsqueda en localhost.")
+    parser.add_argument("--url", default=URL_POR_DEFECTO, help="URL base del servicio.")
+    parser.add_argument("--concurrencias", default=",".join(map(str, CONCURRENCIAS)),
+                        help="Clientes simultáneos a probar, separados por comas.")
+    parser.add_argument("--consultas-por-cliente", type=int, default=20,
+                        help="Consultas que envía cada cliente en cada nivel.")
+    parser.add_argument("--top-k", type=int, default=5, help="Resultados por consulta.")
+    parser.add_argument("--salida-json", default=None,
+                        help="Si se indica, guarda las métricas en este archivo.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parsear_argumentos()
+    try:
+        estadisticas_lotes(args.url)
+    except requests.RequestException:
+        print(f"Error: No se pudo conectar con el servicio en {args.url}. Inícialo con 'python servicio_busqueda.py'.")
+        sys.exit(1)
+
+    metricas = []
+    for nivel, concurrencia in enumerate(int(n) for n in args.concurrencias.split(',')):
+        print(f"Probando con {concurrencia} clientes simultáneos...")
+        # Cada nivel usa consultas distintas para no medir solo aciertos de la caché
+        metricas.append(medir_concurrencia(args.url, concurrencia, args.consultas_por_cliente, args.top_k,
+                                           semilla=nivel * 100000))
+
+    print("\n=== RESULTADOS ===")
+    for resultado in metricas:
+        print(f"{resultado['concurrencia']:>4} clientes: {resultado['consultas_por_segundo']} consultas/s, "
+              f"p50 {resultado['p50_ms']} ms, p99 {resultado['p99_ms']} ms, "
+              f"{resultado['consultas_por_lote']} consultas por lote"
+              + (f", {resultado['errores']} errores" if resultado['errores'] else ""))
+
+    if args.salida_json:
+        with open(args.salida_json, 'w', encoding='utf-8') as f:
+            json.dump(metricas, f, ensure_ascii=False, indent=4)
+        print(f"Métricas guardadas en '{args.salida_json}'")
@@ -0,0 +1,205 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+
+"""
+Resúmenes de la sección 'Descripción general' de cada enfermedad.
+- resumir_textos pasa varios textos juntos por el pipeline de resumen (por lotes) y devuelve
+  tal cual los que son demasiado cortos para resumirse.
+- Cada resumen se identifica por (id de la enfermedad, hash del texto, modelo, longitud máxima
+  y mínima): si cambia cualquiera de ellos, el resumen anterior ya no sirve.
+- CacheResumenes es una caché LRU persistente en SQLite, compartida por el paso 5 y la app,
+  para los resúmenes que no se precalcularon.
+- Hay dos backends con la misma forma de llamarse (la del pipeline de transformers):
+  'extractivo' elige oraciones del propio texto con el SentenceTransformer que ya usa la
+  búsqueda (no carga otro modelo) y 'bart' genera el resumen con facebook/bart-large-cnn.
+- TrabajoResumenes genera en segundo plano, por lotes de LOTE_TRABAJO, los resúmenes que faltan
+  para los resultados de una búsqueda, y se puede cancelar entre lote y lote si la búsqueda se
+  abandona.
+"""
+
+# --- CONFIGURACIÓN ---
+BACKENDS_RESUMEN = ["extractivo", "bart"]
+BACKEND_POR_DEFECTO = "extractivo"
+MODELO_BART = 'facebook/bart-large-cnn'
+MODELO_ORACIONES = 'hiiamsid/sentence_similarity_spanish_es' # el mismo de la búsqueda semántica
+NUM_ORACIONES = 3
+LAMBDA_MMR = 0.7 # peso de la relevancia frente a la redundancia al elegir oraciones
+PATRON_ORACION = re.compile(r'(?<=[.!?])\s+|\n+')
+LONGITUD_MAXIMA = 150
+LONGITUD_MINIMA = 40
+SECCION_RESUMEN = 'descripción general'
+TAMANO_LOTE = 8
+LOTE_TRABAJO = 2 # menor que los resultados de una búsqueda: así cancelar ahorra los lotes restantes
+ARCHIVO_CACHE = 'cache_resumenes.sqlite'
+MAXIMO_ENTRADAS = 10000
+
+def nombre_modelo(backend=BACKEND_POR_DEFECTO):
+    """Identifica el resumidor en la clave de cada resumen: los de un backend no sirven para el otro."""
+    return MODELO_BART if backend == "bart" else f"extractivo+{MODELO_ORACIONES}"
+
+MODELO_RESUMEN = nombre_modelo()
+
+def clave_resumen(id_enfermedad, texto, modelo=MODELO_RESUMEN, max_length=LONGITUD_MAXIMA, min_length=LONGITUD_MINIMA):
+    hash_texto = hashlib.sha256(texto.encode('utf-8')).hexdigest()
+    return f"{id_enfermedad}|{hash_texto}|{modelo}|{max_length}|{min_length}"
+
+def necesita_resumen(texto, min_length=LONGITUD_MINIMA):
+    return bool(texto) and len(texto.split()) >= min_length
+
+def resumir_textos(summarizer, textos, max_length=LONGITUD_MAXIMA, min_length=LONGITUD_MINIMA, batch_size=TAMANO_LOTE):
+    """Resume los textos en una sola llamada al pipeline; los muy cortos se devuelven sin cambios."""
+    resumenes = list(textos)
+    largos = [i for i, texto in enumerate(textos) if necesita_resumen(texto, min_length)]
+    if largos:
+        # truncation=True: los textos más largos que la entrada del modelo se recortan en vez de fallar
+        salidas = summarizer([textos[i] for i in largos], max_length=max_length, min_length=min_length,
+                             do_sample=False, truncation=True, batch_size=batch_size)
+        for i, salida in zip(largos, salidas):
+            resumenes[i] = salida['summary_text']
+    return resumenes
+
+def cargar_resumidor(backend=BACKEND_POR_DEFECTO, modelo_oraciones=None):
+    """
+    Crea el resumidor del backend pedido. Para 'extractivo' conviene pasar el SentenceTransformer
+    ya cargado para la búsqueda; si no, se carga MODELO_ORACIONES.
+    """
+    if backend == "bart":
+        from transformers import pipeline
+        return pipeline("summarization", model=MODELO_BART)
+    if modelo_oraciones is None:
+        from sentence_transformers import SentenceTransformer
+        modelo_oraciones = SentenceTransformer(MODELO_ORACIONES)
+    return ResumidorExtractivo(modelo_oraciones)
+
+def dividir_oraciones(texto):
+    """Oraciones del texto; cada línea (por ejemplo, cada elemento de una lista) cuenta como una."""
+    return [oracion.strip() for oracion in PATRON_ORACION.split(texto) if oracion.strip()]
+
+class ResumidorExtractivo:
+    """
+    Resumen extractivo: las oraciones de cada texto se codifican con un SentenceTransformer y se
+    eligen por MMR (las más cercanas al centroide del texto, penalizando las que repiten lo ya
+    elegido) hasta NUM_ORACIONES o 'max_length' palabras; se devuelven en su orden original.
+    Se llama igual que el pipeline de resumen de transformers.
+    """
+    def __init__(self, modelo, num_oraciones=NUM_ORACIONES, lambda_mmr=LAMBDA_MMR):
+        self.modelo = modelo
+        self.num_oraciones = num_oraciones
+        self.lambda_mmr = lambda_mmr
+
+    def __call__(self, textos, max_length=LONGITUD_MAXIMA, min_length=LONGITUD_MINIMA, batch_size=TAMANO_LOTE, **kwargs):
+        if isinstance(textos, str):
+            textos = [textos]
+        oraciones = [dividir_oraciones(texto) for texto in textos]
+        # Todas las oraciones de todos los textos se codifican en una sola llamada
+        todas = [oracion for lista in oraciones for oracion in lista]
+        vectores = self.modelo.encode(todas, batch_size=max(batch_size, 32), normalize_embeddings=True,
+                                      convert_to_numpy=True, show_progress_bar=False) if todas else None
+        salidas = []
+        inicio = 0
+        for texto, lista in zip(textos, oraciones):
+            elegidas = self.seleccionar(lista, vectores[inicio:inicio + len(lista)] if lista else None, max_length)
+            inicio += len(lista)
+            salidas.append({"summary_text": " ".join(lista[i] for i in sorted(elegidas)) or texto})
+        return salidas
+
+    def seleccionar(self, oraciones, vectores, max_palabras):
+        if not oraciones:
+            return []
+        centroide = vectores.mean(axis=0)
+        centroide /= max(np.linalg.norm(centroide), 1e-12)
+        relevancia = vectores @ centroide
+        redundancia = np.full(len(oraciones), -1.0)
+        candidatas = np.ones(len(oraciones), dtype=bool)
+        elegidas = []
+        palabras = 0
+        while candidatas.any() and len(elegidas) < self.num_oraciones:
+            puntaje = self.lambda_mmr * relevancia - (1 - self.lambda_mmr) * np.maximum(redundancia, 0)
+            mejor = int(np.argmax(np.where(candidatas, puntaje, -np.inf)))
+            candidatas[mejor] = False
+            longitud = len(oraciones[mejor].split())
+            # La primera oración siempre entra; las demás solo si caben en el límite de palabras
+            if elegidas and palabras + longitud > max_palabras:
+                continue
+            elegidas.append(mejor)
+            palabras += longitud
+            redundancia = np.maximum(redundancia, vectores @ vectores[mejor])
+        return elegidas
+
+class CacheResumenes:
+    def __init__(self, archivo=ARCHIVO_CACHE, maximo_entradas=MAXIMO_ENTRADAS):
+        self.maximo_entradas = maximo_entradas
+        # La app la usa desde varios hilos (y varios procesos): WAL permite leer mientras otro escribe
+        self.conexion = sqlite3.connect(archivo, check_same_thread=False, timeout=30)
+        self.lock = threading.Lock()
+        with self.lock, self.conexion:
+            self.conexion.execute("PRAGMA journal_mode=WAL")
+            self.conexion.execute("CREATE TABLE IF NOT EXISTS resumenes (clave TEXT PRIMARY KEY, resumen TEXT, ultimo_uso REAL)")
+            self.conexion.execute("CREATE INDEX IF NOT EXISTS resumenes_uso ON resumenes (ultimo_uso)")
+        self.aciertos = 0
+        self.fallos = 0
+
+    def buscar(self, clave):
+        with self.lock:
+            fila = self.conexion.execute("SELECT resumen FROM resumenes WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+            with self.conexion:
+                self.conexion.execute("UPDATE resumenes SET ultimo_uso = ? WHERE clave = ?", (time.time(), clave))
+            return fila[0]
+
+    def guardar(self, clave, resumen):
+        with self.lock, self.conexion:
+            self.conexion.execute("INSERT OR REPLACE INTO resumenes VALUES (?, ?, ?)", (clave, resumen, time.time()))
+            # Se descartan los menos usados recientemente si se supera el máximo
+            self.conexion.execute(
+                "DELETE FROM resumenes WHERE clave IN (SELECT clave FROM resumenes ORDER BY ultimo_uso DESC LIMIT -1 OFFSET ?)",
+                (self.maximo_entradas,))
+
+class TrabajoResumenes:
+    def __init__(self, pendientes, cargar_summarizer, cache=None, max_length=LONGITUD_MAXIMA,
+                 min_length=LONGITUD_MINIMA, batch_size=LOTE_TRABAJO):
+        """
+        'pendientes' es {clave: texto}. 'cargar_summarizer' se llama ya en segundo plano, así que
+        cargar el modelo la primera vez tampoco bloquea la búsqueda.
+        """
+        self.pendientes = pendientes
+        self.cargar_summarizer = cargar_summarizer
+        self.cache = cache
+        self.max_length = max_length
+        self.min_length = min_length
+        self.batch_size = batch_size
+        self.cancelado = threading.Event()
+        self.futuro = None
+
+    def enviar(self, executor):
+        self.futuro = executor.submit(self.ejecutar)
+        return self
+
+    def ejecutar(self):
+        """Devuelve {clave: resumen}; si se cancela a mitad, solo los lotes ya terminados."""
+        resultados = {}
+        claves = list(self.pendientes)
+        for inicio in range(0, len(claves), self.batch_size):
+            if self.cancelado.is_set():
+                break
+            lote = claves[inicio:inicio + self.batch_size]
+            generados = resumir_textos(self.cargar_summarizer(), [self.pendientes[clave] for clave in lote],
+                                       self.max_length, self.min_length, self.batch_size)
+            for clave, resumen in zip(lote, generados):
+                resultados[clave] = resumen
+                if self.cache:
+                    self.cache.guardar(clave, resumen)
+        return resultados
+
+    def cancelar(self):
+        """Si aún no empezó, no llega a ejecutarse; si ya empezó, no resume más lotes."""
+        self.cancelado.set()
+        if self.futuro:
+            self.futuro.cancel()
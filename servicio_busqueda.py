@@ -0,0 +1,243 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+from sentence_transformers import SentenceTransformer
+import argparse
+import json
+import queue
+import threading
+import time
+from almacen_enfermedades import AlmacenEnfermedades, ARCHIVO_ALMACEN
+from cache_consultas import CacheConsultas
+import busqueda
+import resumenes
+
+"""
+Servicio HTTP local de búsqueda semántica, sin interfaz (la app de Streamlit es su cliente).
+Carga una sola vez el modelo, la matriz de embeddings, el índice IVF (si lo hay) y el almacén.
+Las consultas que llegan a la vez desde varias conexiones se agrupan en micro-lotes: el hilo de
+búsqueda espera como mucho VENTANA_MS desde la primera consulta del lote (o hasta juntar
+TAMANO_MAXIMO_LOTE), las codifica juntas en una sola llamada al modelo y las puntúa con un solo
+producto de matrices. Con más usuarios a la vez crece el lote, no el número de procesos.
+También genera los resúmenes que la app no encuentra precalculados, así que la app no carga
+ningún modelo: el backend extractivo reutiliza el mismo modelo de la búsqueda.
+Rutas:
+- POST /buscar con {"consulta": texto, "top_k": n} -> {"consulta", "version", "resultados"}.
+- POST /resumir con {"textos": [texto, ...], "backend", "max_length", "min_length"} -> {"modelo", "resumenes"}.
+- GET /estadisticas -> lotes procesados, consultas por lote y aciertos de las cachés.
+- GET /salud -> estado, filas y versión de la matriz.
+"""
+
+# --- CONFIGURACIÓN ---
+PUERTO_POR_DEFECTO = 8770
+VENTANA_MS = 5
+TAMANO_MAXIMO_LOTE = 64
+MAXIMO_TOP_K = busqueda.MAXIMO_TOP_K
+
+class LoteadorConsultas:
+    """Agrupa las consultas concurrentes en micro-lotes que resuelve un único hilo de búsqueda."""
+    def __init__(self, motor, ventana_ms=VENTANA_MS, tamano_maximo=TAMANO_MAXIMO_LOTE):
+        self.motor = motor
+        self.ventana = ventana_ms / 1000
+        self.tamano_maximo = tamano_maximo
+        self.cola = queue.Queue()
+        self.lotes = 0
+        self.consultas = 0
+        self.mayor_lote = 0
+        self.hilo = threading.Thread(target=self.ejecutar, daemon=True, name="lotes-busqueda")
+        self.hilo.start()
+
+    def buscar(self, consulta, top_k=busqueda.NUM_RESULTADOS):
+        """Encola la consulta y espera a que se resuelva su lote; devuelve sus resultados."""
+        futuro = Future()
+        self.cola.put((consulta, top_k, futuro))
+        return futuro.result()
+
+    def ejecutar(self):
+        while True:
+            lote = [self.cola.get()]
+            limite = time.monotonic() + self.ventana
+            while len(lote) < self.tamano_maximo:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self.cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            self.procesar(lote)
+
+    def procesar(self, lote):
+        # Todo el lote se busca con el mayor top_k pedido y cada consulta se queda con los suyos
+        top_k = max(k for _, k, _ in lote)
+        try:
+            hits = self.motor.buscar_lote([consulta for consulta, _, _ in lote], top_k)
+        except Exception as e:
+            for _, _, futuro in lote:
+                futuro.set_exception(e)
+            return
+        self.lotes += 1
+        self.consultas += len(lote)
+        self.mayor_lote = max(self.mayor_lote, len(lote))
+        for (_, k, futuro), hit in zip(lote, hits):
+            futuro.set_result(hit[:k])
+
+    def estadisticas(self):
+        return {"lotes": self.lotes, "consultas": self.consultas, "mayor_lote": self.mayor_lote,
+                "consultas_por_lote": round(self.consultas / self.lotes, 2) if self.lotes else 0.0}
+
+class ResumidorServicio:
+    """
+    Resumidores del servicio por backend: el extractivo usa el modelo ya cargado para la búsqueda;
+    BART se carga la primera vez que se pide.
+    """
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.resumidores = {}
+        # Un resumen a la vez: el modelo corre en CPU y las peticiones llegan desde varios hilos
+        self.lock = threading.Lock()
+
+    def resumir(self, textos, backend, max_length, min_length):
+        with self.lock:
+            if backend not in self.resumidores:
+                self.resumidores[backend] = resumenes.cargar_resumidor(backend, self.modelo)
+            return resumenes.resumir_textos(self.resumidores[backend], textos, max_length, min_length)
+
+class ManejadorBusqueda(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Mantiene las conexiones abiertas (keep-alive)
+    # Las cabeceras y el cuerpo salen en dos escrituras: con Nagle activo, cada respuesta en una
+    # conexión reutilizada esperaría el ACK retrasado del cliente (~40 ms)
+    disable_nagle_algorithm = True
+    motor = None
+    loteador = None
+    resumidor = None
+
+    def do_GET(self):
+        ruta = urlsplit(self.path).path
+        if ruta == "/salud":
+            self.enviar_json(200, {"estado": "ok", "filas": len(self.motor.matriz), "version": self.motor.version})
+        elif ruta == "/estadisticas":
+            self.enviar_json(200, {**self.motor.estadisticas(), "lotes": self.loteador.estadisticas()})
+        else:
+            self.enviar_json(404, {"error": "No encontrado"})
+
+    def do_POST(self):
+        ruta = urlsplit(self.path).path
+        if ruta == "/buscar":
+            self.buscar()
+        elif ruta == "/resumir":
+            self.resumir()
+        else:
+            self.enviar_json(404, {"error": "No encontrado"})
+
+    def leer_json(self):
+        return json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+    def buscar(self):
+        try:
+            peticion = self.leer_json()
+            consulta = peticion.get("consulta", "")
+            top_k = int(peticion.get("top_k", busqueda.NUM_RESULTADOS))
+        except (ValueError, TypeError, AttributeError):
+            self.enviar_json(400, {"error": "Se esperaba un JSON con 'consulta' (texto) y 'top_k' (entero)."})
+            return
+        if not isinstance(consulta, str) or not 0 < top_k <= MAXIMO_TOP_K:
+            self.enviar_json(400, {"error": f"'consulta' debe ser texto y 'top_k' estar entre 1 y {MAXIMO_TOP_K}."})
+            return
+        resultados = []
+        if consulta.strip():
+            try:
+                resultados = self.motor.resultados(self.loteador.buscar(consulta, top_k))
+            except Exception as e:
+                self.enviar_json(500, {"error": str(e)})
+                return
+        self.enviar_json(200, {"consulta": consulta, "version": self.motor.version, "resultados": resultados})
+
+    def resumir(self):
+        try:
+            peticion = self.leer_json()
+            textos = peticion.get("textos", [])
+            backend = peticion.get("backend", resumenes.BACKEND_POR_DEFECTO)
+            max_length = int(peticion.get("max_length", resumenes.LONGITUD_MAXIMA))
+            min_length = int(peticion.get("min_length", resumenes.LONGITUD_MINIMA))
+        except (ValueError, TypeError, AttributeError):
+            self.enviar_json(400, {"error": "Se esperaba un JSON con 'textos' (lista de textos) y 'backend'."})
+            return
+        if (not isinstance(textos, list) or not all(isinstance(texto, str) for texto in textos)
+                or backend not in resumenes.BACKENDS_RESUMEN):
+            self.enviar_json(400, {"error": f"'textos' debe ser una lista de textos y 'backend' uno de {resumenes.BACKENDS_RESUMEN}."})
+            return
+        try:
+            generados = self.resumidor.resumir(textos, backend, max_length, min_length)
+        except Exception as e:
+            self.enviar_json(500, {"error": str(e)})
+            return
+        self.enviar_json(200, {"modelo": resumenes.nombre_modelo(backend), "resumenes": generados})
+
+    def enviar_json(self, codigo, datos):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        # Silencia el log por petición: con carga concurrente solo añade ruido
+        pass
+
+def iniciar_servidor(motor, puerto=0, host="127.0.0.1", ventana_ms=VENTANA_MS, tamano_maximo=TAMANO_MAXIMO_LOTE):
+    """
+    Inicia el servidor en un hilo en segundo plano.
+    Con puerto=0 el sistema elige un puerto libre. Devuelve (servidor, url_base).
+    """
+    atributos = {"motor": motor, "loteador": LoteadorConsultas(motor, ventana_ms, tamano_maximo),
+                 "resumidor": ResumidorServicio(motor.modelo)}
+    manejador = type("ManejadorBusquedaLocal", (ManejadorBusqueda,), atributos)
+    servidor = ThreadingHTTPServer((host, puerto), manejador)
+    servidor.daemon_threads = True
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    url_base = f"http://{host}:{servidor.server_address[1]}"
+    return servidor, url_base
+
+def parsear_argumentos():
+    parser = argparse.ArgumentParser(description="Servicio HTTP local de búsqueda semántica con micro-lotes.")
+    parser.add_argument("--puerto", type=int, default=PUERTO_POR_DEFECTO)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--almacen", default=ARCHIVO_ALMACEN, help="Almacén SQLite generado por el paso 4.")
+    parser.add_argument("--matriz", default=busqueda.ARCHIVO_MATRIZ, help="Matriz de embeddings del paso 4.")
+    parser.add_argument("--indice-ann", default=busqueda.ARCHIVO_INDICE_ANN,
+                        help="Índice IVF opcional (se usa solo si se construyó sobre la misma matriz).")
+    parser.add_argument("--sondas", type=int, default=busqueda.SONDAS_ANN,
+                        help="Listas del índice IVF que se revisan por consulta.")
+    parser.add_argument("--ventana-ms", type=float, default=VENTANA_MS,
+                        help="Milisegundos que se esperan para juntar consultas en un lote.")
+    parser.add_argument("--tamano-lote", type=int, default=TAMANO_MAXIMO_LOTE,
+                        help="Máximo de consultas por lote.")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="No guarda embeddings ni resultados de las consultas (para medir la carga real).")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parsear_argumentos()
+    try:
+        almacen = AlmacenEnfermedades(args.almacen)
+        matriz = busqueda.cargar_matriz(args.matriz)
+    except FileNotFoundError as e:
+        print(f"Error: Falta el archivo '{e.filename or e}'. Ejecuta antes '4_preparar_embeddings.py'.")
+        raise SystemExit(1)
+    indice_ann = busqueda.cargar_indice_ann(matriz, args.indice_ann)
+
+    print(f"Cargando el modelo '{busqueda.MODELO}'...")
+    modelo = SentenceTransformer(busqueda.MODELO)
+    caches = (None, None) if args.sin_cache else (CacheConsultas(), CacheConsultas())
+    motor = busqueda.MotorBusqueda(modelo, matriz, almacen, indice_ann, args.sondas, *caches)
+
+    servidor, url_base = iniciar_servidor(motor, args.puerto, args.host, args.ventana_ms, args.tamano_lote)
+    print(f"Buscando en {len(matriz)} enfermedades ({motor.metodo}) en {url_base} (Ctrl+C para terminar)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print("\nDeteniendo el servidor.")
+        servidor.shutdown()
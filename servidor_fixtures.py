@@ -0,0 +1,142 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from email.utils import formatdate, parsedate_to_datetime
+from bs4 import BeautifulSoup
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+
+"""
+Servidor HTTP local que sirve páginas grabadas de Mayo Clinic desde la carpeta 'fixtures/'.
+Permite ejecutar los scrapers sin conexión: la ruta de cada URL se traduce a un archivo
+.html dentro de la carpeta (los parámetros de la URL se añaden al nombre, p. ej.
+'/es/diseases-conditions/index?letter=A' -> 'es/diseases-conditions/index__letter_A.html').
+Cada respuesta lleva ETag y Last-Modified y se responde 304 a las peticiones condicionales
+cuando el archivo no cambió, igual que el sitio real.
+"""
+
+DIRECTORIO_FIXTURES = 'fixtures'
+PUERTO_POR_DEFECTO = 8765
+
+def ruta_fixture(directorio, ruta_url):
+    """Traduce la ruta de una URL al archivo de fixture correspondiente."""
+    partes = urlsplit(ruta_url)
+    ruta = partes.path.strip('/')
+    if partes.query:
+        ruta += '__' + re.sub(r'[^\w-]', '_', partes.query)
+    return os.path.join(directorio, *ruta.split('/')) + '.html'
+
+class ManejadorFixtures(BaseHTTPRequestHandler):
+    """Responde cada GET con el archivo de fixture que corresponde a la ruta pedida."""
+    protocol_version = "HTTP/1.1"  # Mantiene las conexiones abiertas (keep-alive)
+    directorio = DIRECTORIO_FIXTURES
+
+    def do_GET(self):
+        archivo = ruta_fixture(self.directorio, self.path)
+        if not os.path.isfile(archivo):
+            self.enviar_respuesta(404, b"No encontrado")
+            return
+        with open(archivo, 'rb') as f:
+            cuerpo = f.read()
+        mtime = int(os.path.getmtime(archivo))
+        cabeceras = {
+            "ETag": '"' + hashlib.sha1(cuerpo).hexdigest() + '"',
+            "Last-Modified": formatdate(mtime, usegmt=True)
+        }
+        if self.no_modificado(cabeceras["ETag"], mtime):
+            self.enviar_respuesta(304, b"", cabeceras)
+            return
+        self.enviar_respuesta(200, cuerpo, cabeceras)
+
+    def no_modificado(self, etag, mtime):
+        # If-None-Match tiene prioridad sobre If-Modified-Since (RFC 9110)
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match:
+            return etag in [valor.strip() for valor in if_none_match.split(",")]
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def enviar_respuesta(self, codigo, cuerpo, cabeceras=None):
+        self.send_response(codigo)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        # Silencia el log por petición para no mezclarlo con la salida de los scrapers
+        pass
+
+def iniciar_servidor(directorio=DIRECTORIO_FIXTURES, puerto=0):
+    """
+    Inicia el servidor en un hilo en segundo plano.
+    Con puerto=0 el sistema elige un puerto libre. Devuelve (servidor, url_base).
+    """
+    manejador = type("ManejadorFixturesLocal", (ManejadorFixtures,), {"directorio": directorio})
+    servidor = ThreadingHTTPServer(("127.0.0.1", puerto), manejador)
+    servidor.daemon_threads = True
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    url_base = f"http://127.0.0.1:{servidor.server_address[1]}"
+    return servidor, url_base
+
+def escribir_lista_fixtures(url_base, archivo_salida, directorio=DIRECTORIO_FIXTURES):
+    """
+    Genera una lista de enfermedades con el mismo formato que '1_lista_enfermedades.json'
+    apuntando a las páginas de 'symptoms-causes' servidas por el servidor local.
+    """
+    # Se importa aquí porque el nombre del script empieza con un número
+    import importlib
+    crear_hash_id = importlib.import_module("1_scrape_lista_enfermedades").crear_hash_id
+
+    enfermedades = []
+    for raiz, _, archivos in sorted(os.walk(directorio)):
+        if os.path.basename(raiz) != "symptoms-causes":
+            continue
+        for nombre_archivo in sorted(archivos):
+            ruta_relativa = os.path.relpath(os.path.join(raiz, nombre_archivo), directorio)
+            url = f"{url_base}/{ruta_relativa[:-len('.html')].replace(os.sep, '/')}"
+            with open(os.path.join(raiz, nombre_archivo), 'r', encoding='utf-8') as f:
+                h1 = BeautifulSoup(f.read(), 'lxml').find('h1')
+            enfermedades.append({
+                "id": crear_hash_id(url),
+                "nombre": h1.get_text(strip=True) if h1 else nombre_archivo,
+                "url": url
+            })
+
+    datos = {
+        "metadata": {"fuente": url_base, "total_registros": len(enfermedades)},
+        "enfermedades": enfermedades
+    }
+    with open(archivo_salida, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False, indent=4)
+    print(f"Lista de {len(enfermedades)} enfermedades de prueba guardada en '{archivo_salida}'")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sirve las páginas grabadas de 'fixtures/' por HTTP.")
+    parser.add_argument("--puerto", type=int, default=PUERTO_POR_DEFECTO)
+    parser.add_argument("--directorio", default=DIRECTORIO_FIXTURES)
+    parser.add_argument("--lista", default=None,
+                        help="Si se indica, escribe una lista de enfermedades que apunta al servidor local.")
+    args = parser.parse_args()
+
+    servidor, url_base = iniciar_servidor(args.directorio, args.puerto)
+    print(f"Sirviendo '{args.directorio}' en {url_base} (Ctrl+C para terminar)")
+    if args.lista:
+        escribir_lista_fixtures(url_base, args.lista, args.directorio)
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print("\nDeteniendo el servidor.")
+        servidor.shutdown()